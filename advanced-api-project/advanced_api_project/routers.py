@@ -0,0 +1,148 @@
+"""
+Primary/replica database routing.
+
+PrimaryReplicaRouter sends reads to a read replica only while serving a
+safe (GET/HEAD/OPTIONS) HTTP request, so the Book/Author list and detail
+views read from replicas while the create, update, delete and bulk views,
+management commands, migrations and the shell all use the primary
+('default'). Reads inside a transaction on the primary stay on the
+primary.
+
+Read-your-writes: the first write of a request pins the rest of that
+request to the primary, and ReplicaRoutingMiddleware then sets a cookie
+that keeps the client on the primary for REPLICA_PIN_SECONDS, long
+enough for the replicas to catch up. Code that must see the latest data
+outside a request pin can use ``with use_primary():``.
+
+Settings:
+
+    DATABASE_ROUTERS = ['advanced_api_project.routers.PrimaryReplicaRouter']
+    DATABASE_REPLICAS = ['replica1', 'replica2']   # aliases in DATABASES
+    REPLICA_PIN_SECONDS = 5
+    REPLICA_PIN_COOKIE = 'db_primary'
+
+With no DATABASE_REPLICAS every query goes to 'default'.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# True while reads may go to a replica
+_replica_reads = ContextVar('replica_reads', default=False)
+# True once the current request has written to the primary
+_wrote = ContextVar('wrote', default=False)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def get_pin_cookie():
+    return getattr(settings, 'REPLICA_PIN_COOKIE', 'db_primary')
+
+
+@contextmanager
+def use_primary():
+    """
+    Send every read in the block to the primary.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Reads from a random replica during safe requests, everything else
+    from the primary. Replicas are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes for the rest of the request
+        _replica_reads.set(False)
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enable replica reads for safe requests from clients that are not
+    pinned to the primary, and pin clients after a request that wrote.
+
+    Sets ``request.db_pinned`` so other layers (e.g. the response cache)
+    can tell a read-your-writes request apart.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(response)
+        finally:
+            self.reset(tokens)
+        return response
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+            self.finish(response)
+        finally:
+            self.reset(tokens)
+        return response
+
+    def start(self, request):
+        request.db_pinned = get_pin_cookie() in request.COOKIES
+        replica_reads = request.method in SAFE_METHODS and not request.db_pinned
+        return _replica_reads.set(replica_reads), _wrote.set(False)
+
+    def finish(self, response):
+        if _wrote.get() and get_replicas():
+            response.set_cookie(
+                get_pin_cookie(), '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+
+    @staticmethod
+    def reset(tokens):
+        replica_reads, wrote = tokens
+        _replica_reads.reset(replica_reads)
+        _wrote.reset(wrote)
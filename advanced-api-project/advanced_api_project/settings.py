@@ -10,11 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Modules shared by every project in this repository (django_shared/)
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -44,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_shared.querybudget.QueryBudgetMiddleware',
+    'advanced_api_project.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,14 +85,82 @@ WSGI_APPLICATION = 'advanced_api_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# API_DB_ENGINE picks the profile:
+# - 'sqlite' (default): API_DB_NAME or db.sqlite3 next to manage.py, with
+#   the connection pragmas in SQLITE_PRAGMAS (default 'tuned': WAL,
+#   synchronous=NORMAL, mmap, a 64 MiB cache and a busy timeout; 'off'
+#   for SQLite's defaults; see django_shared/sqlite/base.py)
+# - 'postgresql': API_DB_NAME, API_DB_USER, API_DB_PASSWORD, API_DB_HOST
+#   and API_DB_PORT. Connections persist for API_DB_CONN_MAX_AGE seconds
+#   (default 60) and are health-checked before reuse. Behind PgBouncer
+#   in transaction pooling mode set API_DB_PGBOUNCER=1, which turns off
+#   server-side cursors (they don't survive a pooled transaction).
+#
+# API_DB_REPLICAS lists read replicas, comma-separated: SQLite files or
+# PostgreSQL host[:port]s. They become the aliases replica1, replica2, ...
+# and get safe-request reads (see advanced_api_project/routers.py).
+
+DB_ENGINE = os.environ.get('API_DB_ENGINE', 'sqlite')
+DB_REPLICAS = [name.strip() for name in os.environ.get('API_DB_REPLICAS', '').split(',') if name.strip()]
+
+
+def database(location=None):
+    if DB_ENGINE == 'postgresql':
+        host, _, port = (location or os.environ.get('API_DB_HOST', 'localhost')).partition(':')
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('API_DB_NAME', 'advanced_api'),
+            'USER': os.environ.get('API_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('API_DB_PASSWORD', ''),
+            'HOST': host,
+            'PORT': port or os.environ.get('API_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('API_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('API_DB_PGBOUNCER') == '1',
+        }
+    return {
+        'ENGINE': 'django_shared.sqlite',
+        'NAME': location or os.environ.get('API_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {'pragmas': os.environ.get('SQLITE_PRAGMAS', 'tuned')},
+    }
+
+
+DATABASES = {'default': database()}
+for index, location in enumerate(DB_REPLICAS, 1):
+    DATABASES[f'replica{index}'] = database(location)
+
+DATABASE_ROUTERS = ['advanced_api_project.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Seconds a client reads from the primary after writing (read-your-writes)
+REPLICA_PIN_SECONDS = 5
+# Seconds the change feed lags behind writes where concurrent transactions
+# can commit change ids out of order (see api/changes.py). SQLite runs one
+# writer at a time and needs none.
+CHANGE_FEED_SAFETY_WINDOW = 0 if DB_ENGINE == 'sqlite' else 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The API response cache (api/caching.py) works with any backend; use
+# 'django.core.cache.backends.filebased.FileBasedCache' to share it
+# between processes without running Redis.
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'advanced-api-project',
     }
 }
 
+# Response cache for the Book/Author list and detail views
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300  # seconds
+
+# Render BookListView pages from values() rows instead of BookSerializer
+# instances (identical JSON, see api/fastpath.py)
+API_FAST_LIST_SERIALIZATION = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -142,4 +219,32 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-}
\ No newline at end of file
+}
+
+# Search backend for the ?search= parameter of BookListView (see api/search.py).
+# 'auto' uses FTS5 on SQLite and pg_trgm indexes on PostgreSQL.
+API_SEARCH_BACKEND = 'auto'
+
+# Per-request SQL query budgets (see django_shared/querybudget.py).
+# Budgets are max queries per request for a URL name, including the
+# session/user lookups of an authenticated request. Over-budget requests
+# and N+1 patterns are logged, and raise with the test settings (test_settings.py).
+QUERY_BUDGET = {
+    'BUDGETS': {
+        'book-list': 6,
+        'book-detail': 4,
+        'book-export': 3,
+        'book-facets': 5,
+        'author-list': 7,
+        'author-detail': 5,
+        'change-feed': 6,
+        # The async views never load the session or user
+        'async-book-list': 3,
+        'async-book-detail': 1,
+        'async-author-list': 3,
+        'async-author-detail': 2,
+    },
+    'MAX_DUPLICATES': 3,
+    'RAISE': False,
+    'SERVER_TIMING': DEBUG,
+}
@@ -0,0 +1,17 @@
+"""
+Settings for the test suite. manage.py uses them for the test command;
+elsewhere set DJANGO_SETTINGS_MODULE=advanced_api_project.test_settings.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, QUERY_BUDGET, database
+
+# Over-budget requests and N+1 patterns fail the test that makes them
+QUERY_BUDGET = {**QUERY_BUDGET, 'RAISE': True}
+
+# Tests run on the primary. Replica aliases (at least replica1) mirror
+# its test database; the routing tests turn DATABASE_REPLICAS on.
+DATABASE_REPLICAS = []
+DATABASES.setdefault('replica1', database())
+for alias in DATABASES:
+    if alias != 'default':
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
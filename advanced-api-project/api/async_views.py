@@ -0,0 +1,212 @@
+"""
+Native async variants of the Book and Author read views, for ASGI.
+
+Under ASGI every DRF view in api.views is a synchronous handler: Django
+runs the whole request, serialization included, in a thread-sensitive
+worker thread. The views here are ``async def`` handlers on Django's
+View instead. Queries use the async ORM (acount(), aiterator(), aget())
+and the serializers run on the event loop, which is safe because every
+row they read has been loaded before serialization starts.
+
+They reuse the filter backends, filterset classes, search and ordering
+fields and paginators of the sync views, so the same query string
+returns the same JSON. Not ported: the response cache, conditional GET,
+?fields= / ?expand=, the values() fast path and the browsable API; use
+the sync views for those. Writes stay on the sync views.
+
+Django 4.2 has no async database driver, so each query still runs in
+the request's worker thread; everything else (filtering, serialization,
+rendering, middleware) stays on the event loop. Django 4.2's aiterator()
+also rejects prefetch_related(), so nested books are loaded by
+aprefetch_reverse(), which runs the prefetch in that thread. Compare both kinds
+of view with the benchmark_asgi command.
+
+Example Usage:
+- /api/async/books/?search=dragon&ordering=-publication_year
+- /api/async/books/?pagination=keyset
+- /api/async/authors/?book_count__gte=3
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import F, prefetch_related_objects
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from .models import Author, Book
+from .pagination import AsyncEstimatedCountPagination, AsyncPageNumberPagination, PaginationModeMixin
+from .search import aprobe_search_backend
+from .serializers import AuthorSerializer, BookSerializer
+from .views import AuthorListView, BookListView
+
+
+async def aprefetch_reverse(instances, name):
+    """
+    Load the reverse foreign key ``name`` (e.g. an author's ``books``) of
+    every instance with one query, run by prefetch_related_objects() in a
+    worker thread, so ``instance.books.all()`` doesn't query.
+    """
+    if instances:
+        await sync_to_async(prefetch_related_objects)(instances, name)
+
+
+class AsyncAPIView(View):
+    """
+    Base class for the async read views.
+
+    Subclasses implement ``aget_data()`` and return the response payload;
+    DRF exceptions (and Http404) become the same JSON error responses the
+    DRF views send. Reads are public, as with IsAuthenticatedOrReadOnly,
+    so no authentication runs.
+    """
+    http_method_names = ['get', 'head', 'options']
+    renderer_class = JSONRenderer
+
+    queryset = None
+    serializer_class = None
+    # Reverse relations rendered inline, loaded with aprefetch_reverse()
+    prefetch_reverse = ()
+
+    def setup(self, request, *args, **kwargs):
+        # Filter backends and paginators read request.query_params
+        super().setup(Request(request), *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            data, status = await self.aget_data(), 200
+        except Exception as exc:
+            response = exception_handler(exc, {'view': self, 'request': self.request})
+            if response is None:
+                raise
+            data, status = response.data, response.status_code
+        return HttpResponse(
+            self.renderer_class().render(data), status=status, content_type=self.renderer_class.media_type
+        )
+
+    async def aget_data(self):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['context'] = {'request': self.request, 'format': None, 'view': self}
+        return self.serializer_class(*args, **kwargs)
+
+    async def aprefetch(self, objects):
+        for name in self.prefetch_reverse:
+            await aprefetch_reverse(objects, name)
+
+
+class AsyncListAPIView(PaginationModeMixin, AsyncAPIView):
+    """
+    Async list view: filter backends, pagination and serialization of one page.
+    """
+    filter_backends = api_settings.DEFAULT_FILTER_BACKENDS
+    pagination_class = AsyncPageNumberPagination
+    estimated_pagination_class = AsyncEstimatedCountPagination
+
+    async def aget_data(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        paginator = self.paginator
+        page = None
+        if paginator is not None:
+            page = await paginator.apaginate_queryset(queryset, self.request, view=self)
+        objects = page if page is not None else [obj async for obj in queryset.aiterator()]
+        await self.aprefetch(objects)
+
+        data = self.get_serializer(objects, many=True).data
+        if page is None:
+            return data
+        return paginator.get_paginated_response(data).data
+
+    async def afilter_queryset(self, queryset):
+        """
+        Apply the filter backends. They only build the query, except for
+        the search backend's first index probe, which is done beforehand
+        in a worker thread.
+        """
+        if self.request.query_params.get(api_settings.SEARCH_PARAM):
+            await aprobe_search_backend(queryset.db)
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+
+class AsyncRetrieveAPIView(AsyncAPIView):
+    """
+    Async detail view: one aget() by primary key, 404 when missing.
+    """
+    lookup_field = 'pk'
+
+    async def aget_data(self):
+        obj = await self.aget_object()
+        await self.aprefetch([obj])
+        return self.get_serializer(obj).data
+
+    async def aget_object(self):
+        queryset = self.get_queryset()
+        try:
+            return await queryset.aget(**{self.lookup_field: self.kwargs[self.lookup_field]})
+        except queryset.model.DoesNotExist:
+            raise Http404
+
+
+class AsyncBookListView(AsyncListAPIView):
+    """
+    Async BookListView: the same filters, indexed search, ordering and
+    page-number, keyset (?pagination=keyset) or estimated-count
+    (?count=estimate) pagination.
+    """
+    # Keyset cursors read book.author.name for ?ordering=author__name
+    queryset = Book.objects.select_related('author')
+    serializer_class = BookSerializer
+
+    filter_backends = BookListView.filter_backends
+    filterset_class = BookListView.filterset_class
+    search_fields = BookListView.search_fields
+    ordering_fields = BookListView.ordering_fields
+    ordering = BookListView.ordering
+    keyset_pagination_class = BookListView.keyset_pagination_class
+
+
+class AsyncBookDetailView(AsyncRetrieveAPIView):
+    """
+    Async BookDetailView.
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+
+
+class AsyncAuthorListView(AsyncListAPIView):
+    """
+    Async AuthorListView: the same AuthorStats filters, search and
+    ordering, with each page's books loaded in one extra query.
+    """
+    queryset = Author.objects.select_related('stats')
+    serializer_class = AuthorSerializer
+    prefetch_reverse = ('books',)
+
+    filter_backends = AuthorListView.filter_backends
+    filterset_class = AuthorListView.filterset_class
+    search_fields = AuthorListView.search_fields
+    ordering_fields = AuthorListView.ordering_fields
+    ordering = AuthorListView.ordering
+
+    def get_queryset(self):
+        return super().get_queryset().alias(
+            book_count=F('stats__book_count'),
+            min_year=F('stats__min_year'),
+            max_year=F('stats__max_year'),
+        )
+
+
+class AsyncAuthorDetailView(AsyncRetrieveAPIView):
+    """
+    Async AuthorDetailView, books included.
+    """
+    queryset = Author.objects.select_related('stats')
+    serializer_class = AuthorSerializer
+    prefetch_reverse = ('books',)
@@ -0,0 +1,426 @@
+"""
+Helpers shared by the api management commands that measure performance.
+
+seed_catalog() fills the Author/Book tables with a deterministic synthetic
+catalog using bulk inserts, so benchmarks and query-plan checks run
+against realistic table sizes instead of the handful of rows in tests.
+
+Workload and run_workload() drive every URL in api.urls through the test
+client with a realistic mix of filters, searches, orderings and writes,
+and summarize latency percentiles, queries per request and rows/sec
+(see the benchmark_api command). Each request's on_commit callbacks run
+when it returns, so cached runs see writes evict entries even inside
+the benchmark's rolled-back transaction.
+
+read_mix() and run_asgi() send concurrent read requests straight to the
+ASGI application, the way an ASGI server does, to compare the sync views
+with their async variants (see the benchmark_asgi command).
+"""
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .changes import record_changes
+from .models import Author, Book, Change
+from .stats import rebuild_author_stats
+
+
+WORDS = [
+    'shadow', 'river', 'empire', 'garden', 'winter', 'silver', 'dragon', 'harbor',
+    'stone', 'night', 'forest', 'crown', 'ember', 'storm', 'glass', 'echo',
+    'wind', 'iron', 'mirror', 'lantern', 'ocean', 'hollow', 'raven', 'star',
+    'secret', 'journey', 'kingdom', 'letter', 'memory', 'orchard', 'tide', 'valley',
+]
+
+FIRST_NAMES = ['Ada', 'Brian', 'Clara', 'Dmitri', 'Elena', 'Farid', 'Grace', 'Hiro',
+               'Ines', 'Jonas', 'Kemi', 'Liam', 'Mara', 'Nils', 'Olga', 'Pavel']
+LAST_NAMES = ['Adeyemi', 'Brandt', 'Costa', 'Dubois', 'Eriksen', 'Fischer', 'Garcia',
+              'Haddad', 'Ito', 'Jensen', 'Kowalski', 'Larsen', 'Moreau', 'Novak']
+
+
+def seed_catalog(books, authors=None, batch_size=5000, seed=0):
+    """
+    Insert ``authors`` authors and ``books`` books and return the new counts.
+
+    Defaults to one author per 20 books. Titles are 2-4 words drawn from
+    a fixed vocabulary, so filters and searches have realistic selectivity.
+    """
+    rng = random.Random(seed)
+    authors = authors or max(1, books // 20)
+    current_year = datetime.now().year
+
+    author_objs = Author.objects.bulk_create(
+        [
+            Author(name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}')
+            for i in range(authors)
+        ],
+        batch_size=batch_size,
+    )
+    author_ids = [author.pk for author in author_objs]
+
+    book_ids = []
+    for start in range(0, books, batch_size):
+        created = Book.objects.bulk_create(
+            [
+                Book(
+                    title=' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title(),
+                    publication_year=rng.randint(1800, current_year),
+                    author_id=rng.choice(author_ids),
+                )
+                for _ in range(min(batch_size, books - start))
+            ],
+            batch_size=batch_size,
+        )
+        book_ids.extend(book.pk for book in created)
+    # bulk_create skips the signals that maintain AuthorStats and the change log
+    rebuild_author_stats(batch_size=batch_size)
+    record_changes('author', author_ids, Change.CREATE)
+    record_changes('book', book_ids, Change.CREATE)
+    return Author.objects.count(), Book.objects.count()
+
+
+def analyze(using='default'):
+    """
+    Refresh planner statistics so EXPLAIN reflects the seeded data.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+
+def percentile(samples, percent):
+    """
+    Nearest-rank percentile of ``samples``.
+    """
+    ordered = sorted(samples)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+BOOK_LIST_MIX = [
+    ('default', {}),
+    ('year range', {'publication_year__gte': 1950, 'publication_year__lt': 1960}),
+    ('author name', {'author__name': 'Costa'}),
+    ('search word', {'search': 'dragon'}),
+    ('search phrase', {'search': '"silver crown"'}),
+    ('search + ordering', {'search': 'river', 'ordering': '-publication_year'}),
+    ('order by year', {'ordering': '-publication_year'}),
+    ('order by author', {'ordering': 'author__name'}),
+    ('last page', {'page': 'last'}),
+    ('estimated count', {'count': 'estimate', 'publication_year__gte': 1900}),
+    ('keyset', {'pagination': 'keyset', 'ordering': '-publication_year'}),
+    ('sparse fields', {'fields': 'id,title', 'page_size': 100, 'pagination': 'keyset'}),
+]
+
+AUTHOR_LIST_MIX = [
+    ('default', {}),
+    ('search', {'search': 'Elena'}),
+    ('order by book count', {'ordering': '-book_count'}),
+    ('stats filter', {'book_count__gte': 25, 'max_year__gte': 2000}),
+    ('sparse fields', {'fields': 'id,name'}),
+]
+
+
+class Workload:
+    """
+    Request mix for every URL in api.urls.
+
+    scenarios() yields ``(url_name, label, build)`` where build() returns
+    ``(method, path, data)`` for one request. Ids come from pools sampled
+    up front: deletes and nested author rewrites get their own rows, so
+    reads never hit a row a write already removed.
+    """
+
+    def __init__(self, rng, requests_per_scenario):
+        self.rng = rng
+        reserved = requests_per_scenario * 2
+        author_ids = list(Author.objects.values_list('pk', flat=True))
+        rng.shuffle(author_ids)
+        # Authors deleted or rewritten by the nested endpoint, and their books
+        self.spare_authors = author_ids[:reserved]
+        self.author_ids = author_ids[reserved:] or author_ids
+        spare = set(self.spare_authors)
+        book_ids = [pk for pk, author_id in Book.objects.values_list('pk', 'author_id') if author_id not in spare]
+        rng.shuffle(book_ids)
+        self.spare_books = book_ids[:requests_per_scenario]
+        self.book_ids = book_ids[requests_per_scenario:] or book_ids
+        # Feed position a typical incremental sync starts from
+        last_change = Change.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.recent_token = max(0, last_change - 200)
+        self.year = datetime.now().year
+        self.counter = 0
+
+    def scenarios(self):
+        for label, params in BOOK_LIST_MIX:
+            yield 'book-list', label, self.get('book-list', params)
+        yield 'book-detail', 'random', lambda: ('get', self.url('book-detail', self.book_id()), None)
+        yield 'book-create', 'single', lambda: ('post', self.url('book-create'), self.book_payload())
+        yield 'book-update', 'patch title', lambda: (
+            'patch', self.url('book-update', self.book_id()), {'title': self.title()},
+        )
+        yield 'book-delete', 'single', lambda: ('delete', self.url('book-delete', self.spare_books.pop()), None)
+        yield 'book-bulk', 'create 100', lambda: (
+            'post', self.url('book-bulk'), [self.book_payload() for _ in range(100)],
+        )
+        yield 'book-export', 'ndjson decade', lambda: (
+            'get', self.url('book-export'), {'publication_year__gte': 1990, 'publication_year__lt': 2000},
+        )
+        yield 'book-export', 'csv author', lambda: (
+            'get', self.url('book-export'), {'format': 'csv', 'author__name': 'Novak'},
+        )
+        yield 'book-facets', 'all books', self.get('book-facets', {})
+        yield 'book-facets', 'search word', self.get('book-facets', {'search': 'dragon'})
+        for label, params in AUTHOR_LIST_MIX:
+            yield 'author-list', label, self.get('author-list', params)
+        yield 'author-detail', 'random', lambda: ('get', self.url('author-detail', self.author_id()), None)
+        yield 'author-create', 'single', lambda: ('post', self.url('author-create'), {'name': self.title()})
+        yield 'author-update', 'rename', lambda: (
+            'patch', self.url('author-update', self.author_id()), {'name': self.title()},
+        )
+        yield 'author-delete', 'cascade', lambda: (
+            'delete', self.url('author-delete', self.spare_authors.pop()), None,
+        )
+        yield 'author-book-create', '10 books', lambda: (
+            'post', self.url('author-book-create'),
+            {'name': self.title(), 'books': [self.book_payload(author=False) for _ in range(10)]},
+        )
+        yield 'author-book-update', 'replace books', lambda: (
+            'put', self.url('author-book-update', self.spare_authors.pop()),
+            {'name': self.title(), 'books': [self.book_payload(author=False) for _ in range(5)]},
+        )
+        yield 'change-feed', 'from start', self.get('change-feed', {'limit': 100})
+        yield 'change-feed', 'recent', lambda: ('get', self.url('change-feed'), {'since': self.recent_token})
+        yield 'async-book-list', 'search word', self.get('async-book-list', {'search': 'dragon'})
+        yield 'async-book-detail', 'random', lambda: ('get', self.url('async-book-detail', self.book_id()), None)
+        yield 'async-author-list', 'default', self.get('async-author-list', {})
+        yield 'async-author-detail', 'random', lambda: (
+            'get', self.url('async-author-detail', self.author_id()), None,
+        )
+
+    def get(self, name, params):
+        return lambda: ('get', self.url(name), params)
+
+    @staticmethod
+    def url(name, pk=None):
+        return reverse(name, kwargs=None if pk is None else {'pk': pk})
+
+    def book_id(self):
+        return self.rng.choice(self.book_ids)
+
+    def author_id(self):
+        return self.rng.choice(self.author_ids)
+
+    def title(self):
+        self.counter += 1
+        return f'{self.rng.choice(WORDS).title()} {self.rng.choice(WORDS).title()} {self.counter}'
+
+    def book_payload(self, author=True):
+        payload = {'title': self.title(), 'publication_year': self.rng.randint(1800, self.year)}
+        if author:
+            payload['author'] = self.author_id()
+        return payload
+
+
+def count_rows(response):
+    """
+    Rows returned or written by one response: the items of a page, bulk
+    result or change feed, the buckets of a facet response, the lines of
+    an export, and 1 for a single object.
+    """
+    if getattr(response, 'streaming', False):
+        return b''.join(response.streaming_content).count(b'\n')
+    if response.status_code >= 300:
+        return 0
+    data = getattr(response, 'data', None)
+    if data is None and response.get('Content-Type') == 'application/json':
+        # Plain HttpResponse from an async view
+        data = json.loads(response.content)
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        for key in ('results', 'changes'):
+            if isinstance(data.get(key), list):
+                return len(data[key])
+        if isinstance(data.get('facets'), dict):
+            return sum(len(buckets) for buckets in data['facets'].values())
+    return 1
+
+
+def run_workload(client, workload, requests_per_scenario, using='default'):
+    """
+    Send ``requests_per_scenario`` requests for every scenario and return
+    ``{'<url-name> <label>': summary}`` with latency percentiles (ms),
+    queries per request, rows/sec and the status codes seen.
+    """
+    connection = connections[using]
+    results = {}
+    for name, label, build in workload.scenarios():
+        latencies, queries, rows, statuses = [], [], 0, Counter()
+        for _ in range(requests_per_scenario):
+            method, path, data = build()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                # The benchmark runs in a transaction that is rolled back, so
+                # no request commits: run each one's on_commit work (cache
+                # generations, resource versions) as its commit would
+                with TestCase.captureOnCommitCallbacks(using=using, execute=True):
+                    if method == 'get':
+                        response = client.get(path, data)
+                    else:
+                        response = getattr(client, method)(path, data, format='json')
+                rows += count_rows(response)
+                latencies.append(time.perf_counter() - start)
+            queries.append(len(captured))
+            statuses[response.status_code] += 1
+        total = sum(latencies)
+        results[f'{name} {label}'] = {
+            'url_name': name,
+            'requests': requests_per_scenario,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+            'rows_per_sec': round(rows / total, 1) if total else 0.0,
+            'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        }
+    return results
+
+
+def compare_results(baseline, current, tolerance, min_delta_ms=5.0):
+    """
+    Yield ``(scenario, metric, old, new)`` for regressions of ``current``
+    against ``baseline``: p95 latency more than ``tolerance`` (a fraction)
+    and more than ``min_delta_ms`` slower, or more queries per request.
+    Query counts are exact, so any increase counts.
+    """
+    for scenario, new in current.items():
+        old = baseline.get(scenario)
+        if old is None:
+            continue
+        if (new['p95_ms'] > old['p95_ms'] * (1 + tolerance)
+                and new['p95_ms'] - old['p95_ms'] > min_delta_ms):
+            yield scenario, 'p95_ms', old['p95_ms'], new['p95_ms']
+        if new['queries_per_request'] > old['queries_per_request']:
+            yield scenario, 'queries_per_request', old['queries_per_request'], new['queries_per_request']
+
+
+# Read requests for the ASGI benchmark: (sync URL name, async URL name, params).
+# params None means a detail request for a random row.
+ASGI_READ_MIX = [
+    ('book-list', 'async-book-list', {}),
+    ('book-list', 'async-book-list', {'search': 'dragon'}),
+    ('book-list', 'async-book-list', {'publication_year__gte': 1950, 'ordering': '-publication_year'}),
+    ('book-list', 'async-book-list', {'pagination': 'keyset', 'ordering': 'author__name'}),
+    ('book-detail', 'async-book-detail', None),
+    ('author-list', 'async-author-list', {}),
+    ('author-list', 'async-author-list', {'ordering': '-book_count'}),
+    ('author-detail', 'async-author-detail', None),
+]
+
+
+def read_mix(rng, count):
+    """
+    Return ``count`` requests drawn from ASGI_READ_MIX as
+    ``{'sync': [(path, params), ...], 'async': [...]}``; both lists ask
+    for the same rows in the same order.
+    """
+    book_ids = list(Book.objects.values_list('pk', flat=True))
+    author_ids = list(Author.objects.values_list('pk', flat=True))
+    requests = {'sync': [], 'async': []}
+    for _ in range(count):
+        sync_name, async_name, params = rng.choice(ASGI_READ_MIX)
+        kwargs = None
+        if params is None:
+            ids = book_ids if sync_name.startswith('book') else author_ids
+            kwargs, params = {'pk': rng.choice(ids)}, {}
+        requests['sync'].append((reverse(sync_name, kwargs=kwargs), params))
+        requests['async'].append((reverse(async_name, kwargs=kwargs), params))
+    return requests
+
+
+async def asgi_get(application, path, params, host='testserver'):
+    """
+    Send one GET request to an ASGI ``application`` and return
+    ``(status, body)``.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('utf-8'),
+        'query_string': urlencode(params).encode('ascii'),
+        'root_path': '',
+        'headers': [(b'host', host.encode('ascii')), (b'accept', b'application/json')],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects early
+        await asyncio.Event().wait()
+
+    status, body = None, []
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            body.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return status, b''.join(body)
+
+
+async def run_asgi(application, requests, concurrency):
+    """
+    Send ``requests`` (``(path, params)`` pairs) to ``application`` from
+    ``concurrency`` concurrent clients. Returns throughput, latency
+    percentiles (ms), the peak number of threads and the status codes seen.
+    """
+    pending = iter(requests)
+    latencies, statuses = [], Counter()
+    peak_threads = threading.active_count()
+
+    async def client():
+        nonlocal peak_threads
+        for path, params in pending:
+            start = time.perf_counter()
+            status, _ = await asgi_get(application, path, params)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+            peak_threads = max(peak_threads, threading.active_count())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'req_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_threads': peak_threads,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+    }
@@ -0,0 +1,210 @@
+"""
+Response caching for the Book and Author read endpoints.
+
+Cached responses are keyed on the view, the normalized query parameters
+and one or more *generation tokens*. A generation is a random token
+stored in the cache for a scope:
+
+- ``book-list`` / ``author-list``: every list response of that resource
+- ``book:<pk>`` / ``author:<pk>``: the detail response of one row
+
+Writes never delete cached responses; they replace the token of every
+scope the write could affect, so old entries become unreachable and age
+out. Updating one book therefore evicts book lists, author lists (they
+nest books), that book's detail and its author's detail, while every
+other detail response stays cached.
+
+Tokens are replaced when the write's transaction commits, never before.
+Invalidation is driven by the model signals in api.signals. Code paths
+that bypass signals (bulk_create, bulk_update, queryset.update) must call
+invalidate_books() / invalidate_authors() themselves. Wrap multi-row
+writes (e.g. an Author delete that cascades to its books) in
+batch_invalidation() so the scopes of every per-row signal are replaced
+with one cache write instead of one per row.
+
+Works with any Django cache backend; configure API_CACHE_ALIAS and
+API_CACHE_TIMEOUT in settings.
+"""
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .models import Book
+
+
+KEY_PREFIX = 'api'
+
+_pending = threading.local()
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def get_generations(scopes):
+    """
+    Return the current token for each scope, creating missing ones.
+    """
+    cache = get_cache()
+    keys = {scope: f'{KEY_PREFIX}:gen:{scope}' for scope in scopes}
+    found = cache.get_many(keys.values())
+    generations = []
+    for scope in scopes:
+        key = keys[scope]
+        if key not in found:
+            # add() keeps a token another process created in the meantime;
+            # backends that store nothing (DummyCache) get the new token
+            token = uuid.uuid4().hex
+            cache.add(key, token, timeout=None)
+            found[key] = cache.get(key, token)
+        generations.append(found[key])
+    return generations
+
+
+def bump_generations(scopes):
+    """
+    Replace the tokens of ``scopes`` once the current transaction commits
+    (right away outside a transaction). Bumping earlier would let a
+    concurrent read cache the rows from before the commit under the new
+    token, where they would stay until they time out.
+
+    Inside batch_invalidation() the scopes are queued instead.
+    """
+    pending = getattr(_pending, 'scopes', None)
+    if pending is not None:
+        pending.update(scopes)
+        return
+    if scopes:
+        keys = [f'{KEY_PREFIX}:gen:{scope}' for scope in scopes]
+        transaction.on_commit(
+            lambda: get_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        )
+
+
+@contextmanager
+def batch_invalidation():
+    """
+    Run the block in a transaction and replace the tokens of every scope
+    it invalidated with one cache write once it commits. Nested use joins
+    the outer batch.
+    """
+    if getattr(_pending, 'scopes', None) is not None:
+        yield
+        return
+    _pending.scopes = set()
+    try:
+        # No savepoint, as in batch_changes(): an error inside rolls back
+        # the enclosing transaction with the write anyway
+        with transaction.atomic(savepoint=False):
+            yield
+            scopes, _pending.scopes = _pending.scopes, None
+            bump_generations(scopes)
+    finally:
+        _pending.scopes = None
+
+
+def book_scopes(book):
+    scopes = {f'book:{book.pk}', f'author:{book.author_id}'}
+    loaded_author_id = getattr(book, '_loaded_values', {}).get('author_id')
+    if loaded_author_id is not None:
+        # The book moved away from this author
+        scopes.add(f'author:{loaded_author_id}')
+    return scopes
+
+
+def invalidate_books(books):
+    """
+    Evict cached responses that could contain any of ``books``.
+    """
+    scopes = {'book-list', 'author-list'}
+    for book in books:
+        scopes |= book_scopes(book)
+    bump_generations(scopes)
+
+
+def invalidate_authors(authors, created=False):
+    """
+    Evict cached responses that could contain any of ``authors``.
+
+    Book lists can be filtered and searched by author name, and book
+    details can expand the author, so they are evicted too unless the
+    authors are brand new (and have no books yet).
+    """
+    scopes = {'author-list'} | {f'author:{author.pk}' for author in authors}
+    if not created:
+        scopes.add('book-list')
+        # Book details embed the author with ?expand=author
+        books = Book.objects.filter(author__in=[author.pk for author in authors]).values_list('pk', flat=True)
+        scopes |= {f'book:{pk}' for pk in books}
+    bump_generations(scopes)
+
+
+class CachedResponseMixin:
+    """
+    Serve list/retrieve responses from the cache.
+
+    Set ``cache_scope`` to the resource name ('book' or 'author'). Only
+    200 responses are cached; the response data is stored, so renderers
+    and content negotiation still run per request.
+    """
+    cache_scope = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            [f'{self.cache_scope}-list'], super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.cached_response(
+            [f'{self.cache_scope}:{pk}'], super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, scopes, handler, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_response_cache_key(request, scopes)
+        # A client pinned to the primary after a write (read-your-writes,
+        # see advanced_api_project.routers) must not get a response that
+        # was built from a lagging replica
+        data = None if getattr(request, 'db_pinned', False) else cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, 'API_CACHE_TIMEOUT', 300))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_response_cache_key(self, request, scopes):
+        parts = [
+            type(self).__name__,
+            request.get_host(),
+            request.accepted_renderer.format,
+            repr(sorted(self.kwargs.items())),
+            self.normalize_query_params(request),
+            *get_generations(scopes),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+        return f'{KEY_PREFIX}:response:{digest}'
+
+    @staticmethod
+    def normalize_query_params(request):
+        """
+        Sorted, de-duplicated query string without empty values, so
+        ``?a=1&b=`` and ``?a=1`` share a cache entry.
+        """
+        params = []
+        for key in sorted(request.query_params):
+            values = [value for value in request.query_params.getlist(key) if value != '']
+            if values:
+                params.append((key, values))
+        return repr(params)
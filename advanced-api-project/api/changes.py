@@ -0,0 +1,181 @@
+"""
+Change log behind the /api/changes/ feed.
+
+Every write to a Book or Author appends a Change row (resource, id,
+action) in the same transaction as the write. Clients sync incrementally
+by asking for the changes after the last token they saw.
+
+Signals record save(), delete() and queryset.delete(), including the
+CASCADE from Author to Book. The bulk code paths (bulk_create,
+bulk_update) call record_changes() themselves. Wrap multi-row writes in
+batch_changes() so the per-row signals are written with one INSERT.
+
+changes_after() returns only the newest change of each row, so a client
+that is far behind gets one entry per changed row, not the full history.
+For the same reason, older entries that a newer change to the same row
+replaces carry no information: compact_changes() deletes them, and any
+token stays valid afterwards.
+
+Tokens are Change ids, so a sync is only gap-free if no change with a
+lower id commits after a client has read a higher one. SQLite runs one
+writer at a time, so its ids commit in order. On PostgreSQL a sequence
+value is taken at INSERT and two transactions can commit in the other
+order; changes_after() therefore holds back the changes of the last
+CHANGE_FEED_SAFETY_WINDOW seconds (and every id after them), so a
+transaction that records its changes less than that long before it
+commits is never skipped. batch_changes() records them just before the
+commit. The window also has to cover clock skew between app servers.
+
+Each transaction that records changes also increments the
+ResourceVersion row of the resources it touched, once it has committed
+(see bump_versions()); api.conditional builds the list ETag and
+Last-Modified from those rows.
+"""
+import threading
+from contextlib import contextmanager
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Min, OuterRef
+from django.utils import timezone
+
+from .models import Change, ResourceVersion
+
+
+_pending = threading.local()
+
+
+def record_changes(resource, object_ids, action):
+    """
+    Append one ``action`` Change per id, or queue them when inside
+    batch_changes().
+    """
+    entries = [(resource, pk, action) for pk in object_ids if pk is not None]
+    if not entries:
+        return
+    pending = getattr(_pending, 'entries', None)
+    if pending is not None:
+        pending.extend(entries)
+        return
+    save_changes(entries)
+
+
+def save_changes(entries):
+    Change.objects.bulk_create(
+        [Change(resource=resource, object_id=pk, action=action) for resource, pk, action in entries]
+    )
+    bump_versions({resource for resource, _, _ in entries})
+
+
+def bump_versions(resources):
+    """
+    Increment the ResourceVersion of each resource once the current
+    transaction commits (right away outside a transaction).
+
+    Bumping inside the writer's transaction would hold the lock on the
+    resource's one counter row until the commit, so on PostgreSQL every
+    concurrent writer to the resource would wait for the others. After
+    the commit the UPDATE is a statement of its own. A conditional GET
+    that lands between the two still sees the old validators and may get
+    a 304 for that instant; the next one sees the new version.
+    """
+    pending = getattr(_pending, 'versions', None)
+    if pending is None:
+        pending = _pending.versions = set()
+    pending.update(resources)
+    # Every batch registers a callback, the first to run bumps them all.
+    # Resources left over from a transaction that rolled back are bumped
+    # with the next commit, which only costs clients a revalidation.
+    transaction.on_commit(flush_versions)
+
+
+def flush_versions():
+    resources = sorted(getattr(_pending, 'versions', None) or ())
+    _pending.versions = set()
+    if not resources:
+        return
+    now = timezone.now()
+    updated = ResourceVersion.objects.filter(resource__in=resources).update(
+        version=F('version') + 1, changed_at=now,
+    )
+    if updated < len(resources):
+        # The migration seeds the rows; this only runs after they were
+        # removed (e.g. a flushed test database)
+        ResourceVersion.objects.bulk_create(
+            [ResourceVersion(resource=resource, version=1, changed_at=now) for resource in resources],
+            ignore_conflicts=True,
+        )
+
+
+def resource_versions(resources):
+    """
+    ``{resource: (version, changed_at)}`` for each resource that has been written.
+    """
+    rows = ResourceVersion.objects.filter(resource__in=resources).values_list('resource', 'version', 'changed_at')
+    return {resource: (version, changed_at) for resource, version, changed_at in rows}
+
+
+@contextmanager
+def batch_changes():
+    """
+    Run the block in a transaction and write every change it recorded with
+    one INSERT, just before committing. Nested use joins the outer batch.
+    """
+    if getattr(_pending, 'entries', None) is not None:
+        yield
+        return
+    _pending.entries = []
+    try:
+        # No savepoint: an error inside marks any enclosing transaction for
+        # rollback, which is what the write paths using this want anyway
+        with transaction.atomic(savepoint=False):
+            yield
+            entries, _pending.entries = _pending.entries, None
+            if entries:
+                save_changes(entries)
+    finally:
+        _pending.entries = None
+
+
+def superseded():
+    """
+    Condition matching Change rows that a newer change to the same row replaces.
+    """
+    return Exists(Change.objects.filter(
+        resource=OuterRef('resource'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'),
+    ))
+
+
+def changes_after(token, resources=None):
+    """
+    The newest change of every row changed after ``token``, oldest first,
+    up to the first change still inside the safety window.
+    """
+    changes = Change.objects.filter(id__gt=token)
+    window = getattr(settings, 'CHANGE_FEED_SAFETY_WINDOW', 0)
+    if window:
+        # A lower id may still be uncommitted while this one is recent
+        cutoff = timezone.now() - timedelta(seconds=window)
+        unsettled = Change.objects.filter(changed_at__gt=cutoff).aggregate(first=Min('id'))['first']
+        if unsettled is not None:
+            changes = changes.filter(id__lt=unsettled)
+    changes = changes.exclude(superseded())
+    if resources:
+        changes = changes.filter(resource__in=resources)
+    return changes.order_by('id')
+
+
+def compact_changes(before, batch_size=5000):
+    """
+    Delete Change rows recorded before ``before`` that a newer change to
+    the same row replaces. Returns the number of rows deleted.
+    """
+    candidates = Change.objects.filter(changed_at__lt=before).filter(superseded()).order_by()
+    deleted = 0
+    while True:
+        ids = list(candidates.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Change.objects.filter(pk__in=ids).delete()[0]
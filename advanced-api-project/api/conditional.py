@@ -0,0 +1,114 @@
+"""
+Conditional GET (ETag / Last-Modified) for the Book and Author read views.
+
+Validators are computed from change markers with one small query, never
+from the response body:
+
+- list:   the ResourceVersion row of the resource and of every relation
+          the response depends on (books filter, search and order on the
+          author's name; authors render their books). Every write path
+          bumps the row through api.changes when it commits, deletes
+          included, so both the ETag and Last-Modified move on any write.
+- detail: the row's updated_at, plus that of inline forward relations
+          (?expand=author) and MAX(updated_at)/COUNT over inline reverse
+          relations (an author's books). Last-Modified also takes the
+          reverse relation's ResourceVersion.changed_at, since deleting
+          a book does not move MAX(updated_at).
+
+The ETag also covers the query string and the negotiated format, since
+those change the representation. When If-None-Match / If-Modified-Since
+match, a 304 is returned before any filtering, pagination or
+serialization runs.
+"""
+import calendar
+import hashlib
+from datetime import datetime
+
+from django.db.models import Count, Max, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .caching import CachedResponseMixin
+from .changes import resource_versions
+from .models import ResourceVersion
+
+
+class ConditionalGetMixin:
+    """
+    Add strong ETag and Last-Modified headers to list/retrieve responses
+    and answer conditional requests with 304 Not Modified.
+
+    ``conditional_related`` names the relations the response depends on:
+    forward foreign keys (e.g. ('author',) for books) and reverse
+    relations rendered inline (e.g. ('books',) for authors).
+    """
+    conditional_related = ()
+
+    def list(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        resources = [model._meta.model_name] + [
+            model._meta.get_field(name).related_model._meta.model_name for name in self.conditional_related
+        ]
+        versions = resource_versions(resources)
+        marker = {}
+        for resource in resources:
+            marker[f'{resource}_version'], marker[f'{resource}_changed_at'] = versions.get(resource, (None, None))
+        return self.conditional_response(request, [marker], super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        marker = self.row_marker(self.get_queryset().model, pk)
+        if marker is None:
+            # Let the normal lookup produce the 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(request, [marker], super().retrieve, *args, **kwargs)
+
+    def row_marker(self, model, pk):
+        fields = ['updated_at']
+        annotations = {}
+        for name in self.conditional_related:
+            field = model._meta.get_field(name)
+            if field.many_to_one:
+                fields.append(f'{name}__updated_at')
+                continue
+            annotations[f'{name}_modified'] = Max(f'{name}__updated_at')
+            annotations[f'{name}_rows'] = Count(name)
+            annotations[f'{name}_changed_at'] = Subquery(
+                ResourceVersion.objects.filter(resource=field.related_model._meta.model_name).values('changed_at')
+            )
+        try:
+            return (
+                model._default_manager.filter(pk=pk)
+                .annotate(**annotations)
+                .values(*fields, *annotations)
+                .first()
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def conditional_response(self, request, markers, handler, *args, **kwargs):
+        etag = self.compute_etag(request, markers)
+        modified = [value for marker in markers for value in marker.values() if isinstance(value, datetime)]
+        last_modified = calendar.timegm(max(modified).utctimetuple()) if modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def compute_etag(self, request, markers):
+        parts = [
+            type(self).__name__,
+            request.get_host(),
+            request.accepted_renderer.format,
+            CachedResponseMixin.normalize_query_params(request),
+            repr(sorted(self.kwargs.items())),
+        ]
+        for marker in markers:
+            parts.extend(f'{key}={value!r}' for key, value in sorted(marker.items()))
+        return '"%s"' % hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
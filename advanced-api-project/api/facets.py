@@ -0,0 +1,87 @@
+"""
+Facet counts for book search results.
+
+facet_counts() takes a Book queryset after BookFilter and the search
+filter have run, and counts its books per publication decade and per
+author:
+
+- PostgreSQL: one ``GROUP BY GROUPING SETS`` query for both facets
+- other backends (SQLite has no grouping sets): one ``GROUP BY`` query
+  per facet
+
+Decades are listed in order. Authors are listed by count, highest first,
+and cut to the ``size`` largest.
+"""
+from django.db import connections
+from django.db.models import Count, F
+
+
+# Backends that support GROUP BY GROUPING SETS
+GROUPING_SETS_VENDORS = {'postgresql'}
+
+# Integer division: 1997 -> 1990
+DECADE = F('publication_year') / 10 * 10
+
+
+def facet_counts(queryset, size=10):
+    """
+    Return ``{'count': total, 'facets': {'decade': [...], 'author': [...]}}``
+    for the books in ``queryset``.
+    """
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor in GROUPING_SETS_VENDORS:
+        decades, authors = grouping_sets_counts(queryset)
+    else:
+        decades, authors = group_by_counts(queryset, size)
+    authors = sorted(authors, key=lambda row: (-row[2], row[1]))[:size]
+
+    return {
+        'count': sum(count for _, count in decades),
+        'facets': {
+            'decade': [
+                {'value': decade, 'label': f'{decade}s', 'count': count}
+                for decade, count in decades
+            ],
+            'author': [
+                {'value': author_id, 'label': name, 'count': count}
+                for author_id, name, count in authors
+            ],
+        },
+    }
+
+
+def group_by_counts(queryset, size):
+    """
+    One aggregate query per facet.
+    """
+    decades = queryset.values(decade=DECADE).annotate(count=Count('pk')).order_by('decade')
+    authors = (
+        queryset.values('author_id', 'author__name')
+        .annotate(count=Count('pk'))
+        .order_by('-count', 'author__name')[:size]
+    )
+    return (
+        [(row['decade'], row['count']) for row in decades],
+        [(row['author_id'], row['author__name'], row['count']) for row in authors],
+    )
+
+
+def grouping_sets_counts(queryset):
+    """
+    Both facets from a single scan of the filtered books.
+    """
+    books = queryset.values(year=F('publication_year'), author_ref=F('author_id'), author_label=F('author__name'))
+    sql, params = books.query.get_compiler(queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            'SELECT GROUPING(f.author_ref), f.year / 10 * 10, f.author_ref, f.author_label, COUNT(*) '
+            f'FROM ({sql}) f '
+            'GROUP BY GROUPING SETS ((f.year / 10 * 10), (f.author_ref, f.author_label))',
+            params,
+        )
+        rows = cursor.fetchall()
+
+    # GROUPING(author_ref) is 1 on the rows grouped by decade only
+    decades = sorted((decade, count) for by_decade, decade, _, _, count in rows if by_decade)
+    authors = [(author_id, name, count) for by_decade, _, author_id, name, count in rows if not by_decade]
+    return decades, authors
@@ -0,0 +1,42 @@
+"""
+Opt-in fast path for list endpoints.
+
+When API_FAST_LIST_SERIALIZATION is enabled, list views that set
+``values_serializer_class`` fetch ``values()`` rows and build the response
+from plain dicts instead of model instances run through a ModelSerializer.
+The rendered JSON is byte-for-byte the same; see BookValuesSerializer and
+the benchmark_book_serializers management command.
+"""
+from django.conf import settings
+from rest_framework.response import Response
+
+
+class ValuesListMixin:
+    """
+    Serve list() from values() rows when the fast path is enabled.
+    """
+    values_serializer_class = None
+
+    def use_values_serializer(self):
+        return (
+            self.values_serializer_class is not None
+            and getattr(settings, 'API_FAST_LIST_SERIALIZATION', False)
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class
+        queryset = self.filter_queryset(self.get_queryset())
+        # Keep ordering keys (author__name, search_rank, ...) in the rows so
+        # keyset pagination can read the cursor position from them.
+        ordering_keys = [
+            field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)
+        ]
+        rows = serializer.values(queryset, *ordering_keys)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(rows))
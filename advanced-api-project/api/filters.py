@@ -1,5 +1,7 @@
 import django_filters
-from .models import Book
+from rest_framework import filters
+from .models import Author, Book
+from .search import get_search_backend, parse_terms
 
 class BookFilter(django_filters.FilterSet):
     """
@@ -82,4 +84,93 @@ class BookFilter(django_filters.FilterSet):
             'publication_year': ['exact', 'gt', 'lt', 'gte', 'lte'],
             'title': ['exact', 'icontains', 'istartswith'],
             'author__name': ['exact', 'icontains'],
-        }
\ No newline at end of file
+        }
+
+
+class AuthorFilter(django_filters.FilterSet):
+    """
+    Filter set for the Author list, on the denormalized AuthorStats fields.
+
+    Provides filtering capabilities for:
+    - Exact and range filtering on book_count
+    - Range filtering on the first (min_year) and last (max_year) publication year
+    """
+
+    book_count = django_filters.NumberFilter(
+        field_name='stats__book_count',
+        lookup_expr='exact',
+        help_text="Filter by exact number of books"
+    )
+
+    book_count__gte = django_filters.NumberFilter(
+        field_name='stats__book_count',
+        lookup_expr='gte',
+        help_text="Filter by number of books greater than or equal to"
+    )
+
+    book_count__lte = django_filters.NumberFilter(
+        field_name='stats__book_count',
+        lookup_expr='lte',
+        help_text="Filter by number of books less than or equal to"
+    )
+
+    min_year__gte = django_filters.NumberFilter(
+        field_name='stats__min_year',
+        lookup_expr='gte',
+        help_text="Filter by first publication year greater than or equal to"
+    )
+
+    min_year__lte = django_filters.NumberFilter(
+        field_name='stats__min_year',
+        lookup_expr='lte',
+        help_text="Filter by first publication year less than or equal to"
+    )
+
+    max_year__gte = django_filters.NumberFilter(
+        field_name='stats__max_year',
+        lookup_expr='gte',
+        help_text="Filter by last publication year greater than or equal to"
+    )
+
+    max_year__lte = django_filters.NumberFilter(
+        field_name='stats__max_year',
+        lookup_expr='lte',
+        help_text="Filter by last publication year less than or equal to"
+    )
+
+    class Meta:
+        model = Author
+        fields = []
+
+
+class BookSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that delegates ?search= to the configured search backend
+    (see api.search) instead of scanning with icontains.
+
+    Words are matched as prefixes and "quoted text" as a phrase; every
+    term must match the title or the author name.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        terms = parse_terms(query)
+        if not terms:
+            return queryset
+        return get_search_backend(queryset.db).search(queryset, terms)
+
+
+class RankedOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that orders search results by relevance when the
+    client searched without asking for an explicit ?ordering=.
+    The view's default ordering is kept as the tiebreaker.
+    """
+    rank_field = 'search_rank'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if (self.rank_field in queryset.query.annotations
+                and not request.query_params.get(self.ordering_param)):
+            ordering = [self.rank_field, *(ordering or [])]
+        return ordering
\ No newline at end of file
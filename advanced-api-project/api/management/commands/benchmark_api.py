@@ -0,0 +1,137 @@
+import json
+import platform
+import random
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api import urls
+from api.benchmarking import Workload, analyze, compare_results, run_workload, seed_catalog
+from api.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test every endpoint in api.urls with a mix of filters, searches, '
+        'orderings and writes, and report p50/p95/p99 latency, queries per '
+        'request and rows/sec. Save the results as a baseline and compare '
+        'later runs against it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=10000, metavar='BOOKS',
+            help='Seed this many synthetic books first (default: 10000, 0 to use existing data). '
+                 'Everything, including writes made by the benchmark, is rolled back afterwards.',
+        )
+        parser.add_argument('--requests', type=int, default=30, help='Requests per scenario (default: 30).')
+        parser.add_argument('--random-seed', type=int, default=0, help='Seed for the request mix (default: 0).')
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep the response cache enabled (default: measure uncached requests).',
+        )
+        parser.add_argument('--save', metavar='PATH', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', metavar='PATH', help='Compare against a baseline JSON file.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed p95 slowdown against the baseline as a fraction (default: 0.25).',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=5.0,
+            help='Ignore p95 slowdowns smaller than this many milliseconds (default: 5).',
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error when --compare finds a regression.',
+        )
+        parser.add_argument('--database', default='default', help='Database alias (default: default).')
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        if requests < 1:
+            raise CommandError('--requests must be at least 1.')
+        using = options['database']
+
+        with transaction.atomic(using=using):
+            if options['seed']:
+                authors, books = seed_catalog(options['seed'])
+                analyze(using)
+                self.stdout.write(f'Seeded catalog: {authors} authors, {books} books')
+            if Book.objects.count() < requests * 2:
+                raise CommandError('Not enough books for this many requests. Use a larger --seed.')
+
+            workload = Workload(random.Random(options['random_seed']), requests)
+            self.check_coverage(workload)
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user('benchmark-api', password=None))
+
+            overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+            if not options['with_cache']:
+                overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            with override_settings(**overrides):
+                results = run_workload(client, workload, requests, using=using)
+            meta = {
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'books': Book.objects.count(),
+                'requests_per_scenario': requests,
+                'cache': options['with_cache'],
+                'database': connections[using].vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            }
+            transaction.set_rollback(True, using=using)
+
+        self.report(results)
+        report = {'meta': meta, 'results': results}
+        if options['save']:
+            with open(options['save'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved results to {options["save"]}')
+        if options['compare']:
+            self.compare(options['compare'], report, options)
+
+    @staticmethod
+    def check_coverage(workload):
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+        covered = {name for name, _, _ in workload.scenarios()}
+        missing = sorted(names - covered)
+        if missing:
+            raise CommandError(f'No benchmark scenario for: {", ".join(missing)}')
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"scenario":<36} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"rows/s":>11}  status'
+        )
+        for scenario, row in results.items():
+            statuses = ','.join(f'{code}x{count}' for code, count in row['statuses'].items())
+            self.stdout.write(
+                f'{scenario:<36} {row["p50_ms"]:>9.2f} {row["p95_ms"]:>9.2f} {row["p99_ms"]:>9.2f} '
+                f'{row["queries_per_request"]:>8.1f} {row["rows_per_sec"]:>11,.0f}  {statuses}'
+            )
+
+    def compare(self, path, report, options):
+        try:
+            with open(path) as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+        if baseline['meta'].get('books') != report['meta']['books']:
+            self.stdout.write(self.style.WARNING(
+                f'Baseline was recorded with {baseline["meta"].get("books")} books, this run has '
+                f'{report["meta"]["books"]}; latencies are not comparable.'
+            ))
+        regressions = list(compare_results(
+            baseline['results'], report['results'], options['tolerance'], options['min_delta_ms'],
+        ))
+        for scenario, metric, old, new in regressions:
+            self.stdout.write(self.style.ERROR(f'REGRESSION {scenario}: {metric} {old} -> {new}'))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {path}.'))
+        elif options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regressions against {path}.')
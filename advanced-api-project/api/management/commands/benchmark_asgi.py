@@ -0,0 +1,114 @@
+import asyncio
+import json
+import platform
+import random
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from api.benchmarking import analyze, read_mix, run_asgi, seed_catalog
+from api.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync Book/Author read views with their async variants '
+        '(api.async_views) under the ASGI handler: send the same request mix '
+        'at several concurrency levels and report requests/sec, p50/p95/p99 '
+        'latency and peak thread count.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=5000, metavar='BOOKS',
+            help='Seed this many synthetic books into a throwaway test database '
+                 '(default: 5000, 0 to benchmark the configured database as is).',
+        )
+        parser.add_argument('--requests', type=int, default=300, help='Requests per run (default: 300).')
+        parser.add_argument(
+            '--concurrency', default='1,10,50',
+            help='Comma-separated numbers of concurrent clients (default: 1,10,50).',
+        )
+        parser.add_argument('--random-seed', type=int, default=0, help='Seed for the request mix (default: 0).')
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep the response cache of the sync views enabled (default: measure uncached requests).',
+        )
+        parser.add_argument('--save', metavar='PATH', help='Write the results to this JSON file.')
+        parser.add_argument('--database', default='default', help='Database alias (default: default).')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers.')
+        if not levels or min(levels) < 1:
+            raise CommandError('--concurrency levels must be at least 1.')
+
+        # The ASGI handler runs requests in worker threads with their own
+        # connections, so the data has to be committed: seed a throwaway
+        # test database instead of a rolled-back transaction.
+        connection = connections[options['database']]
+        old_name = None
+        if options['seed']:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if options['seed']:
+                authors, books = seed_catalog(options['seed'])
+                analyze(options['database'])
+                self.stdout.write(f'Seeded throwaway database: {authors} authors, {books} books')
+            if not Book.objects.exists():
+                raise CommandError('No books to read. Use --seed.')
+            results = self.run(options, levels)
+            meta = {
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'books': Book.objects.count(),
+                'requests': options['requests'],
+                'cache': options['with_cache'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            }
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(results)
+        if options['save']:
+            with open(options['save'], 'w') as fh:
+                json.dump({'meta': meta, 'results': results}, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved results to {options["save"]}')
+
+    def run(self, options, levels):
+        requests = read_mix(random.Random(options['random_seed']), options['requests'])
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['with_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        results = []
+        with override_settings(**overrides):
+            application = get_asgi_application()
+            for concurrency in levels:
+                for views in ('sync', 'async'):
+                    result = asyncio.run(run_asgi(application, requests[views], concurrency))
+                    results.append({'views': views, **result})
+        return results
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"concurrency":>11} {"views":<6} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} '
+            f'{"p99 ms":>9} {"threads":>8}  status'
+        )
+        for row in results:
+            statuses = ','.join(f'{code}x{count}' for code, count in row['statuses'].items())
+            self.stdout.write(
+                f'{row["concurrency"]:>11} {row["views"]:<6} {row["req_per_sec"]:>9,.1f} {row["p50_ms"]:>9.2f} '
+                f'{row["p95_ms"]:>9.2f} {row["p99_ms"]:>9.2f} {row["peak_threads"]:>8}  {statuses}'
+            )
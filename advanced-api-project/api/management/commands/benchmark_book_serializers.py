@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarking import seed_catalog
+from api.models import Book
+from api.serializers import BookSerializer, BookValuesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of BookSerializer against the values() fast path '
+        '(BookValuesSerializer) for list pages, and check the JSON is identical.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per page (default: 1000).')
+        parser.add_argument('--repeat', type=int, default=20, help='Pages rendered per path (default: 20).')
+        parser.add_argument(
+            '--seed', type=int, default=0, metavar='BOOKS',
+            help='Seed this many synthetic books first. The data is rolled back afterwards.',
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            if options['seed']:
+                seed_catalog(options['seed'])
+            queryset = Book.objects.select_related('author').order_by('title', 'id')
+            if not queryset.exists():
+                raise CommandError('No books to render. Use --seed to create some.')
+
+            renderer = JSONRenderer()
+            model_body, model_seconds = self.measure(repeat, lambda: renderer.render(
+                BookSerializer(list(queryset[:rows]), many=True).data
+            ))
+            values_body, values_seconds = self.measure(repeat, lambda: renderer.render(
+                BookValuesSerializer.to_representation(BookValuesSerializer.values(queryset)[:rows])
+            ))
+            transaction.set_rollback(True)
+
+        if model_body != values_body:
+            raise CommandError('The fast path rendered different JSON than BookSerializer.')
+
+        page_rows = model_body.count(b'"id":')
+        model_rate = page_rows * repeat / model_seconds
+        values_rate = page_rows * repeat / values_seconds
+        self.stdout.write(f'{page_rows} rows/page, {repeat} pages per path, identical output')
+        self.stdout.write(f'BookSerializer        {model_rate:>12,.0f} rows/sec')
+        self.stdout.write(f'BookValuesSerializer  {values_rate:>12,.0f} rows/sec')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {values_rate / model_rate:.1f}x'))
+
+    @staticmethod
+    def measure(repeat, render):
+        body = render()  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = render()
+        return body, time.perf_counter() - start
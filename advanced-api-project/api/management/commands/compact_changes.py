@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.changes import compact_changes
+from api.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact the change feed: delete entries older than --older-than days '
+        'that a newer change to the same book or author replaces. Every '
+        'row keeps its latest entry, so sync tokens stay valid.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, default=7, metavar='DAYS',
+            help='Only compact entries recorded more than this many days ago (default: 7).',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per DELETE (default: 5000).')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        before = timezone.now() - timedelta(days=options['older_than'])
+        deleted = compact_changes(before, batch_size=options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} superseded changes; {Change.objects.count()} remain.')
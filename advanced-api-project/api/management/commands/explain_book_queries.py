@@ -0,0 +1,235 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from api.benchmarking import analyze, seed_catalog
+from api.filters import BookFilter
+from api.models import Book
+from api.views import BookListView
+
+
+# One representative value per BookFilter lookup
+FILTER_CASES = {
+    '(none)': {},
+    'publication_year': {'publication_year': 1990},
+    'publication_year__gt': {'publication_year__gt': 2000},
+    'publication_year__lt': {'publication_year__lt': 1850},
+    'publication_year__gte': {'publication_year__gte': 2000},
+    'publication_year__lte': {'publication_year__lte': 1850},
+    'publication_year range': {'publication_year__gte': 1990, 'publication_year__lte': 1995},
+    'title': {'title': 'river'},
+    'title__exact': {'title__exact': 'Silver River'},
+    'title__startswith': {'title__startswith': 'Silver'},
+    'author__name': {'author__name': 'garcia'},
+    'author__name__exact': {'author__name__exact': 'Ada Garcia 7'},
+}
+
+# Every (filter, ordering) combination whose plan scans or sorts: what it
+# may do ('sort' allows only a sort after an index lookup, 'scan' also a
+# full scan) and why that is accepted. Anything else is reported as
+# unexpected and fails --fail-on-scan.
+ACCEPTED = {
+    # No filter: the ordering index (or the rowid) is walked in order and the
+    # walk stops at the page size.
+    ('(none)', 'id'): ('scan', 'rowid walk, stops at LIMIT'),
+    ('(none)', '-id'): ('scan', 'rowid walk, stops at LIMIT'),
+    ('(none)', 'title'): ('scan', 'book_title_id_idx walk, stops at LIMIT'),
+    ('(none)', '-title'): ('scan', 'book_title_id_idx walk, stops at LIMIT'),
+    ('(none)', 'publication_year'): ('scan', 'book_year_id_idx walk, stops at LIMIT'),
+    ('(none)', '-publication_year'): ('scan', 'book_year_id_idx walk, stops at LIMIT'),
+    ('(none)', 'author__name'): ('scan', "author_name_id_idx walk, sorts each name's books by id"),
+    ('(none)', '-author__name'): ('scan', "author_name_id_idx walk, sorts each name's books by id"),
+
+    # One year's books come from book_year_id_idx; the order is on another table.
+    ('publication_year', 'author__name'): ('sort', "sorts one year's books by author name"),
+    ('publication_year', '-author__name'): ('sort', "sorts one year's books by author name"),
+
+    # No index serves a range on the year and an order on another column: the
+    # matches are sorted.
+    ('publication_year__gt', 'id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__gt', '-id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__gt', 'title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__gt', '-title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__gt', 'author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__gt', '-author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__lt', 'id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__lt', '-id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__lt', 'title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__lt', '-title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__lt', 'author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__lt', '-author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__gte', 'id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__gte', '-id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__gte', 'title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__gte', '-title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__gte', 'author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__gte', '-author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__lte', 'id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__lte', '-id'): ('scan', 'year range: SQLite joins from a scan of api_author, then sorts by id'),
+    ('publication_year__lte', 'title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__lte', '-title'): ('sort', 'year range, sorted by title'),
+    ('publication_year__lte', 'author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year__lte', '-author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year range', 'id'): ('sort', 'year range, sorted by id'),
+    ('publication_year range', '-id'): ('sort', 'year range, sorted by id'),
+    ('publication_year range', 'title'): ('sort', 'year range, sorted by title'),
+    ('publication_year range', '-title'): ('sort', 'year range, sorted by title'),
+    ('publication_year range', 'author__name'): ('sort', 'year range, sorted by author name'),
+    ('publication_year range', '-author__name'): ('sort', 'year range, sorted by author name'),
+
+    # Case-insensitive substring lookups cannot use a B-tree index;
+    # ?search= is the indexed way to answer them (see api.search).
+    ('title', 'id'): ('scan', 'substring match, use ?search='),
+    ('title', '-id'): ('scan', 'substring match, use ?search='),
+    ('title', 'title'): ('scan', 'substring match, use ?search='),
+    ('title', '-title'): ('scan', 'substring match, use ?search='),
+    ('title', 'publication_year'): ('scan', 'substring match, use ?search='),
+    ('title', '-publication_year'): ('scan', 'substring match, use ?search='),
+    ('title', 'author__name'): ('scan', 'substring match, use ?search='),
+    ('title', '-author__name'): ('scan', 'substring match, use ?search='),
+
+    # Equality on an almost unique column: the few matches are sorted.
+    ('title__exact', 'publication_year'): ('sort', 'sorts the few books with this title by year'),
+    ('title__exact', '-publication_year'): ('sort', 'sorts the few books with this title by year'),
+    ('title__exact', 'author__name'): ('sort', 'sorts the few books with this title by author name'),
+    ('title__exact', '-author__name'): ('sort', 'sorts the few books with this title by author name'),
+
+    # The prefix is found with book_title_nocase_idx (migration 0010), whose
+    # NOCASE order is not the BINARY order of ?ordering=title, so the
+    # matches are sorted.
+    ('title__startswith', 'id'): ('sort', 'book_title_nocase_idx prefix range, sorted by id'),
+    ('title__startswith', '-id'): ('sort', 'book_title_nocase_idx prefix range, sorted by id'),
+    ('title__startswith', 'title'): ('sort', 'book_title_nocase_idx prefix range, sorted by title'),
+    ('title__startswith', '-title'): ('sort', 'book_title_nocase_idx prefix range, sorted by title'),
+    ('title__startswith', 'publication_year'): ('sort', 'book_title_nocase_idx prefix range, sorted by year'),
+    ('title__startswith', '-publication_year'): ('sort', 'book_title_nocase_idx prefix range, sorted by year'),
+    ('title__startswith', 'author__name'): ('sort', 'book_title_nocase_idx prefix range, sorted by author name'),
+    ('title__startswith', '-author__name'): ('sort', 'book_title_nocase_idx prefix range, sorted by author name'),
+
+    # Substring lookups on the author name, as for title.
+    ('author__name', 'id'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', '-id'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', 'title'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', '-title'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', 'publication_year'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', '-publication_year'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', 'author__name'): ('scan', 'substring match on author name, use ?search='),
+    ('author__name', '-author__name'): ('scan', 'substring match on author name, use ?search='),
+
+    # Several authors can share a name; their books (found with
+    # book_author_title_idx) are merged with a sort.
+    ('author__name__exact', 'id'): ('sort', "merges same-named authors' books, sorted by id"),
+    ('author__name__exact', '-id'): ('sort', "merges same-named authors' books, sorted by id"),
+    ('author__name__exact', 'title'): ('sort', "merges same-named authors' books, sorted by title"),
+    ('author__name__exact', '-title'): ('sort', "merges same-named authors' books, sorted by title"),
+    ('author__name__exact', 'publication_year'): ('sort', "merges same-named authors' books, sorted by year"),
+    ('author__name__exact', '-publication_year'): ('sort', "merges same-named authors' books, sorted by year"),
+    ('author__name__exact', 'author__name'): ('sort', "merges same-named authors' books, sorted by author name"),
+    ('author__name__exact', '-author__name'): ('sort', "merges same-named authors' books, sorted by author name"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN for every BookFilter lookup combined with every ordering '
+        'allowed by BookListView and flag full scans and sorts that are not '
+        'listed as accepted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0, metavar='BOOKS',
+            help='Seed this many synthetic books first. The data is rolled back afterwards.',
+        )
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Exit with an error if any unexpected full scan is found.',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            if options['seed']:
+                authors, books = seed_catalog(options['seed'])
+                self.stdout.write(f'Seeded {books} books by {authors} authors.')
+            analyze(using)
+            rows = list(self.explain_all(using))
+            transaction.set_rollback(True, using=using)
+
+        unexpected = 0
+        for filter_name, ordering, plan, scans, sorts in rows:
+            allowed, reason = ACCEPTED.get((filter_name, ordering), (None, None))
+            if not (scans or sorts):
+                verdict = self.style.SUCCESS('index')
+            elif allowed == 'scan' or (allowed == 'sort' and not scans):
+                verdict = self.style.WARNING(f"{'scan' if scans else 'sort'} (accepted: {reason})")
+            else:
+                unexpected += 1
+                verdict = self.style.ERROR('FULL SCAN' if scans else 'SORT')
+            self.stdout.write(f'{filter_name:<24} {ordering:<20} {verdict}')
+            if options['verbosity'] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        self.stdout.write(f'{len(rows)} combinations checked, {unexpected} unexpected scans or sorts.')
+        if unexpected and options['fail_on_scan']:
+            raise CommandError(f'{unexpected} filter/ordering combinations use a full scan or a sort.')
+
+    def explain_all(self, using):
+        vendor = connections[using].vendor
+        page_size = BookListView.keyset_pagination_class.page_size
+        for filter_name, params in FILTER_CASES.items():
+            for field in BookListView.ordering_fields:
+                for ordering in (field, f'-{field}'):
+                    queryset = BookFilter(
+                        data=params,
+                        queryset=Book.objects.using(using).select_related('author'),
+                    ).qs
+                    # Same ORDER BY as keyset pagination: id tiebreaker in the
+                    # direction of the ordering field.
+                    tiebreaker = '-id' if ordering.startswith('-') else 'id'
+                    order_by = [ordering] if field == 'id' else [ordering, tiebreaker]
+                    plan = queryset.order_by(*order_by)[:page_size].explain()
+                    scans, sorts = self.inspect_plan(vendor, plan)
+                    yield filter_name, ordering, plan, scans, sorts
+
+    @staticmethod
+    def inspect_plan(vendor, plan):
+        """
+        Return (full scans, sorts) found in an EXPLAIN output.
+
+        Only index lookups (SQLite ``SEARCH``, PostgreSQL index scans with
+        an ``Index Cond``) count as index access. Walking a whole table or
+        index (``SCAN t``, ``SCAN t USING [COVERING] INDEX i``, a Seq Scan
+        or an index scan without a condition) is a scan, even when a LIMIT
+        may stop it early.
+        """
+        scans, sorts = [], []
+        lines = [line.strip() for line in plan.splitlines()]
+        for position, line in enumerate(lines):
+            if vendor == 'sqlite':
+                # Rows look like "<id> <parent> <notused> SCAN api_book ..."
+                if re.search(r'\bSCAN\b', line):
+                    scans.append(line)
+                if 'TEMP B-TREE' in line:
+                    sorts.append(line)
+            elif vendor == 'postgresql':
+                if 'Seq Scan' in line:
+                    scans.append(line)
+                elif 'Index Scan' in line or 'Index Only Scan' in line:
+                    # The node's details run until the next plan node
+                    details = []
+                    for detail in lines[position + 1:]:
+                        if detail.startswith('->'):
+                            break
+                        details.append(detail)
+                    if not any(detail.startswith('Index Cond') for detail in details):
+                        scans.append(line)
+                if line.startswith('->  Sort') or line.startswith('Sort '):
+                    sorts.append(line)
+            elif 'ALL' in line.split() or 'index' in line.split():
+                # MySQL-style "type: ALL" (table) / "type: index" (full index)
+                scans.append(line)
+        return scans, sorts
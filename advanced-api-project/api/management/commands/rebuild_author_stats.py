@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.stats import rebuild_author_stats, verify_author_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized AuthorStats table from api_book and '
+        'verify it matches a fresh aggregate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only verify the stored stats; exit with an error if any row is stale.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per upsert (default: 1000).')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            written = rebuild_author_stats(batch_size=options['batch_size'])
+            self.stdout.write(f'Rebuilt stats for {written} authors.')
+
+        mismatches = verify_author_stats()
+        for author_id, stored, expected in mismatches[:20]:
+            self.stdout.write(f'author {author_id}: stored {stored}, expected {expected}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} authors have stale stats.')
+        self.stdout.write(self.style.SUCCESS('Author stats are up to date.'))
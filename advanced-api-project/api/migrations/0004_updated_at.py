@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+from api.search import drop_search_triggers, install_search_index
+
+
+def drop_triggers(apps, schema_editor):
+    # Adding a NOT NULL column makes Django rebuild api_author and api_book
+    # on SQLite, which fails while the search index triggers reference them.
+    drop_search_triggers(schema_editor)
+
+
+def reinstall_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_book_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, reinstall_search_index),
+        migrations.AddField(
+            model_name='author',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, help_text='When the author was last changed'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, help_text='When the book was last changed'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(reinstall_search_index, drop_triggers),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Min
+
+
+def backfill_author_stats(apps, schema_editor):
+    Author = apps.get_model('api', 'Author')
+    AuthorStats = apps.get_model('api', 'AuthorStats')
+    rows = Author.objects.order_by().values('pk').annotate(
+        book_count=Count('books'),
+        min_year=Min('books__publication_year'),
+        max_year=Max('books__publication_year'),
+    )
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(author_id=row['pk'], book_count=row['book_count'],
+                        min_year=row['min_year'], max_year=row['max_year'])
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(help_text='Author these statistics belong to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.author')),
+                ('book_count', models.PositiveIntegerField(default=0, help_text='Number of books by the author')),
+                ('min_year', models.IntegerField(blank=True, help_text='Earliest publication year', null=True)),
+                ('max_year', models.IntegerField(blank=True, help_text='Latest publication year', null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'author stats',
+                'indexes': [models.Index(fields=['book_count', 'author'], name='authorstats_count_idx'), models.Index(fields=['min_year', 'author'], name='authorstats_min_year_idx'), models.Index(fields=['max_year', 'author'], name='authorstats_max_year_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+
+def backfill_changes(apps, schema_editor):
+    """
+    Record every existing row as created, so a feed read from the start
+    covers the whole catalog.
+    """
+    Change = apps.get_model('api', 'Change')
+    for resource, model in (('author', 'Author'), ('book', 'Book')):
+        ids = apps.get_model('api', model).objects.order_by('pk').values_list('pk', flat=True)
+        Change.objects.bulk_create(
+            (Change(resource=resource, object_id=pk, action='create') for pk in ids.iterator(chunk_size=2000)),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_author_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(help_text='Changed resource: book or author', max_length=20)),
+                ('object_id', models.BigIntegerField(help_text='Primary key of the changed row')),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], help_text='What happened to the row', max_length=6)),
+                ('changed_at', models.DateTimeField(auto_now_add=True, help_text='When the change was recorded')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['resource', 'object_id', 'id'], name='change_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_versions(apps, schema_editor):
+    ResourceVersion = apps.get_model('api', 'ResourceVersion')
+    ResourceVersion.objects.bulk_create(
+        [ResourceVersion(resource=resource, changed_at=timezone.now()) for resource in ('author', 'book')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersion',
+            fields=[
+                ('resource', models.CharField(help_text='Resource: book or author', max_length=20, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0, help_text='Incremented on every write')),
+                ('changed_at', models.DateTimeField(help_text='When the resource was last written')),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_resource_version'),
+    ]
+
+    operations = [
+        # Only the index goes: an AlterField would rebuild api_book on
+        # SQLite, which the search index triggers on it do not survive
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='book',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, help_text='Author of the book', on_delete=django.db.models.deletion.CASCADE, related_name='books', to='api.author'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS api_book_author_id_85dc432b',
+                    'CREATE INDEX api_book_author_id_85dc432b ON api_book (author_id)',
+                ),
+            ],
+        ),
+    ]
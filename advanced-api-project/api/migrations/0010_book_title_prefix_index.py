@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# ?title__startswith= is an istartswith lookup. Each backend needs its own
+# index for it, so the SQL is per vendor instead of a Meta.indexes entry:
+# - SQLite runs it as "title LIKE 'x%'", which uses an index on the
+#   NOCASE-collated column (LIKE is case-insensitive there)
+# - PostgreSQL runs "UPPER(title::text) LIKE UPPER('x%')", which needs a
+#   pattern_ops index on that expression unless the database uses the C
+#   collation
+# MySQL's default collations are case-insensitive, so book_title_id_idx
+# already serves it there.
+PREFIX_INDEX_SQL = {
+    'sqlite': 'CREATE INDEX IF NOT EXISTS book_title_nocase_idx ON api_book (title COLLATE NOCASE, id)',
+    'postgresql': 'CREATE INDEX IF NOT EXISTS book_title_upper_idx ON api_book (UPPER(title::text) varchar_pattern_ops, id)',
+}
+
+PREFIX_INDEX_NAMES = {
+    'sqlite': 'book_title_nocase_idx',
+    'postgresql': 'book_title_upper_idx',
+}
+
+
+def create_prefix_index(apps, schema_editor):
+    sql = PREFIX_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_prefix_index(apps, schema_editor):
+    name = PREFIX_INDEX_NAMES.get(schema_editor.connection.vendor)
+    if name:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_change_changed_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
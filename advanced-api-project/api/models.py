@@ -6,14 +6,24 @@ class Author(models.Model):
     
     Fields:
     - name: CharField to store the author's full name
+    - updated_at: Change marker, bumped on every save (used for ETags)
     """
     name = models.CharField(max_length=100, help_text="Full name of the author")
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        help_text="When the author was last changed"
+    )
     
     def __str__(self):
         return self.name
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Default ordering, ?ordering=name and exact author name lookups
+            models.Index(fields=['name', 'id'], name='author_name_id_idx'),
+        ]
 
 
 class Book(models.Model):
@@ -24,6 +34,7 @@ class Book(models.Model):
     - title: CharField for the book's title
     - publication_year: IntegerField for the year of publication
     - author: ForeignKey linking to the Author model (one-to-many relationship)
+    - updated_at: Change marker, bumped on every save (used for ETags)
     
     Relationship:
     - One Author can have multiple Books (one-to-many)
@@ -34,11 +45,138 @@ class Book(models.Model):
         Author, 
         on_delete=models.CASCADE, 
         related_name='books',
+        # book_author_title_idx starts with author_id and serves every
+        # author lookup; a separate FK index only misleads the planner
+        db_index=False,
         help_text="Author of the book"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        help_text="When the book was last changed"
+    )
     
     def __str__(self):
         return f"{self.title} ({self.publication_year})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the values loaded from the database so signal receivers
+        can tell what an update changed (e.g. which author a book left).
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     class Meta:
-        ordering = ['title']
\ No newline at end of file
+        ordering = ['title']
+        indexes = [
+            # Default ordering / ?ordering=title (id is the keyset tiebreaker)
+            # and exact title lookups
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            # ?ordering=publication_year
+            models.Index(fields=['publication_year', 'id'], name='book_year_id_idx'),
+            # publication_year filters combined with the default title ordering
+            models.Index(fields=['publication_year', 'title', 'id'], name='book_year_title_idx'),
+            # Books of one author in title order (nested books, author__name__exact)
+            models.Index(fields=['author', 'title', 'id'], name='book_author_title_idx'),
+            # ?title__startswith (istartswith) uses a per-vendor case-insensitive
+            # index created by migration 0010_book_title_prefix_index
+        ]
+
+class AuthorStats(models.Model):
+    """
+    Denormalized book statistics for one author.
+
+    Fields:
+    - author: The author these numbers describe (also the primary key)
+    - book_count: Number of books by the author
+    - min_year / max_year: First and last publication year (null without books)
+
+    Maintained by api.stats whenever books are written (signals and the
+    bulk code paths), so reads never aggregate api_book. Rebuild or verify
+    with ``python manage.py rebuild_author_stats``.
+    """
+    author = models.OneToOneField(
+        Author,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        help_text="Author these statistics belong to"
+    )
+    book_count = models.PositiveIntegerField(default=0, help_text="Number of books by the author")
+    min_year = models.IntegerField(null=True, blank=True, help_text="Earliest publication year")
+    max_year = models.IntegerField(null=True, blank=True, help_text="Latest publication year")
+
+    def __str__(self):
+        return f"{self.author_id}: {self.book_count} books ({self.min_year}-{self.max_year})"
+
+    class Meta:
+        verbose_name_plural = 'author stats'
+        indexes = [
+            # ?ordering= and range filters on the AuthorListView stats fields
+            models.Index(fields=['book_count', 'author'], name='authorstats_count_idx'),
+            models.Index(fields=['min_year', 'author'], name='authorstats_min_year_idx'),
+            models.Index(fields=['max_year', 'author'], name='authorstats_max_year_idx'),
+        ]
+
+
+class Change(models.Model):
+    """
+    One create, update or delete of a Book or Author, for the change feed.
+
+    Fields:
+    - id: Position in the feed; clients sync from the last id they saw
+    - resource: 'book' or 'author'
+    - object_id: Primary key of the changed row (it may no longer exist)
+    - action: 'create', 'update' or 'delete'
+    - changed_at: When the change was recorded
+
+    Written by api.changes from the model signals and the bulk code
+    paths. Entries replaced by a newer change to the same row can be
+    compacted with ``python manage.py compact_changes``.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTION_CHOICES = [(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    resource = models.CharField(max_length=20, help_text="Changed resource: book or author")
+    object_id = models.BigIntegerField(help_text="Primary key of the changed row")
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, help_text="What happened to the row")
+    changed_at = models.DateTimeField(auto_now_add=True, help_text="When the change was recorded")
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.resource} {self.object_id}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # "Is there a newer change to this row?" for the feed and compaction
+            models.Index(fields=['resource', 'object_id', 'id'], name='change_object_idx'),
+            # Recent changes for the feed's safety window, old ones for compaction
+            models.Index(fields=['changed_at'], name='change_changed_at_idx'),
+        ]
+
+
+class ResourceVersion(models.Model):
+    """
+    Change counter of one resource table, for conditional GET validators.
+
+    Fields:
+    - resource: 'book' or 'author' (also the primary key)
+    - version: Incremented by every write to the resource
+    - changed_at: When the version last moved (deletes move it too)
+
+    Maintained by api.changes next to the change log, once the write's
+    transaction commits, so every write path that records a Change bumps
+    it without holding the row's lock while it runs. Reading it is a
+    primary key lookup (see api.conditional).
+    """
+    resource = models.CharField(max_length=20, primary_key=True, help_text="Resource: book or author")
+    version = models.PositiveBigIntegerField(default=0, help_text="Incremented on every write")
+    changed_at = models.DateTimeField(help_text="When the resource was last written")
+
+    def __str__(self):
+        return f"{self.resource} v{self.version} ({self.changed_at})"
@@ -0,0 +1,538 @@
+import base64
+import binascii
+import hashlib
+import json
+from functools import reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .caching import KEY_PREFIX, get_cache, get_generations
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (a.k.a. seek) pagination keyed on the active ordering.
+
+    Instead of ``OFFSET N`` the cursor stores the ordering values of the
+    last row on the page, and the next page is fetched with a
+    ``WHERE (ordering) > (cursor)`` predicate. Pages therefore cost the
+    same no matter how deep the client has scrolled, and no ``COUNT(*)``
+    query is issued.
+
+    The ordering is read from the queryset after the filter backends have
+    run, so it honours ``?ordering=`` from OrderingFilter. A tiebreaker on
+    ``id`` is always appended so rows sharing the same title/year/author
+    are never skipped or repeated between pages.
+
+    Example Usage:
+    - First page: /api/books/?pagination=keyset&ordering=-publication_year
+    - Next page:  follow the ``next`` link (it carries ``cursor=...``)
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, fetching the page with aiterator().
+        """
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset.aiterator()])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the query for the requested page: seek past the cursor and
+        fetch one extra row so we know whether there is another page.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position, self.reverse = self.decode_cursor(request, queryset)
+        self.has_cursor = position is not None
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.build_seek_filter(ordering, position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.has_cursor
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Return the effective ordering as a list of field names, with the
+        ``id`` tiebreaker appended when the ordering doesn't already end in it.
+
+        The tiebreaker follows the direction of the last ordering field so
+        the whole ORDER BY can be served by one (field, id) index scanned
+        forwards or backwards.
+        """
+        ordering = [
+            field for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        ordering = [
+            field.replace('pk', self.tiebreaker) if self._name(field) == 'pk' else field
+            for field in ordering
+        ]
+        if self.tiebreaker not in [self._name(field) for field in ordering]:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f'-{self.tiebreaker}' if descending else self.tiebreaker)
+        return ordering
+
+    def build_seek_filter(self, ordering, position):
+        """
+        Expand ``(f1, f2, ..., fn) > (v1, v2, ..., vn)`` into
+
+            f1 > v1
+            OR (f1 = v1 AND f2 > v2)
+            OR ...
+
+        honouring each field's direction. A redundant ``f1 >= v1`` is ANDed
+        on so the database can range-scan the index on the leading column.
+        """
+        branches = []
+        for index, field in enumerate(ordering):
+            equal = {self._name(prior): value for prior, value in zip(ordering[:index], position)}
+            seek = {self._seek_lookup(field, inclusive=False): position[index]}
+            branches.append(Q(**equal, **seek))
+        leading = Q(**{self._seek_lookup(ordering[0], inclusive=True): position[0]})
+        return leading & reduce(or_, branches)
+
+    def get_position(self, row):
+        return [self._value(row, self._name(field)) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, queryset):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            # The cursor was issued for a different ordering.
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self._field(queryset, self._name(field)).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            # Ordering fields are not nullable and a seek on NULL matches nothing
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _field(queryset, path):
+        """
+        The field an ordering refers to: an annotation's output field or
+        the model field at the end of a ``related__field`` path.
+        """
+        if path in queryset.query.annotations:
+            return queryset.query.annotations[path].output_field
+        model = queryset.model
+        *relations, name = path.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+    @staticmethod
+    def _name(field):
+        return field.lstrip('-')
+
+    @classmethod
+    def _invert(cls, field):
+        return cls._name(field) if field.startswith('-') else '-' + field
+
+    @classmethod
+    def _seek_lookup(cls, field, inclusive):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        if inclusive:
+            lookup += 'e'
+        return f'{cls._name(field)}__{lookup}'
+
+    @staticmethod
+    def _value(row, path):
+        if isinstance(row, dict):
+            return row[path]
+        return reduce(getattr, path.split('__'), row)
+
+
+EXACT = 'exact'
+ESTIMATE = 'estimate'
+LOWER_BOUND = 'lower_bound'
+
+
+def estimate_count(queryset):
+    """
+    Estimate the number of rows in ``queryset`` from database statistics.
+    Returns None when no estimate is available.
+
+    - PostgreSQL: the planner's row estimate (EXPLAIN), filters included
+    - SQLite: only for an unfiltered table, using the row count that ANALYZE
+      stored in sqlite_stat1. SQLite keeps no statistics for filtered queries
+    """
+    connection = connections[queryset.db]
+    query = queryset.query
+    if connection.vendor == 'postgresql':
+        sql, params = query.get_compiler(queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and not (query.where or query.distinct or query.group_by):
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [queryset.model._meta.db_table])
+            except DatabaseError:
+                # No ANALYZE yet
+                return None
+            row = cursor.fetchone()
+        return int(row[0].split()[0]) if row else None
+    return None
+
+
+class CountedPage(Page):
+    """
+    Page of a CountedPaginator. Call load() with the fetched rows.
+    """
+    more = False
+
+    def load(self, rows):
+        if not self.paginator.exact:
+            self.more = len(rows) > self.paginator.per_page
+            rows = rows[:self.paginator.per_page]
+        self.object_list = rows
+        return rows
+
+    def has_next(self):
+        if self.paginator.exact:
+            return super().has_next()
+        return self.more
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator that takes a precomputed count instead of running COUNT(*).
+
+    With an exact count it works like Django's Paginator. Otherwise pages
+    past the count are allowed, each page fetches one extra row, and
+    has_next() is true when that row exists.
+    """
+
+    def __init__(self, object_list, per_page, count, exact, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+        self.exact = exact
+
+    def validate_number(self, number):
+        if self.exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if self.exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page + 1], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return CountedPage(*args, **kwargs)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    PageNumberPagination that avoids a full ``COUNT(*)`` on large results.
+
+    The count for a filtered queryset is worked out in this order:
+
+    1. The cached count for the same query. Cached counts are keyed on the
+       SQL and the list's cache generation, so writes invalidate them.
+    2. An estimate from database statistics (see estimate_count()). It is
+       used when it is above ``max_exact_count``, i.e. the filters are too
+       unselective to be worth counting.
+    3. A count that stops after ``max_exact_count`` + 1 rows. If it hits
+       that limit the count is reported as "10,000+".
+
+    On SQLite, step 3 runs before step 2, because SQLite only has
+    statistics for unfiltered tables.
+
+    The response adds ``count_exact`` (false for estimates and capped
+    counts) and ``count_display`` ("1,234", "~52,000" or "10,000+").
+    When the count is not exact, ``next`` depends on whether one more row
+    exists, so links stay correct past an estimate that is too low.
+
+    List views offer it with ``?count=estimate`` (see PaginationModeMixin);
+    the default paginator stays PageNumberPagination.
+
+    Example Usage:
+    - /api/books/?publication_year__gte=1900&count=estimate   (estimated)
+    - /api/books/?author=12&count=estimate                    (exact, cached)
+    """
+    max_exact_count = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.count, self.count_kind = self.get_count(queryset, request)
+        self.set_page(queryset, page_size, request)
+        return self.load_page(list(self.page.object_list))
+
+    def set_page(self, queryset, page_size, request):
+        paginator = CountedPaginator(queryset, page_size, self.count, self.count_kind == EXACT)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+
+    def load_page(self, rows):
+        rows = self.page.load(rows)
+        if not rows and self.page.number > 1:
+            msg = self.invalid_page_message.format(
+                page_number=self.page.number, message=_('That page contains no results')
+            )
+            raise NotFound(msg)
+        return rows
+
+    def get_count(self, queryset, request):
+        """
+        Return ``(count, kind)``, where kind is EXACT, ESTIMATE or LOWER_BOUND.
+        """
+        queryset = queryset.order_by()
+        try:
+            key = self.get_count_cache_key(queryset)
+        except EmptyResultSet:
+            return 0, EXACT
+        cache = get_cache()
+        # Clients pinned to the primary after a write (see
+        # advanced_api_project.routers) must not get a count from a replica
+        cached = None if getattr(request, 'db_pinned', False) else cache.get(key)
+        if cached is not None:
+            return tuple(cached)
+
+        result = self.count_queryset(queryset)
+        cache.set(key, result, getattr(settings, 'API_CACHE_TIMEOUT', 300))
+        return result
+
+    def count_queryset(self, queryset):
+        # Asking the PostgreSQL planner is cheaper than any count. SQLite only
+        # has statistics for whole tables; they are read once the capped
+        # count has shown the result is large.
+        planner_first = connections[queryset.db].vendor == 'postgresql'
+        if planner_first:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > self.max_exact_count:
+                return estimate, ESTIMATE
+
+        count = queryset[:self.max_exact_count + 1].count()
+        if count <= self.max_exact_count:
+            return count, EXACT
+        if not planner_first:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > self.max_exact_count:
+                return estimate, ESTIMATE
+        return self.max_exact_count, LOWER_BOUND
+
+    def get_count_cache_key(self, queryset):
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        parts = [
+            queryset.db,
+            sql,
+            repr(params),
+            str(self.max_exact_count),
+            *get_generations([f'{queryset.model._meta.model_name}-list']),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+        return f'{KEY_PREFIX}:count:{digest}'
+
+    def get_count_display(self):
+        if self.count_kind == ESTIMATE:
+            return f'~{self.count:,}'
+        if self.count_kind == LOWER_BOUND:
+            return f'{self.count:,}+'
+        return f'{self.count:,}'
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_exact': self.count_kind == EXACT,
+            'count_display': self.get_count_display(),
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_exact'] = {'type': 'boolean', 'example': True}
+        response_schema['properties']['count_display'] = {'type': 'string', 'example': '10,000+'}
+        return response_schema
+
+
+class AsyncEstimatedCountPagination(EstimatedCountPagination):
+    """
+    EstimatedCountPagination for async views.
+
+    The count (cache lookup, statistics or capped COUNT) runs in a worker
+    thread and the page is fetched with aiterator(); links and the
+    response body are the same as the sync paginator's.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.count, self.count_kind = await sync_to_async(self.get_count)(queryset, request)
+        self.set_page(queryset, page_size, request)
+        return self.load_page([row async for row in self.page.object_list.aiterator()])
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination for async views: the COUNT runs in a worker
+    thread and the page is fetched with aiterator().
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        await sync_to_async(getattr)(paginator, 'count')
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return [row async for row in self.page.object_list.aiterator()]
+
+
+class PaginationModeMixin:
+    """
+    List view mixin that picks the paginator from the query string:
+
+    - ``?pagination=keyset`` (or a keyset ``cursor``): keyset_pagination_class
+    - ``?count=estimate``: estimated_pagination_class, for clients that
+      prefer an estimated or capped count to a full COUNT(*)
+    - otherwise ``pagination_class`` (PageNumberPagination from settings)
+
+    A mode whose class is None is not offered.
+    """
+    keyset_pagination_class = None
+    estimated_pagination_class = EstimatedCountPagination
+    pagination_mode_query_param = 'pagination'
+    count_mode_query_param = 'count'
+
+    def get_pagination_class(self):
+        params = self.request.query_params
+        if self.keyset_pagination_class is not None and (
+                params.get(self.pagination_mode_query_param) == 'keyset'
+                or self.keyset_pagination_class.cursor_query_param in params):
+            return self.keyset_pagination_class
+        if self.estimated_pagination_class is not None and params.get(self.count_mode_query_param) == 'estimate':
+            return self.estimated_pagination_class
+        return self.pagination_class
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.get_pagination_class()
+            self._paginator = pagination_class() if pagination_class is not None else None
+        return self._paginator
@@ -0,0 +1,72 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders a list of rows as newline-delimited JSON, one object per line.
+
+    The counterpart of NDJSONParser. Besides render(), ``stream(columns,
+    rows)`` yields the encoded lines one by one so an export can be sent
+    with StreamingHttpResponse without building the whole body.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(self.encode(row) for row in rows)
+
+    def stream(self, columns, rows):
+        for row in rows:
+            yield self.encode(dict(zip(columns, row)))
+
+    @staticmethod
+    def encode(row):
+        return (json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class EchoBuffer:
+    """
+    File-like object whose write() hands the value back, so csv.writer
+    can encode one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a list of rows as CSV with a header line.
+
+    Like NDJSONRenderer, ``stream(columns, rows)`` yields the header and
+    then one encoded line per row for streaming responses.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        columns = list(rows[0]) if rows else []
+        # Error payloads map fields to lists of messages
+        values = (
+            [' '.join(map(str, value)) if isinstance(value, list) else value for value in row.values()]
+            for row in rows
+        )
+        return b''.join(self.stream(columns, values))
+
+    def stream(self, columns, rows):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(columns).encode('utf-8')
+        for row in rows:
+            yield writer.writerow(row).encode('utf-8')
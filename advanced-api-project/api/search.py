@@ -0,0 +1,304 @@
+"""
+Search backends for the ?search= parameter of BookListView.
+
+The default DRF SearchFilter turns every term into ``LIKE '%term%'`` over
+``title`` and ``author__name``, which is a full scan of api_book joined
+to api_author. The backends here answer the same question from an index:
+
+- SQLiteFTSSearchBackend: an FTS5 virtual table (api_book_fts) holding
+  the book title and author name, kept in sync by triggers on api_book
+  and api_author, so bulk_create/bulk_update/queryset.update() and
+  CASCADE deletes are all covered. Terms are prefix-matched and results
+  are ranked with bm25 (title weighted above author name).
+- PostgresSearchBackend: substring matching served by pg_trgm GIN
+  indexes on UPPER(title) / UPPER(name), ranked by trigram similarity.
+- ORMSearchBackend: the plain icontains behaviour, used on any other
+  database or when the index is missing.
+
+The backend is chosen by the API_SEARCH_BACKEND setting: 'auto' (the
+default) picks one by database vendor, or give a dotted path to a class.
+Backends that rank annotate ``search_rank`` (lower is better), which
+RankedOrderingFilter uses when the client does not pass ?ordering=.
+"""
+import re
+import sqlite3
+from functools import reduce
+from operator import and_, or_
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+FTS_TABLE = 'api_book_fts'
+
+# Quoted phrases or bare words, e.g.  "lord of the" rings  ->  ['lord of the', 'rings']
+TERM_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def parse_terms(query):
+    """
+    Split a search string into terms. Double-quoted text is kept together
+    as a phrase; commas separate terms like in DRF's SearchFilter.
+    """
+    query = query.replace('\x00', '').replace(',', ' ')
+    terms = []
+    for phrase, word in TERM_RE.findall(query):
+        term = (phrase or word).strip().rstrip('*')
+        if term:
+            terms.append((term, bool(phrase)))
+    return terms
+
+
+class BaseSearchBackend:
+    """
+    Interface for book search backends.
+    """
+    ranked = False
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    def is_available(self):
+        return True
+
+    def search(self, queryset, terms):
+        """
+        Return ``queryset`` narrowed to books matching every term.
+        ``terms`` is the output of parse_terms().
+        """
+        raise NotImplementedError
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """
+    Case-insensitive substring search on title and author name, the same
+    semantics as DRF's SearchFilter. Works everywhere, scans everything.
+    """
+    search_fields = ['title', 'author__name']
+
+    def search(self, queryset, terms):
+        conditions = [
+            reduce(or_, [Q(**{f'{field}__icontains': term}) for field in self.search_fields])
+            for term, _ in terms
+        ]
+        return queryset.filter(reduce(and_, conditions))
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    Full-text search backed by the api_book_fts FTS5 table.
+
+    Every word is prefix-matched (``harr`` finds "Harry"), quoted text is
+    matched as a phrase, and results are ranked with bm25.
+    """
+    ranked = True
+
+    # bm25 column weights: title, author_name
+    weights = (10.0, 5.0)
+
+    _available = {}
+
+    def is_available(self):
+        connection = connections[self.using]
+        key = (self.using, str(connection.settings_dict['NAME']))
+        if key not in self._available:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+                )
+                self._available[key] = cursor.fetchone() is not None
+        return self._available[key]
+
+    @staticmethod
+    def build_match(terms):
+        parts = []
+        for term, phrase in terms:
+            quoted = '"%s"' % term.replace('"', '""')
+            parts.append(quoted if phrase else quoted + '*')
+        return ' '.join(parts)
+
+    def search(self, queryset, terms):
+        match = self.build_match(terms)
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        # Rank every match once in a materialized CTE and look rows up in
+        # it. A plain correlated "MATCH ... AND rowid = id" subquery re-runs
+        # the full-text query per row, which is quadratic in the matches.
+        materialized = 'MATERIALIZED ' if sqlite3.sqlite_version_info >= (3, 35) else ''
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f'WITH ranked AS {materialized}('
+                f'SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS rank '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+                f') SELECT rank FROM ranked WHERE ranked.id = "{table}"."id"',
+                [match],
+            )
+        )
+
+
+class PostgresSearchBackend(ORMSearchBackend):
+    """
+    Substring search served by pg_trgm GIN indexes.
+
+    Django compiles icontains to ``UPPER(col) LIKE UPPER(%s)``, which the
+    api_book_title_trgm / api_author_name_trgm indexes answer without a
+    scan, so matching (including prefixes) keeps today's semantics.
+    Results are ranked by the best trigram similarity of the query to the
+    title or author name.
+    """
+    ranked = True
+
+    def search(self, queryset, terms):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models.functions import Greatest
+
+        text = ' '.join(term for term, _ in terms)
+        return super().search(queryset, terms).annotate(
+            search_rank=-Greatest(
+                TrigramWordSimilarity(text, 'title'),
+                TrigramWordSimilarity(text, 'author__name'),
+            )
+        )
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """
+    Return the search backend configured by API_SEARCH_BACKEND, falling
+    back to ORMSearchBackend when the chosen index is not installed.
+    """
+    path = getattr(settings, 'API_SEARCH_BACKEND', 'auto')
+    if path == 'auto':
+        backend_class = VENDOR_BACKENDS.get(connections[using].vendor, ORMSearchBackend)
+    else:
+        backend_class = import_string(path)
+    backend = backend_class(using)
+    if not backend.is_available():
+        return ORMSearchBackend(using)
+    return backend
+
+
+_probed = set()
+
+
+async def aprobe_search_backend(using='default'):
+    """
+    Run get_search_backend() once per database in a worker thread.
+
+    Backends cache the result of their index probe, so after this the
+    BookSearchFilter of an async view can pick the backend on the event
+    loop without a synchronous query.
+    """
+    key = (using, str(connections[using].settings_dict['NAME']))
+    if key not in _probed:
+        await sync_to_async(get_search_backend)(using)
+        _probed.add(key)
+
+
+# Schema used by the migrations. Kept here so later migrations that make
+# Django rebuild api_book or api_author on SQLite can drop the triggers
+# first and reinstall them afterwards (see drop_search_triggers).
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, author_name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_book_insert AFTER INSERT ON api_book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author_name)
+        SELECT new.id, new.title, name FROM api_author WHERE id = new.author_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_book_update AFTER UPDATE OF title, author_id ON api_book BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, author_name)
+        SELECT new.id, new.title, name FROM api_author WHERE id = new.author_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_book_delete AFTER DELETE ON api_book BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_author_update AFTER UPDATE OF name ON api_author BEGIN
+        UPDATE {FTS_TABLE} SET author_name = new.name
+        WHERE rowid IN (SELECT id FROM api_book WHERE author_id = new.id);
+    END""",
+]
+
+SQLITE_FTS_REBUILD_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""INSERT INTO {FTS_TABLE}(rowid, title, author_name)
+        SELECT api_book.id, api_book.title, api_author.name
+        FROM api_book INNER JOIN api_author ON api_author.id = api_book.author_id""",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_book_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_book_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_book_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_author_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_TRGM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS api_book_title_trgm ON api_book USING gin (UPPER(title) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS api_author_name_trgm ON api_author USING gin (UPPER(name) gin_trgm_ops)",
+]
+
+POSTGRES_TRGM_DROP_SQL = [
+    "DROP INDEX IF EXISTS api_book_title_trgm",
+    "DROP INDEX IF EXISTS api_author_name_trgm",
+]
+
+
+def sqlite_supports_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_search_index(schema_editor):
+    """
+    Create (or re-create) the search index for the current database and
+    backfill it from existing rows. Safe to run more than once.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        if not sqlite_supports_fts5(connection):
+            return
+        for statement in SQLITE_FTS_SQL + SQLITE_FTS_REBUILD_SQL:
+            schema_editor.execute(statement, params=None)
+    elif connection.vendor == 'postgresql':
+        for statement in POSTGRES_TRGM_SQL:
+            schema_editor.execute(statement, params=None)
+
+
+def drop_search_triggers(schema_editor):
+    """
+    Drop the SQLite sync triggers but keep the index. Migrations that make
+    Django rebuild api_book or api_author must call this first (SQLite
+    refuses to rename a table while a trigger references a missing one)
+    and install_search_index() afterwards.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_FTS_DROP_SQL:
+            if statement.startswith('DROP TRIGGER'):
+                schema_editor.execute(statement, params=None)
+
+
+def uninstall_search_index(schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for statement in SQLITE_FTS_DROP_SQL:
+            schema_editor.execute(statement, params=None)
+    elif connection.vendor == 'postgresql':
+        for statement in POSTGRES_TRGM_DROP_SQL:
+            schema_editor.execute(statement, params=None)
@@ -1,8 +1,93 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Author, Book
+from .caching import batch_invalidation, invalidate_books
+from .changes import batch_changes, record_changes
+from .models import Author, Book, Change
+from .stats import batch_author_stats, refresh_author_stats
 from datetime import datetime
 
-class BookSerializer(serializers.ModelSerializer):
+class AuthorPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField for Book.author that can resolve authors from a
+    preloaded ``{pk: Author}`` map passed as ``context['authors']``.
+
+    Bulk endpoints load every referenced author in one query up front, so
+    validating thousands of books doesn't cost one SELECT per row. Without
+    the map it behaves exactly like the default related field.
+    """
+
+    def to_internal_value(self, data):
+        authors = self.context.get('authors')
+        if authors is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return authors[int(data)]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets and expansion (see api.sparse).
+
+    Takes ``fields`` and ``expand`` trees as produced by
+    parse_field_tree(): fields not in ``fields`` are dropped (recursively
+    for nested serializers), and fields named in ``expand`` are replaced
+    by the serializer class listed for them in ``expandable_fields``.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields or expand:
+            self.select_fields(fields or {}, expand or {})
+
+    def select_fields(self, fields, expand, prefix=''):
+        for name in expand:
+            if name not in self.fields or (name not in self.expandable_fields and not expand[name]):
+                raise serializers.ValidationError({'expand': [f'Cannot expand "{prefix}{name}".']})
+            if name in self.expandable_fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        if fields:
+            unknown = [name for name in fields if name not in self.fields]
+            if unknown:
+                raise serializers.ValidationError(
+                    {'fields': [f'Unknown field "{prefix}{name}".' for name in unknown]}
+                )
+            for name in list(self.fields):
+                if name not in fields:
+                    self.fields.pop(name)
+
+        for name, field in self.fields.items():
+            nested_fields, nested_expand = fields.get(name, {}), expand.get(name, {})
+            if not (nested_fields or nested_expand):
+                continue
+            target = getattr(field, 'child', field)
+            if not isinstance(target, DynamicFieldsMixin):
+                raise serializers.ValidationError(
+                    {'fields': [f'"{prefix}{name}" has no fields to select.']}
+                )
+            target.select_fields(nested_fields, nested_expand, prefix=f'{prefix}{name}.')
+
+
+class AuthorSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Author without their books, used when a book's author is expanded
+    (?expand=author).
+    """
+
+    class Meta:
+        model = Author
+        fields = ['id', 'name']
+
+
+class BookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     BookSerializer serializes all fields of the Book model.
     
@@ -12,11 +97,16 @@ class BookSerializer(serializers.ModelSerializer):
     - id: Auto-generated primary key
     - title: Book title
     - publication_year: Year of publication with validation
-    - author: Foreign key to Author model
+    - author: Foreign key to Author model (an {id, name} object with ?expand=author)
     
     Validation:
     - publication_year cannot be greater than current year
     """
+    author = AuthorPrimaryKeyField(
+        queryset=Author.objects.all(),
+        help_text="Author of the book"
+    )
+    expandable_fields = {'author': AuthorSummarySerializer}
     
     class Meta:
         model = Book
@@ -43,47 +133,192 @@ class BookSerializer(serializers.ModelSerializer):
         return value
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class BookValuesSerializer:
+    """
+    Read-only fast path that produces exactly what BookSerializer(many=True)
+    produces, from ``values()`` rows instead of model instances.
+
+    Skips model instantiation and the DRF field graph, which dominate the
+    cost of rendering large list pages. Only valid for the plain fields
+    in BookSerializer.Meta.fields (the author is rendered as its pk).
+    """
+    # Serialized field name -> values() key
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'publication_year': 'publication_year',
+        'author': 'author_id',
+    }
+
+    @classmethod
+    def values(cls, queryset, *extra):
+        """
+        Return ``queryset`` as values() rows with the serialized fields and
+        any ``extra`` keys (e.g. ordering fields the paginator needs).
+        """
+        keys = list(cls.fields.values())
+        return queryset.values(*keys, *[key for key in extra if key not in keys])
+
+    @classmethod
+    def to_representation(cls, rows):
+        items = list(cls.fields.items())
+        return [{name: row[key] for name, key in items} for row in rows]
+
+
+class AuthorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     AuthorSerializer serializes Author model with nested BookSerializer.
     
     Fields:
     - id: Auto-generated primary key
     - name: Author's name
+    - book_count, min_year, max_year: Denormalized statistics from AuthorStats
     - books: Nested serialization of related Book objects
     
     Relationship Handling:
     - Uses BookSerializer to serialize all books by this author
     - The 'books' field is read-only and represents the one-to-many relationship
+    - Read views can prune it with ?fields=id,name or select book fields
+      with ?fields=id,books.title (see api.sparse)
     """
     
     # Nested serializer for related books
     books = BookSerializer(many=True, read_only=True)
+
+    # Maintained by api.stats, no aggregation at read time
+    book_count = serializers.IntegerField(source='stats.book_count', read_only=True)
+    min_year = serializers.IntegerField(source='stats.min_year', read_only=True)
+    max_year = serializers.IntegerField(source='stats.max_year', read_only=True)
     
     class Meta:
         model = Author
-        fields = ['id', 'name', 'books']
+        fields = ['id', 'name', 'book_count', 'min_year', 'max_year', 'books']
+
+
+class NestedBookSerializer(BookSerializer):
+    """
+    BookSerializer for books nested under an author payload.
+
+    The author comes from the parent, so it is not part of the payload.
+    The id is writable (and optional) so nested updates can tell existing
+    books apart from new ones.
+    """
+    id = serializers.IntegerField(required=False)
+    expandable_fields = {}
+
+    class Meta(BookSerializer.Meta):
+        fields = ['id', 'title', 'publication_year']
 
 
 class AuthorBookCreateSerializer(serializers.ModelSerializer):
     """
     Alternative serializer for creating authors with books in a single request.
     This demonstrates handling nested creation scenarios.
+
+    Writes are set-based: each request runs in one transaction and books
+    are inserted, updated and deleted with bulk queries, so the number of
+    queries does not grow with the size of the bibliography.
+
+    The author's AuthorStats row is recomputed once per request, after
+    all book writes (see api.stats).
+
+    After save(), ``created_book_ids`` (and ``deleted_book_ids`` on update)
+    hold the affected book ids and are included in the serialized output.
     """
-    books = BookSerializer(many=True, required=False)
+    books = NestedBookSerializer(many=True, required=False)
+
+    # Rows written per bulk query
+    batch_size = 500
     
     class Meta:
         model = Author
         fields = ['id', 'name', 'books']
     
+    @transaction.atomic
+    @batch_author_stats()
+    @batch_changes()
+    @batch_invalidation()
     def create(self, validated_data):
         """
-        Custom create method to handle nested book creation.
+        Create the author and all nested books with a single bulk INSERT.
         """
         books_data = validated_data.pop('books', [])
         author = Author.objects.create(**validated_data)
-        
+        books = Book.objects.bulk_create(
+            [self.build_book(author, book_data) for book_data in books_data],
+            batch_size=self.batch_size,
+        )
+        self.created_book_ids = [book.pk for book in books]
+        # bulk_create does not send post_save
+        invalidate_books(books)
+        refresh_author_stats([author.pk])
+        record_changes('book', self.created_book_ids, Change.CREATE)
+        return author
+
+    @transaction.atomic
+    @batch_author_stats()
+    @batch_changes()
+    @batch_invalidation()
+    def update(self, instance, validated_data):
+        """
+        Update the author and diff its books against the payload.
+
+        Books with an id are updated, books without one are created, and
+        existing books missing from the payload are deleted. Omitting
+        "books" altogether leaves the author's books untouched.
+        """
+        books_data = validated_data.pop('books', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
+        if books_data is None:
+            return instance
+
+        existing = {book.pk: book for book in instance.books.all()}
+        to_create, to_update, kept = [], [], set()
         for book_data in books_data:
-            Book.objects.create(author=author, **book_data)
-        
-        return author
\ No newline at end of file
+            pk = book_data.get('id')
+            if pk is None:
+                to_create.append(self.build_book(instance, book_data))
+            elif pk in existing:
+                book = existing[pk]
+                for attr, value in book_data.items():
+                    setattr(book, attr, value)
+                # bulk_update skips auto_now
+                book.updated_at = timezone.now()
+                to_update.append(book)
+                kept.add(pk)
+            else:
+                raise serializers.ValidationError(
+                    {'books': [f'Book {pk} does not belong to this author.']}
+                )
+
+        deleted_ids = sorted(existing.keys() - kept)
+        if deleted_ids:
+            Book.objects.filter(pk__in=deleted_ids).delete()
+        if to_update:
+            Book.objects.bulk_update(
+                to_update, ['title', 'publication_year', 'updated_at'], batch_size=self.batch_size
+            )
+        created = Book.objects.bulk_create(to_create, batch_size=self.batch_size)
+        # bulk_create / bulk_update do not send post_save
+        invalidate_books(to_update + created)
+        refresh_author_stats([instance.pk])
+        record_changes('book', [book.pk for book in to_update], Change.UPDATE)
+        record_changes('book', [book.pk for book in created], Change.CREATE)
+        self.created_book_ids = [book.pk for book in created]
+        self.deleted_book_ids = deleted_ids
+        return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(self, 'created_book_ids'):
+            data['created_book_ids'] = self.created_book_ids
+        if hasattr(self, 'deleted_book_ids'):
+            data['deleted_book_ids'] = self.deleted_book_ids
+        return data
+
+    @staticmethod
+    def build_book(author, book_data):
+        book_data = {key: value for key, value in book_data.items() if key != 'id'}
+        return Book(author=author, **book_data)
@@ -0,0 +1,56 @@
+"""
+Model signal receivers that keep derived data in sync with Author/Book writes.
+
+Connected in ApiConfig.ready(). Signals fire for save(), delete() and
+queryset.delete() (including the CASCADE from Author to Book), but not
+for bulk_create(), bulk_update() or queryset.update(); the bulk code
+paths in views/serializers call the same helpers directly.
+
+- api.caching: evict cached responses
+- api.stats: recompute the AuthorStats of the affected authors
+- api.changes: append to the change feed
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_authors, invalidate_books
+from .changes import record_changes
+from .models import Author, Book, Change
+from .stats import book_author_ids, refresh_author_stats
+
+
+@receiver(post_save, sender=Book, dispatch_uid='api_book_saved')
+def book_saved(sender, instance, created, **kwargs):
+    invalidate_books([instance])
+    record_changes('book', [instance.pk], Change.CREATE if created else Change.UPDATE)
+    loaded = getattr(instance, '_loaded_values', {})
+    if (created or loaded.get('author_id') != instance.author_id
+            or loaded.get('publication_year') != instance.publication_year):
+        refresh_author_stats(book_author_ids([instance]))
+    # The row now holds these values; later saves compare against them
+    instance._loaded_values = {
+        **loaded, 'author_id': instance.author_id, 'publication_year': instance.publication_year,
+    }
+
+
+@receiver(post_delete, sender=Book, dispatch_uid='api_book_deleted')
+def book_deleted(sender, instance, origin=None, **kwargs):
+    invalidate_books([instance])
+    record_changes('book', [instance.pk], Change.DELETE)
+    # In a CASCADE from Author the stats row goes away with the author
+    if not (isinstance(origin, Author) or getattr(origin, 'model', None) is Author):
+        refresh_author_stats([instance.author_id])
+
+
+@receiver(post_save, sender=Author, dispatch_uid='api_author_saved')
+def author_saved(sender, instance, created, **kwargs):
+    invalidate_authors([instance], created=created)
+    record_changes('author', [instance.pk], Change.CREATE if created else Change.UPDATE)
+    if created:
+        refresh_author_stats([instance.pk])
+
+
+@receiver(post_delete, sender=Author, dispatch_uid='api_author_deleted')
+def author_deleted(sender, instance, **kwargs):
+    invalidate_authors([instance])
+    record_changes('author', [instance.pk], Change.DELETE)
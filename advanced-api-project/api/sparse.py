@@ -0,0 +1,136 @@
+"""
+Sparse fieldsets (?fields=) and expansion (?expand=) for read views.
+
+- ``?fields=id,name`` renders only those fields. Dotted names select
+  fields of nested objects: ``?fields=id,books.title``.
+- ``?expand=author`` replaces a related primary key with the related
+  object, for the fields a serializer lists in ``expandable_fields``.
+
+The selection prunes the serializer (see DynamicFieldsMixin) and the SQL:
+narrow_queryset() loads only the columns the pruned serializer reads,
+joins expanded relations with select_related(), and drops prefetches of
+relations that are not rendered (e.g. ``books`` for ?fields=id,name).
+Unknown names are a 400.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def parse_field_tree(value):
+    """
+    Turn ``'id,books.title,books.id'`` into ``{'id': {}, 'books': {'title': {}, 'id': {}}}``.
+    An empty subtree means "every field".
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def narrow_queryset(queryset, serializer, required=()):
+    """
+    Return ``queryset`` restricted to the columns and relations that
+    ``serializer`` renders, plus the ordering keys (keyset pagination
+    reads them from the rows) and any ``required`` fields.
+
+    Returns the queryset unchanged when a field can't be mapped to the
+    model (computed fields, sources more than one relation deep).
+    """
+    model = queryset.model
+    only = {model._meta.pk.name, *required}
+    select, prefetch = set(), []
+
+    for field in serializer.fields.values():
+        source, _, attr = field.source.partition('.')
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return queryset
+        if attr:
+            # A column of a to-one relation, e.g. source='stats.book_count'
+            if '.' in attr or not (model_field.many_to_one or model_field.one_to_one):
+                return queryset
+            select.add(source)
+            if model_field.concrete:
+                only.add(source)
+            only.add(f'{source}__{attr}')
+            continue
+        target = getattr(field, 'child', field)
+        if not isinstance(target, serializers.BaseSerializer):
+            if model_field.is_relation and not model_field.concrete:
+                return queryset
+            only.add(source)
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            select.add(source)
+            only.add(source)
+            related = narrow_queryset(model_field.related_model._default_manager.all(), target)
+            only.update(f'{source}__{name}' for name in related.query.deferred_loading[0])
+        elif model_field.one_to_many:
+            related = model_field.related_model._default_manager.all()
+            prefetch.append(Prefetch(
+                source, queryset=narrow_queryset(related, target, required=[model_field.field.name])
+            ))
+        else:
+            return queryset
+
+    for key in queryset.query.order_by:
+        if not isinstance(key, str):
+            continue
+        key = key.lstrip('-')
+        if key in queryset.query.annotations:
+            continue
+        if key == 'pk':
+            key = model._meta.pk.name
+        if '__' in key:
+            select.add(key.split('__', 1)[0])
+            only.add(key.split('__', 1)[0])
+        only.add(key)
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset.only(*only)
+
+
+class SparseFieldsMixin:
+    """
+    Read-view mixin for ?fields= and ?expand=. The serializer class must
+    use DynamicFieldsMixin.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            params = self.request.query_params
+            self._field_selection = (
+                parse_field_tree(params.get(self.fields_query_param, '')),
+                parse_field_tree(params.get(self.expand_query_param, '')),
+            )
+        return self._field_selection
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_field_selection()
+        if fields:
+            kwargs.setdefault('fields', fields)
+        if expand:
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if any(self.get_field_selection()):
+            queryset = narrow_queryset(queryset, self.get_serializer())
+        return queryset
+
+    def use_values_serializer(self):
+        # The values() fast path always renders the full field set
+        if any(self.get_field_selection()):
+            return False
+        return super().use_values_serializer()
@@ -0,0 +1,135 @@
+"""
+Maintenance of the denormalized AuthorStats table.
+
+Every write that can change an author's books calls
+refresh_author_stats() with the affected author ids (old and new author
+when a book moves). Only those authors are recomputed, with one grouped
+query over their books (served by book_author_title_idx) and one upsert,
+so the cost follows the size of the write, not the catalog.
+
+Signals cover save()/delete() and the CASCADE from Author; the bulk paths
+(bulk_create, bulk_update) call refresh_author_stats() themselves. Wrap
+multi-row writes in batch_author_stats() so the refreshes requested by
+per-row signals collapse into a single recompute at the end.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from .models import Author, AuthorStats
+
+
+STATS_FIELDS = ['book_count', 'min_year', 'max_year']
+
+_pending = threading.local()
+
+
+def compute_author_stats(author_ids=None):
+    """
+    Return ``{author_id: AuthorStats}`` computed from api_book for
+    ``author_ids`` (every author when None). Deleted authors are skipped;
+    authors without books get zero counts.
+    """
+    authors = Author.objects.all()
+    if author_ids is not None:
+        authors = authors.filter(pk__in=author_ids)
+    rows = authors.order_by().values('pk').annotate(
+        book_count=Count('books'),
+        min_year=Min('books__publication_year'),
+        max_year=Max('books__publication_year'),
+    )
+    return {
+        row['pk']: AuthorStats(author_id=row['pk'], **{field: row[field] for field in STATS_FIELDS})
+        for row in rows
+    }
+
+
+def save_author_stats(stats, batch_size=1000):
+    AuthorStats.objects.bulk_create(
+        stats,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['author'],
+        update_fields=STATS_FIELDS,
+    )
+
+
+def refresh_author_stats(author_ids):
+    """
+    Recompute the stats of ``author_ids``, or queue them when inside
+    batch_author_stats().
+    """
+    author_ids = {pk for pk in author_ids if pk is not None}
+    if not author_ids:
+        return
+    pending = getattr(_pending, 'author_ids', None)
+    if pending is not None:
+        pending.update(author_ids)
+        return
+    save_author_stats(compute_author_stats(author_ids).values())
+
+
+@contextmanager
+def batch_author_stats():
+    """
+    Run the block in a transaction and recompute the stats of every author
+    it touched once, just before committing. Nested use joins the outer batch.
+    """
+    if getattr(_pending, 'author_ids', None) is not None:
+        yield
+        return
+    _pending.author_ids = set()
+    try:
+        with transaction.atomic():
+            yield
+            author_ids, _pending.author_ids = _pending.author_ids, None
+            refresh_author_stats(author_ids)
+    finally:
+        _pending.author_ids = None
+
+
+def book_author_ids(books):
+    """
+    Authors affected by writes to ``books``: the current author and the
+    one loaded from the database, if the book moved.
+    """
+    author_ids = set()
+    for book in books:
+        author_ids.add(book.author_id)
+        author_ids.add(getattr(book, '_loaded_values', {}).get('author_id'))
+    return author_ids
+
+
+def rebuild_author_stats(batch_size=1000):
+    """
+    Recompute every author's stats and delete orphans. Returns the number
+    of rows written.
+    """
+    with transaction.atomic():
+        stats = compute_author_stats()
+        AuthorStats.objects.exclude(author__in=Author.objects.all()).delete()
+        save_author_stats(stats.values(), batch_size=batch_size)
+    return len(stats)
+
+
+def verify_author_stats():
+    """
+    Compare the stored stats with a fresh aggregate. Returns a list of
+    ``(author_id, stored, expected)`` tuples for rows that differ, where
+    stored/expected are (book_count, min_year, max_year) or None.
+    """
+    expected = {
+        pk: tuple(getattr(row, field) for field in STATS_FIELDS)
+        for pk, row in compute_author_stats().items()
+    }
+    stored = {
+        row[0]: tuple(row[1:])
+        for row in AuthorStats.objects.values_list('author_id', *STATS_FIELDS)
+    }
+    return [
+        (pk, stored.get(pk), expected.get(pk))
+        for pk in sorted(expected.keys() | stored.keys())
+        if stored.get(pk) != expected.get(pk)
+    ]
@@ -8,12 +8,29 @@ This test suite covers:
 - Response data integrity and status codes
 """
 
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
 from django.contrib.auth.models import User
-from .models import Author, Book
+from django_shared.querybudget import QueryBudgetExceeded, QueryRecorder, sql_shape
+from advanced_api_project.routers import PrimaryReplicaRouter, _replica_reads, use_primary
+from .caching import get_cache, get_generations
+from .changes import batch_changes, resource_versions
+from .models import Author, AuthorStats, Book, Change
+from .pagination import EstimatedCountPagination
 
 
 class BaseTestCase(APITestCase):
@@ -27,6 +44,10 @@ class BaseTestCase(APITestCase):
         Set up test data that will be used across multiple test cases.
         This method runs before each test.
         """
+        # Cache invalidation runs on commit, which never happens inside a
+        # TestCase, so start every test with an empty cache
+        cache.clear()
+
         # Create test users
         self.admin_user = User.objects.create_superuser(
             username='admin',
@@ -520,4 +541,1461 @@ class CombinedFilteringTests(BaseTestCase):
         
         # Verify ordering (newest first)
         publication_years = [book['publication_year'] for book in response.data['results']]
-        self.assertEqual(publication_years, sorted(publication_years, reverse=True))
\ No newline at end of file
+        self.assertEqual(publication_years, sorted(publication_years, reverse=True))
+
+class KeysetPaginationTests(BaseTestCase):
+    """
+    Test cases for keyset pagination on the Book List View (?pagination=keyset)
+    """
+
+    def walk(self, params):
+        """
+        Follow ``next`` links from the first page and return every title seen.
+        """
+        url = reverse('book-list')
+        response = self.client.get(url, {'pagination': 'keyset', 'page_size': 2, **params})
+        titles = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            titles.extend(book['title'] for book in response.data['results'])
+            if not response.data['next']:
+                return titles
+            response = self.client.get(response.data['next'])
+
+    def test_keyset_pages_cover_all_books_in_order(self):
+        """
+        Test that walking the cursor links returns every book exactly once, in order.
+        """
+        titles = self.walk({'ordering': 'title'})
+        self.assertEqual(titles, sorted(Book.objects.values_list('title', flat=True)))
+
+    def test_keyset_tiebreaker_on_duplicate_ordering_values(self):
+        """
+        Test that rows sharing the ordering value are neither skipped nor repeated.
+        """
+        for i in range(5):
+            Book.objects.create(title=f'Same Year {i}', publication_year=1997, author=self.author2)
+        titles = self.walk({'ordering': '-publication_year'})
+        self.assertEqual(len(titles), Book.objects.count())
+        self.assertEqual(len(set(titles)), len(titles))
+
+    def test_keyset_with_filter_and_search(self):
+        """
+        Test that keyset pagination respects BookFilter and SearchFilter.
+        """
+        titles = self.walk({'search': 'Harry', 'publication_year__gte': 1990, 'ordering': 'author__name'})
+        self.assertEqual(len(titles), 2)
+
+    def test_keyset_previous_link(self):
+        """
+        Test that the previous link returns the page before the current one.
+        """
+        url = reverse('book-list')
+        first = self.client.get(url, {'pagination': 'keyset', 'page_size': 2})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_keyset_invalid_cursor(self):
+        """
+        Test that a malformed cursor returns 404 Not Found.
+        """
+        url = reverse('book-list')
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_keyset_cursor_with_wrong_value_types(self):
+        """
+        Test that a well-formed cursor whose values do not fit the ordering
+        fields returns 404 Not Found, not a server error.
+        """
+        url = reverse('book-list')
+        for position in (['x', 'abc'], ['x', None], ['x', [1]]):
+            payload = json.dumps({'p': position, 'r': 0}).encode('utf-8')
+            cursor = base64.urlsafe_b64encode(payload).decode('ascii')
+            response = self.client.get(url, {'pagination': 'keyset', 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+
+class CountEstimationTests(BaseTestCase):
+    """
+    Test cases for the exact, capped and estimated counts of EstimatedCountPagination
+    """
+    estimate = {'count': 'estimate'}
+
+    def walk(self, params=None):
+        """
+        Follow ``next`` links from the first page and return every title seen.
+        """
+        response = self.client.get(reverse('book-list'), {**self.estimate, **(params or {})})
+        titles = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles.extend(book['title'] for book in response.data['results'])
+            if not response.data['next']:
+                return titles
+            response = self.client.get(response.data['next'])
+
+    def test_page_numbers_are_the_default(self):
+        """
+        Test that lists count exactly with plain page numbers unless ?count=estimate is given.
+        """
+        for name in ('book-list', 'author-list'):
+            response = self.client.get(reverse(name))
+            self.assertIn('count', response.data)
+            self.assertNotIn('count_exact', response.data)
+            response = self.client.get(reverse(name), self.estimate)
+            self.assertTrue(response.data['count_exact'])
+
+    def test_small_counts_are_exact(self):
+        """
+        Test that counts below the cap are exact and say so.
+        """
+        response = self.client.get(reverse('book-list'), self.estimate)
+        self.assertEqual(response.data['count'], 4)
+        self.assertTrue(response.data['count_exact'])
+        self.assertEqual(response.data['count_display'], '4')
+
+    @mock.patch.object(EstimatedCountPagination, 'page_size', 1)
+    @mock.patch.object(EstimatedCountPagination, 'max_exact_count', 2)
+    def test_capped_count_keeps_pages_past_the_cap(self):
+        """
+        Test that counting stops at the cap and the next links still reach every book.
+        """
+        response = self.client.get(reverse('book-list'), self.estimate)
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse(response.data['count_exact'])
+        self.assertEqual(response.data['count_display'], '2+')
+
+        self.assertEqual(len(self.walk()), 4)
+        response = self.client.get(reverse('book-list'), {**self.estimate, 'page': 5})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch.object(EstimatedCountPagination, 'max_exact_count', 2)
+    def test_unselective_count_uses_statistics(self):
+        """
+        Test that an unfiltered list over the cap reports the ANALYZE row count as an estimate.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        response = self.client.get(reverse('book-list'), self.estimate)
+        self.assertEqual(response.data['count'], 4)
+        self.assertFalse(response.data['count_exact'])
+        self.assertEqual(response.data['count_display'], '~4')
+
+        # Filtered lists have no statistics and are counted
+        response = self.client.get(reverse('book-list'), {**self.estimate, 'author__name': 'Rowling'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertTrue(response.data['count_exact'])
+
+    @mock.patch.object(EstimatedCountPagination, 'page_size', 2)
+    def test_exact_counts_are_cached_until_a_write(self):
+        """
+        Test that other pages of the same filters reuse the count, and a new book invalidates it.
+        """
+        url = reverse('book-list')
+        self.client.get(url, {**self.estimate, 'publication_year__gte': 1990})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {**self.estimate, 'publication_year__gte': 1990, 'page': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertFalse([query for query in queries if 'COUNT(*)' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Fire and Blood', publication_year=2018, author=self.author3)
+        response = self.client.get(url, {**self.estimate, 'publication_year__gte': 1990, 'page': 2})
+        self.assertEqual(response.data['count'], 4)
+
+
+class AuthorQueryCountTests(BaseTestCase):
+    """
+    Guards against N+1 queries on the Author list and detail views.
+    The number of queries must not grow with the number of authors or books.
+    """
+
+    def count_queries(self, url):
+        # Measure the uncached path; bulk_create below bypasses the
+        # signals that invalidate cached responses.
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context)
+
+    def add_prolific_authors(self, authors, books_each):
+        for i in range(authors):
+            author = Author.objects.create(name=f'Prolific Author {i}')
+            Book.objects.bulk_create(
+                Book(title=f'Book {i}-{j}', publication_year=2000, author=author)
+                for j in range(books_each)
+            )
+
+    def test_author_list_query_count_is_constant(self):
+        """
+        Test that listing more authors with more books costs no extra queries.
+        """
+        url = reverse('author-list')
+        baseline = self.count_queries(url)
+        self.add_prolific_authors(authors=6, books_each=5)
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_author_detail_query_count_is_constant(self):
+        """
+        Test that an author with many books costs the same queries as one with few.
+        """
+        baseline = self.count_queries(reverse('author-detail', kwargs={'pk': self.author2.id}))
+        Book.objects.bulk_create(
+            Book(title=f'Middle-earth {i}', publication_year=1950, author=self.author2)
+            for i in range(20)
+        )
+        self.assertEqual(
+            self.count_queries(reverse('author-detail', kwargs={'pk': self.author2.id})),
+            baseline,
+        )
+
+
+class BookBulkViewTests(BaseTestCase):
+    """
+    Test cases for the Book Bulk View (/api/books/bulk/)
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('book-bulk')
+
+    def test_bulk_create_unauthorized(self):
+        """
+        Test that unauthenticated users cannot bulk create books.
+        """
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_json_array(self):
+        """
+        Test creating several books from a JSON array in a constant number of queries.
+        """
+        self.client.login(username='regular', password='testpass123')
+        data = [
+            {'title': f'Bulk Book {i}', 'publication_year': 2000 + i, 'author': self.author1.id}
+            for i in range(20)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['succeeded'], 20)
+        self.assertEqual(Book.objects.filter(title__startswith='Bulk Book').count(), 20)
+        self.assertLess(len(context), 20)
+        ids = [result['id'] for result in response.data['results']]
+        self.assertEqual(
+            Book.objects.get(id=ids[3]).title, 'Bulk Book 3'
+        )
+
+    def test_bulk_create_ndjson_with_invalid_items(self):
+        """
+        Test that NDJSON input is accepted and invalid items are reported per item.
+        """
+        self.client.login(username='regular', password='testpass123')
+        body = '\n'.join([
+            '{"title": "Stream One", "publication_year": 2001, "author": %d}' % self.author2.id,
+            '{"title": "Future", "publication_year": 2999, "author": %d}' % self.author2.id,
+            '',
+            '{"title": "No Author", "publication_year": 2001, "author": 9999}',
+        ])
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error'])
+        self.assertIn('publication_year', response.data['results'][1]['errors'])
+        self.assertIn('author', response.data['results'][2]['errors'])
+        self.assertTrue(Book.objects.filter(title='Stream One').exists())
+
+    def test_bulk_create_rejects_non_list(self):
+        """
+        Test that a single object instead of a list is rejected.
+        """
+        self.client.login(username='regular', password='testpass123')
+        response = self.client.post(self.url, {'title': 'Single'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_partial_update(self):
+        """
+        Test partially updating several books, with a missing id reported.
+        """
+        self.client.login(username='regular', password='testpass123')
+        data = [
+            {'id': self.book1.id, 'title': 'Bulk Renamed'},
+            {'id': self.book2.id, 'publication_year': 1938},
+            {'id': 9999, 'title': 'Missing'},
+        ]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.book1.refresh_from_db()
+        self.book2.refresh_from_db()
+        self.assertEqual(self.book1.title, 'Bulk Renamed')
+        self.assertEqual(self.book2.publication_year, 1938)
+        self.assertEqual(response.data['results'][2]['status'], 'error')
+
+    def test_bulk_update_rejects_duplicate_ids(self):
+        """
+        Test that every item repeating an id gets an error and none of them is applied.
+        """
+        self.client.login(username='regular', password='testpass123')
+        data = [
+            {'id': self.book1.id, 'title': 'First'},
+            {'id': self.book2.id, 'title': 'Other'},
+            {'id': self.book1.id, 'title': 'Second'},
+        ]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data['results']], ['error', 'updated', 'error'])
+        self.assertIn('more than once', str(response.data['results'][2]['errors']['id'][0]))
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.title, 'Harry Potter and the Philosopher\'s Stone')
+
+    def test_bulk_update_reads_locked_rows_in_the_write_transaction(self):
+        """
+        Test that the rows are locked and re-read in the transaction that writes them.
+        """
+        self.client.login(username='regular', password='testpass123')
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as lock, \
+                CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, [
+                {'id': self.book1.id, 'title': 'Locked'}, {'id': self.book2.id, 'publication_year': 1938},
+            ], format='json')
+        self.assertEqual(response.data['succeeded'], 2)
+        lock.assert_called_once()
+        sql = [query['sql'] for query in context.captured_queries]
+        read = next(i for i, statement in enumerate(sql) if statement.startswith('SELECT "api_book"."id"'))
+        update = next(i for i, statement in enumerate(sql) if statement.startswith('UPDATE "api_book"'))
+        self.assertLess(read, update)
+        savepoint = max(i for i, statement in enumerate(sql[:read]) if statement.startswith('SAVEPOINT'))
+        self.assertFalse([statement for statement in sql[savepoint:update] if statement.startswith('RELEASE')])
+        self.book2.refresh_from_db()
+        self.assertEqual((self.book2.title, self.book2.publication_year), ('The Hobbit', 1938))
+
+    def test_bulk_delete(self):
+        """
+        Test deleting several books by id.
+        """
+        self.client.login(username='regular', password='testpass123')
+        data = [self.book1.id, {'id': self.book2.id}, 9999]
+        response = self.client.delete(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertFalse(Book.objects.filter(id__in=[self.book1.id, self.book2.id]).exists())
+
+    def test_bulk_delete_checks_and_deletes_in_one_transaction(self):
+        """
+        Test that the existence check locks the rows and runs in the same transaction as the delete.
+        """
+        self.client.login(username='regular', password='testpass123')
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as lock, \
+                CaptureQueriesContext(connection) as context:
+            response = self.client.delete(self.url, [self.book1.id, 9999], format='json')
+        self.assertEqual(response.data['succeeded'], 1)
+        lock.assert_called_once()
+        sql = [query['sql'] for query in context.captured_queries]
+        check = next(i for i, statement in enumerate(sql) if statement.startswith('SELECT "api_book"."id"'))
+        delete = next(i for i, statement in enumerate(sql) if statement.startswith('DELETE FROM "api_book"'))
+        savepoint = max(i for i, statement in enumerate(sql[:check]) if statement.startswith('SAVEPOINT'))
+        self.assertFalse([statement for statement in sql[savepoint:delete] if statement.startswith('RELEASE')])
+
+
+
+class AuthorBookNestedViewTests(BaseTestCase):
+    """
+    Test cases for the nested author + books create/update views
+    """
+
+    def test_create_author_with_books(self):
+        """
+        Test creating an author with books returns the created ids.
+        """
+        self.client.login(username='regular', password='testpass123')
+        url = reverse('author-book-create')
+        data = {
+            'name': 'Terry Pratchett',
+            'books': [
+                {'title': 'The Colour of Magic', 'publication_year': 1983},
+                {'title': 'The Light Fantastic', 'publication_year': 1986},
+            ],
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created_book_ids']), 2)
+        author = Author.objects.get(id=response.data['id'])
+        self.assertEqual(author.books.count(), 2)
+
+    def test_update_author_books_unauthorized(self):
+        """
+        Test that unauthenticated users cannot replace an author's books.
+        """
+        url = reverse('author-book-update', kwargs={'pk': self.author1.id})
+        response = self.client.put(url, {'name': 'X', 'books': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookSearchTests(BaseTestCase):
+    """
+    Test cases for the indexed search backend behind ?search=
+    """
+
+    def search_titles(self, query, **params):
+        # Query the index directly; queryset.update() and bulk_create() in
+        # these tests bypass the signals that invalidate cached responses.
+        cache.clear()
+        response = self.client.get(reverse('book-list'), {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def test_prefix_matching(self):
+        """
+        Test that partial words match as prefixes.
+        """
+        self.assertEqual(len(self.search_titles('harr pot')), 2)
+
+    def test_phrase_matching(self):
+        """
+        Test that quoted text is matched as a phrase.
+        """
+        self.assertEqual(self.search_titles('"chamber of secrets"'),
+                         ['Harry Potter and the Chamber of Secrets'])
+
+    def test_title_and_author_terms_combine(self):
+        """
+        Test that one term can match the author and another the title.
+        """
+        self.assertEqual(self.search_titles('tolkien hobbit'), ['The Hobbit'])
+
+    def test_title_matches_rank_above_author_matches(self):
+        """
+        Test that results are ranked by relevance when no ordering is given.
+        """
+        Book.objects.create(title='Martin Eden', publication_year=1909, author=self.author1)
+        titles = self.search_titles('martin')
+        self.assertEqual(titles[0], 'Martin Eden')
+        self.assertEqual(len(titles), 2)
+
+    def test_explicit_ordering_overrides_rank(self):
+        """
+        Test that ?ordering= wins over relevance ordering.
+        """
+        titles = self.search_titles('harry', ordering='-publication_year')
+        self.assertEqual(titles[0], 'Harry Potter and the Chamber of Secrets')
+
+    def test_index_follows_writes(self):
+        """
+        Test that creates, bulk creates, updates, author renames and deletes reach the index.
+        """
+        book = Book.objects.create(title='Mort', publication_year=1987, author=self.author2)
+        self.assertEqual(self.search_titles('mort'), ['Mort'])
+        Book.objects.bulk_create([Book(title='Guards! Guards!', publication_year=1989, author=self.author2)])
+        self.assertEqual(self.search_titles('guards'), ['Guards! Guards!'])
+        Book.objects.filter(pk=book.pk).update(title='Sourcery')
+        self.assertEqual(self.search_titles('mort'), [])
+        self.author2.name = 'Terry Pratchett'
+        self.author2.save()
+        self.assertEqual(len(self.search_titles('pratchett')), 3)
+        self.author2.delete()
+        self.assertEqual(self.search_titles('pratchett'), [])
+
+    def test_search_with_keyset_pagination(self):
+        """
+        Test that relevance-ordered results can be walked with keyset pagination.
+        """
+        url = reverse('book-list')
+        response = self.client.get(url, {'search': 'r', 'pagination': 'keyset', 'page_size': 1})
+        seen = []
+        while True:
+            seen.extend(book['id'] for book in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 4)
+
+
+
+class ResponseCacheTests(BaseTestCase):
+    """
+    Test cases for response caching and write-driven invalidation
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(context)
+
+    def test_repeated_list_request_is_served_from_cache(self):
+        """
+        Test that an identical list request only runs the version-marker query the second time.
+        """
+        url = reverse('book-list')
+        first, _ = self.get(url, {'ordering': 'title', 'search': 'harry'})
+        second, queries = self.get(url, {'search': 'harry', 'ordering': 'title', 'page': ''})
+        self.assertEqual(queries, 1)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+    def test_update_through_view_evicts_lists_and_own_detail_only(self):
+        """
+        Test that updating a book evicts lists and its detail but not other details.
+        """
+        list_url = reverse('book-list')
+        detail_url = reverse('book-detail', kwargs={'pk': self.book1.id})
+        other_url = reverse('book-detail', kwargs={'pk': self.book2.id})
+        other_author_url = reverse('author-detail', kwargs={'pk': self.author2.id})
+        for url in (list_url, detail_url, other_url, other_author_url):
+            self.get(url)
+
+        self.client.login(username='regular', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('book-update', kwargs={'pk': self.book1.id}), {'title': 'Renamed'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response, _ = self.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], 'Renamed')
+        response, _ = self.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Renamed', [book['title'] for book in response.data['results']])
+        self.assertEqual(self.get(other_url)[0]['X-Cache'], 'HIT')
+        self.assertEqual(self.get(other_author_url)[0]['X-Cache'], 'HIT')
+
+    def test_moving_book_evicts_both_authors(self):
+        """
+        Test that changing a book's author evicts the old and new author details.
+        """
+        old_url = reverse('author-detail', kwargs={'pk': self.author1.id})
+        new_url = reverse('author-detail', kwargs={'pk': self.author2.id})
+        self.get(old_url)
+        self.get(new_url)
+        self.client.login(username='regular', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('book-update', kwargs={'pk': self.book1.id}), {'author': self.author2.id}, format='json'
+            )
+        self.assertEqual(len(self.get(old_url)[0].data['books']), 1)
+        self.assertEqual(len(self.get(new_url)[0].data['books']), 2)
+
+    def test_author_delete_cascade_evicts_book_detail(self):
+        """
+        Test that deleting an author evicts the details of its cascaded books.
+        """
+        detail_url = reverse('book-detail', kwargs={'pk': self.book2.id})
+        self.get(detail_url)
+        self.client.login(username='regular', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('author-delete', kwargs={'pk': self.author2.id}))
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_author_delete_cascade_evicts_with_one_cache_write(self):
+        """
+        Test that an author delete replaces the tokens of the author and all its books in one cache write.
+        """
+        Book.objects.create(title='The Hobbit', publication_year=1937, author=self.author2)
+        scopes = ['book-list', f'author:{self.author2.id}'] + [
+            f'book:{pk}' for pk in self.author2.books.values_list('pk', flat=True)
+        ]
+        before = get_generations(scopes)
+        self.client.login(username='regular', password='testpass123')
+        backend = type(get_cache())
+        with mock.patch.object(backend, 'set_many', autospec=True, side_effect=backend.set_many) as spy:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(reverse('author-delete', kwargs={'pk': self.author2.id}))
+        self.assertEqual(spy.call_count, 1)
+        after = get_generations(scopes)
+        self.assertFalse([scope for scope, old, new in zip(scopes, before, after) if old == new])
+
+    def test_eviction_waits_for_commit(self):
+        """
+        Test that a write only evicts cached responses once its transaction commits.
+        """
+        list_url = reverse('book-list')
+        self.get(list_url)
+        before = get_generations(['book-list'])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.book1.title = 'Renamed'
+                self.book1.save()
+                # A reader in this window must not cache under a new generation
+                self.assertEqual(get_generations(['book-list']), before)
+                self.assertEqual(self.get(list_url)[0]['X-Cache'], 'HIT')
+            # The test's own transaction is still open
+            self.assertEqual(get_generations(['book-list']), before)
+        self.assertNotEqual(get_generations(['book-list']), before)
+        response, _ = self.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Renamed', [book['title'] for book in response.data['results']])
+
+    def test_bulk_create_evicts_lists(self):
+        """
+        Test that the bulk endpoint invalidates cached lists.
+        """
+        list_url = reverse('book-list')
+        self.get(list_url)
+        self.client.login(username='regular', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('book-bulk'), [
+                {'title': 'Bulk Cached', 'publication_year': 2001, 'author': self.author1.id},
+            ], format='json')
+        response, _ = self.get(list_url)
+        self.assertEqual(response.data['count'], 5)
+
+
+
+class ConditionalGetTests(BaseTestCase):
+    """
+    Test cases for ETag / Last-Modified support on the read endpoints
+    """
+
+    def test_list_returns_validators(self):
+        """
+        Test that list responses carry a strong ETag and Last-Modified.
+        """
+        response = self.client.get(reverse('book-list'))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_if_none_match_returns_304_without_serializing(self):
+        """
+        Test that a matching If-None-Match returns 304 after a single query.
+        """
+        url = reverse('author-detail', kwargs={'pk': self.author1.id})
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(context), 1)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query(self):
+        """
+        Test that different query strings get different ETags.
+        """
+        url = reverse('book-list')
+        self.assertNotEqual(
+            self.client.get(url, {'ordering': 'title'})['ETag'],
+            self.client.get(url, {'ordering': '-title'})['ETag'],
+        )
+
+    def test_book_change_changes_author_etag(self):
+        """
+        Test that changing a nested book changes its author's ETag.
+        """
+        url = reverse('author-detail', kwargs={'pk': self.author1.id})
+        etag = self.client.get(url)['ETag']
+        self.book1.title = 'Changed'
+        self.book1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_delete_changes_list_etag(self):
+        """
+        Test that deleting a row changes the list ETag even though MAX(updated_at) stays.
+        """
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk=self.book2.pk).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_versions_move_after_commit(self):
+        """
+        Test that the list version is bumped once per transaction, after it commits.
+        """
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        before = resource_versions(['book'])['book'][0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            with batch_changes():
+                Book.objects.filter(pk=self.book2.pk).delete()
+            self.book1.title = 'Changed'
+            self.book1.save()
+            # The counter row is not written, so not locked, by the writers
+            self.assertEqual(resource_versions(['book'])['book'][0], before)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(resource_versions(['book'])['book'][0], before + 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_delete_moves_last_modified(self):
+        """
+        Test that a delete moves Last-Modified, so If-Modified-Since alone does not get a stale 304.
+        """
+        url = reverse('book-list')
+        last_modified = self.client.get(url)['Last-Modified']
+        later = timezone.now() + timedelta(seconds=5)
+        with mock.patch('api.changes.timezone.now', return_value=later):
+            with self.captureOnCommitCallbacks(execute=True):
+                Book.objects.filter(pk=self.book2.pk).delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_author_rename_changes_book_etags(self):
+        """
+        Test that renaming an author changes book ETags that depend on the author's name.
+        """
+        list_url = reverse('book-list')
+        detail_url = reverse('book-detail', kwargs={'pk': self.book1.id})
+        list_etag = self.client.get(list_url, {'author__name': 'J.K. Rowling'})['ETag']
+        detail_etag = self.client.get(detail_url, {'expand': 'author'})['ETag']
+        self.author1.name = 'Robert Galbraith'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author1.save()
+
+        response = self.client.get(list_url, {'author__name': 'J.K. Rowling'}, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get(detail_url, {'expand': 'author'}, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['name'], 'Robert Galbraith')
+
+    def test_list_validators_do_not_scan_tables(self):
+        """
+        Test that a list 304 reads the version rows only, with no COUNT or MAX over the tables.
+        """
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(context), 1)
+        self.assertIn('api_resourceversion', context[0]['sql'])
+
+    def test_bulk_update_bumps_marker(self):
+        """
+        Test that the bulk endpoint bumps updated_at (bulk_update skips auto_now).
+        """
+        before = self.book1.updated_at
+        self.client.login(username='regular', password='testpass123')
+        self.client.patch(reverse('book-bulk'), [{'id': self.book1.id, 'title': 'Bulk'}], format='json')
+        self.book1.refresh_from_db()
+        self.assertGreater(self.book1.updated_at, before)
+
+    def test_missing_row_is_404(self):
+        """
+        Test that conditional handling leaves 404s alone.
+        """
+        response = self.client.get(reverse('book-detail', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+class BookFacetTests(BaseTestCase):
+    """
+    Test cases for the decade and author facet counts (/api/books/facets/)
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_facet_counts(self):
+        """
+        Test that books are counted per decade (in order) and per author (largest first).
+        """
+        response = self.client.get(reverse('book-facets'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['facets']['decade'], [
+            {'value': 1930, 'label': '1930s', 'count': 1},
+            {'value': 1990, 'label': '1990s', 'count': 3},
+        ])
+        self.assertEqual(response.data['facets']['author'][0], {
+            'value': self.author1.pk, 'label': 'J.K. Rowling', 'count': 2,
+        })
+        self.assertEqual(len(response.data['facets']['author']), 3)
+
+    def test_facets_use_list_filters_and_search(self):
+        """
+        Test that facets count the same books BookListView returns for the query.
+        """
+        params = {'search': 'harry', 'publication_year__gte': 1998}
+        facets = self.client.get(reverse('book-facets'), params).data
+        books = self.client.get(reverse('book-list'), params).data
+        self.assertEqual(facets['count'], books['count'])
+        self.assertEqual(facets['facets']['decade'], [{'value': 1990, 'label': '1990s', 'count': 1}])
+        self.assertEqual(
+            facets['facets']['author'], [{'value': self.author1.pk, 'label': 'J.K. Rowling', 'count': 1}]
+        )
+
+    def test_facet_size(self):
+        """
+        Test that ?facet_size= keeps only the largest author buckets.
+        """
+        response = self.client.get(reverse('book-facets'), {'facet_size': 1})
+        self.assertEqual([row['label'] for row in response.data['facets']['author']], ['J.K. Rowling'])
+
+    def test_one_query_per_facet_and_cached(self):
+        """
+        Test that facets take one aggregate query each, and repeats come from the cache until a write.
+        """
+        url = reverse('book-facets')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, {'publication_year__gte': 1990})
+        self.assertEqual(len([query for query in context if 'GROUP BY' in query['sql']]), 2)
+
+        response = self.client.get(url, {'publication_year__gte': '1990', 'search': ''})
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Fire and Blood', publication_year=2018, author=self.author3)
+        response = self.client.get(url, {'publication_year__gte': 1990})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 4)
+
+
+class ChangeFeedTests(BaseTestCase):
+    """
+    Test cases for the change feed (/api/changes/)
+    """
+
+    def feed(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(reverse('change-feed'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def summary(self, data):
+        return [(change['resource'], change['id'], change['action']) for change in data['changes']]
+
+    def test_feed_from_start_has_every_row_with_data(self):
+        """
+        Test that reading from the start returns one create per row, with its current data.
+        """
+        data = self.feed()
+        self.assertEqual(len(data['changes']), 7)
+        self.assertEqual({change['action'] for change in data['changes']}, {'create'})
+        book = next(change for change in data['changes'] if change['resource'] == 'book')
+        self.assertEqual(book['data']['title'], Book.objects.get(pk=book['id']).title)
+        self.assertEqual(data['token'], data['changes'][-1]['token'])
+        self.assertFalse(data['has_more'])
+
+    def test_incremental_sync_includes_cascade_deletes(self):
+        """
+        Test that a later read returns only new changes, with cascaded book deletes and no data for deletes.
+        """
+        token = self.feed()['token']
+        self.client.login(username='regular', password='testpass123')
+        self.client.patch(reverse('book-update', kwargs={'pk': self.book2.pk}), {'title': 'There and Back Again'})
+        self.client.delete(reverse('author-delete', kwargs={'pk': self.author1.pk}))
+
+        data = self.feed(token)
+        changes = self.summary(data)
+        self.assertEqual(changes[0], ('book', self.book2.pk, 'update'))
+        # Cascaded books are logged before their author, in no fixed order
+        self.assertEqual(set(changes[1:3]), {('book', self.book1.pk, 'delete'), ('book', self.book4.pk, 'delete')})
+        self.assertEqual(changes[3:], [('author', self.author1.pk, 'delete')])
+        self.assertEqual(data['changes'][0]['data']['title'], 'There and Back Again')
+        self.assertIsNone(data['changes'][-1]['data'])
+        self.assertEqual(self.feed(data['token'])['changes'], [])
+
+    def test_only_newest_change_per_row(self):
+        """
+        Test that a row changed several times appears once, with its newest action.
+        """
+        token = self.feed()['token']
+        for year in (1990, 1991, 1992):
+            self.book3.publication_year = year
+            self.book3.save()
+        self.assertEqual(self.summary(self.feed(token)), [('book', self.book3.pk, 'update')])
+
+    @override_settings(CHANGE_FEED_SAFETY_WINDOW=60)
+    def test_safety_window_holds_back_recent_changes(self):
+        """
+        Test that changes inside the safety window, and every later id, wait until it has passed.
+        """
+        self.assertEqual(self.feed()['changes'], [])
+        changes = list(Change.objects.order_by('id'))
+        settled = timezone.now() - timedelta(minutes=5)
+        Change.objects.filter(pk__in=[change.pk for change in changes[:3]]).update(changed_at=settled)
+        # An older id committing late looks like a recent change among settled ones
+        Change.objects.filter(pk=changes[4].pk).update(changed_at=settled)
+
+        data = self.feed()
+        self.assertEqual([int(change['token']) for change in data['changes']], [change.pk for change in changes[:3]])
+        self.assertEqual(data['token'], str(changes[2].pk))
+
+    def test_bulk_writes_are_recorded(self):
+        """
+        Test that bulk create, update and delete appear in the feed.
+        """
+        token = self.feed()['token']
+        self.client.login(username='regular', password='testpass123')
+        url = reverse('book-bulk')
+        response = self.client.post(url, [{'title': 'Bulk', 'publication_year': 2001, 'author': self.author2.pk}], format='json')
+        created = response.data['results'][0]['id']
+        self.client.patch(url, [{'id': self.book1.pk, 'title': 'Renamed'}], format='json')
+        self.client.delete(url, [self.book2.pk], format='json')
+        self.assertEqual(self.summary(self.feed(token)), [
+            ('book', created, 'create'),
+            ('book', self.book1.pk, 'update'),
+            ('book', self.book2.pk, 'delete'),
+        ])
+
+    def test_cascade_delete_writes_one_insert(self):
+        """
+        Test that deleting an author logs it and its books with a single INSERT.
+        """
+        self.client.login(username='regular', password='testpass123')
+        with CaptureQueriesContext(connection) as context:
+            self.client.delete(reverse('author-delete', kwargs={'pk': self.author1.pk}))
+        inserts = [query for query in context if query['sql'].startswith('INSERT INTO "api_change"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Change.objects.filter(action='delete').count(), 3)
+
+    def test_limit_resource_and_next_links(self):
+        """
+        Test that following next with ?limit= and ?resource= visits every matching change once.
+        """
+        response = self.client.get(reverse('change-feed'), {'limit': 2, 'resource': 'book'})
+        seen = []
+        while True:
+            data = response.data
+            seen.extend(self.summary(data))
+            if not data['has_more']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(sorted(pk for _, pk, _ in seen), sorted(Book.objects.values_list('pk', flat=True)))
+        self.assertEqual({resource for resource, _, _ in seen}, {'book'})
+
+    def test_invalid_parameters(self):
+        """
+        Test that a malformed token or an unknown resource returns 400.
+        """
+        url = reverse('change-feed')
+        self.assertEqual(self.client.get(url, {'since': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'since': -1}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'resource': 'user'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastListSerializationTests(BaseTestCase):
+    """
+    Test cases for the values() fast path on the Book List View
+    """
+
+    def render(self, params, fast):
+        cache.clear()
+        with override_settings(API_FAST_LIST_SERIALIZATION=fast):
+            response = self.client.get(reverse('book-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content
+
+    def test_output_is_byte_for_byte_identical(self):
+        """
+        Test that the fast path renders exactly the same JSON as BookSerializer.
+        """
+        Book.objects.create(title='Ünïcode “Quotes”', publication_year=2001, author=self.author3)
+        for params in [
+            {},
+            {'ordering': '-publication_year'},
+            {'search': 'harry', 'ordering': 'author__name'},
+            {'publication_year__gte': 1990, 'page': 1},
+            {'pagination': 'keyset', 'page_size': 2, 'ordering': 'author__name'},
+            {'pagination': 'keyset', 'search': 'r'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.render(params, fast=True), self.render(params, fast=False))
+
+    def test_keyset_links_work_on_fast_path(self):
+        """
+        Test that keyset cursors built from values() rows walk the whole list.
+        """
+        cache.clear()
+        with override_settings(API_FAST_LIST_SERIALIZATION=True):
+            response = self.client.get(reverse('book-list'), {'pagination': 'keyset', 'page_size': 3})
+            ids = [book['id'] for book in response.data['results']]
+            response = self.client.get(response.data['next'])
+            ids += [book['id'] for book in response.data['results']]
+        self.assertEqual(sorted(ids), sorted(Book.objects.values_list('id', flat=True)))
+
+
+
+class BookExportViewTests(BaseTestCase):
+    """
+    Test cases for the streaming export (GET /api/books/export/)
+    """
+
+    def export(self, params=None, **headers):
+        response = self.client.get(reverse('book-export'), params or {}, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_is_default(self):
+        """
+        Test that the export streams every book as NDJSON, in id order.
+        """
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn('books.ndjson', response['Content-Disposition'])
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], sorted(Book.objects.values_list('id', flat=True)))
+        self.assertEqual(rows[0], {
+            'id': self.book1.id,
+            'title': self.book1.title,
+            'publication_year': 1997,
+            'author': self.author1.id,
+            'author_name': 'J.K. Rowling',
+        })
+
+    def test_csv_format(self):
+        """
+        Test that ?format=csv (or Accept: text/csv) streams CSV with a header.
+        """
+        for params, headers in [({'format': 'csv'}, {}), ({}, {'HTTP_ACCEPT': 'text/csv'})]:
+            response, body = self.export(params, **headers)
+            self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+            rows = list(csv.reader(io.StringIO(body)))
+            self.assertEqual(rows[0], ['id', 'title', 'publication_year', 'author', 'author_name'])
+            self.assertEqual(len(rows), 5)
+            self.assertIn([str(self.book2.id), 'The Hobbit', '1937', str(self.author2.id), 'J.R.R. Tolkien'], rows)
+
+    def test_filters_search_and_ordering_apply(self):
+        """
+        Test that BookListView's filter, search and ordering parameters apply.
+        """
+        _, body = self.export({'author__name': 'Rowling', 'ordering': '-publication_year'})
+        titles = [json.loads(line)['title'] for line in body.splitlines()]
+        self.assertEqual(titles, [self.book4.title, self.book1.title])
+
+        _, body = self.export({'search': 'hobbit'})
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.book2.id])
+
+    def test_single_query_regardless_of_size(self):
+        """
+        Test that author names come from a join, not one query per row.
+        """
+        Book.objects.bulk_create([
+            Book(title=f'Volume {number}', publication_year=2000, author=self.author2)
+            for number in range(50)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            _, body = self.export()
+        self.assertEqual(len(body.splitlines()), 54)
+        self.assertEqual(len(queries), 1)
+
+    def test_unknown_format_is_rejected(self):
+        """
+        Test that formats other than ndjson and csv are not acceptable.
+        """
+        response = self.client.get(reverse('book-export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('book-export'), HTTP_ACCEPT='application/xml')
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+
+class SparseFieldsetTests(BaseTestCase):
+    """
+    Test cases for ?fields= and ?expand= on the Book and Author read views
+    """
+
+    def get(self, name, params, **kwargs):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, kwargs=kwargs or None), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        # Leave out the ETag marker queries
+        return response, [
+            query['sql'] for query in queries.captured_queries
+            if 'MAX(' not in query['sql'] and 'api_resourceversion' not in query['sql']
+        ]
+
+    def test_author_fields_skip_books_prefetch(self):
+        """
+        Test that ?fields=id,name drops the books and their prefetch query.
+        """
+        response, sql = self.get('author-list', {'fields': 'id,name'})
+        self.assertEqual(response.data['results'][0], {'id': self.author3.id, 'name': 'George R.R. Martin'})
+        self.assertEqual(len(sql), 2)  # COUNT + page, no prefetch
+        self.assertNotIn('api_book', sql[-1])
+        self.assertNotIn('updated_at', sql[-1])
+
+    def test_nested_book_fields(self):
+        """
+        Test that dotted names select fields of the nested books.
+        """
+        response, sql = self.get('author-detail', {'fields': 'name,books.title'}, pk=self.author1.pk)
+        self.assertEqual(response.data, {
+            'name': 'J.K. Rowling',
+            'books': [{'title': self.book4.title}, {'title': self.book1.title}],
+        })
+        prefetch = sql[-1]
+        self.assertIn('"api_book"."title"', prefetch)
+        self.assertNotIn('publication_year', prefetch)
+
+    def test_book_fields_and_expand(self):
+        """
+        Test that ?expand=author embeds the author with one joined query.
+        """
+        response, sql = self.get('book-list', {'fields': 'title,author', 'expand': 'author', 'ordering': 'publication_year'})
+        self.assertEqual(response.data['results'][0], {
+            'title': 'The Hobbit',
+            'author': {'id': self.author2.id, 'name': 'J.R.R. Tolkien'},
+        })
+        self.assertEqual(len(sql), 2)
+        self.assertIn('JOIN "api_author"', sql[-1])
+
+        response, sql = self.get('book-detail', {'fields': 'id'}, pk=self.book2.pk)
+        self.assertEqual(response.data, {'id': self.book2.id})
+        self.assertNotIn('title', sql[-1])
+
+    def test_expanded_author_fields(self):
+        """
+        Test that dotted names select fields of the expanded author, and only those are read.
+        """
+        response, sql = self.get('book-detail', {'fields': 'id,author.name', 'expand': 'author'}, pk=self.book2.pk)
+        self.assertEqual(response.data, {'id': self.book2.id, 'author': {'name': 'J.R.R. Tolkien'}})
+        self.assertIn('"api_author"."name"', sql[-1])
+        self.assertNotIn('"api_book"."title"', sql[-1])
+
+        response, _ = self.get('book-list', {'fields': 'author.id', 'expand': 'author', 'ordering': 'id'})
+        self.assertEqual(response.data['results'][0], {'author': {'id': self.author1.id}})
+
+    def test_expand_nested_books_author(self):
+        """
+        Test that expansion reaches nested serializers (?expand=books.author).
+        """
+        response, _ = self.get('author-detail', {'expand': 'books.author'}, pk=self.author2.pk)
+        self.assertEqual(response.data['books'][0]['author'], {'id': self.author2.id, 'name': 'J.R.R. Tolkien'})
+
+    def test_keyset_pages_with_narrowed_queryset(self):
+        """
+        Test that keyset pagination still reads its ordering keys without extra queries.
+        """
+        response, sql = self.get('book-list', {'fields': 'id', 'pagination': 'keyset', 'ordering': 'author__name', 'page_size': 2})
+        self.assertEqual(len(sql), 1)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_unknown_fields_are_rejected(self):
+        """
+        Test that unknown field or expansion names return 400.
+        """
+        for params in [{'fields': 'id,isbn'}, {'expand': 'title'}, {'fields': 'books.isbn'}]:
+            with self.subTest(params=params):
+                cache.clear()
+                response = self.client.get(reverse('author-list'), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class AuthorStatsViewTests(BaseTestCase):
+    """
+    Test cases for the AuthorStats fields on the Author views and the bulk paths
+    """
+
+    def list_names(self, params):
+        cache.clear()
+        response = self.client.get(reverse('author-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [author['name'] for author in response.data['results']]
+
+    def test_stats_are_rendered(self):
+        """
+        Test that authors carry book_count, min_year and max_year.
+        """
+        response = self.client.get(reverse('author-detail', kwargs={'pk': self.author1.pk}))
+        self.assertEqual(response.data['book_count'], 2)
+        self.assertEqual(response.data['min_year'], 1997)
+        self.assertEqual(response.data['max_year'], 1998)
+
+    def test_filter_and_order_by_stats(self):
+        """
+        Test ?book_count / year range filters and ?ordering= on the stats fields.
+        """
+        self.assertEqual(self.list_names({'book_count__gte': 2}), ['J.K. Rowling'])
+        self.assertEqual(self.list_names({'max_year__lte': 1996}), ['George R.R. Martin', 'J.R.R. Tolkien'])
+        self.assertEqual(
+            self.list_names({'ordering': '-min_year'}),
+            ['J.K. Rowling', 'George R.R. Martin', 'J.R.R. Tolkien'],
+        )
+
+    def test_bulk_paths_keep_stats_current(self):
+        """
+        Test bulk create, update and delete through BookBulkView.
+        """
+        self.client.login(username='regular', password='testpass123')
+        response = self.client.post(reverse('book-bulk'), [
+            {'title': 'Unfinished Tales', 'publication_year': 1980, 'author': self.author2.id},
+            {'title': 'The Silmarillion', 'publication_year': 1977, 'author': self.author2.id},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stats = AuthorStats.objects.get(author=self.author2)
+        self.assertEqual((stats.book_count, stats.min_year, stats.max_year), (3, 1937, 1980))
+
+        response = self.client.patch(reverse('book-bulk'), [
+            {'id': self.book2.id, 'author': self.author3.id},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = AuthorStats.objects.get(author=self.author2)
+        self.assertEqual((stats.book_count, stats.min_year), (2, 1977))
+        self.assertEqual(AuthorStats.objects.get(author=self.author3).min_year, 1937)
+
+        response = self.client.delete(reverse('book-bulk'), [self.book1.id, self.book4.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = AuthorStats.objects.get(author=self.author1)
+        self.assertEqual((stats.book_count, stats.min_year, stats.max_year), (0, None, None))
+
+    def test_author_delete_view_cascades_stats(self):
+        """
+        Test that AuthorDeleteView removes the author's stats with its books.
+        """
+        self.client.login(username='regular', password='testpass123')
+        response = self.client.delete(reverse('author-delete', kwargs={'pk': self.author1.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AuthorStats.objects.filter(author_id=self.author1.pk).exists())
+
+
+
+class QueryBudgetMiddlewareTests(BaseTestCase):
+    """
+    Test cases for the per-request query budget middleware
+    """
+
+    def budget(self, **config):
+        return override_settings(QUERY_BUDGET={'RAISE': True, 'SERVER_TIMING': True, **config})
+
+    def test_server_timing_header(self):
+        """
+        Test that responses report query count and DB time.
+        """
+        cache.clear()
+        with self.budget():
+            response = self.client.get(reverse('book-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries"$')
+
+    def test_over_budget_raises_or_logs(self):
+        """
+        Test that exceeding the URL name's budget raises in tests and logs otherwise.
+        """
+        cache.clear()
+        with self.budget(BUDGETS={'book-list': 2}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'book-list: 3 queries (budget 2)'):
+                self.client.get(reverse('book-list'))
+        cache.clear()
+        with self.budget(BUDGETS={'book-list': 2}, RAISE=False):
+            with self.assertLogs('querybudget', 'WARNING'):
+                response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_repeated_sql_is_named_as_n_plus_one(self):
+        """
+        Test that a query run once per row is reported once, by shape.
+        """
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for author in Author.objects.all():
+                list(author.books.all())
+        duplicates = recorder.duplicates(limit=2)
+        self.assertEqual(len(duplicates), 1)
+        shape, count = duplicates[0]
+        self.assertEqual(count, 3)
+        self.assertIn('FROM "api_book" WHERE "api_book"."author_id" = ?', shape)
+
+    def test_sql_shape_collapses_values(self):
+        """
+        Test that literals, placeholders and IN lists don't split shapes.
+        """
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s,  %s) AND c = 12"),
+            sql_shape("SELECT * FROM t WHERE a = 'yy' AND b IN (%s) AND c = 7"),
+        )
+
+
+class AsyncReadViewTests(BaseTestCase):
+    """
+    Test cases for the async Book/Author read views (api.async_views)
+    """
+
+    PAIRS = [
+        ('book-list', 'async-book-list', {}),
+        ('book-list', 'async-book-list', {'search': 'harry'}),
+        ('book-list', 'async-book-list', {'publication_year__gt': 1990, 'ordering': '-publication_year'}),
+        ('book-list', 'async-book-list', {'pagination': 'keyset', 'ordering': 'author__name', 'page_size': 2}),
+        ('book-list', 'async-book-list', {'count': 'estimate', 'publication_year__gt': 1990}),
+        ('author-list', 'async-author-list', {'ordering': '-book_count'}),
+        ('author-list', 'async-author-list', {'search': 'Tolkien', 'book_count__gte': 1}),
+    ]
+
+    def assertSameContent(self, sync_url, async_url, params=None):
+        cache.clear()
+        expected = self.client.get(sync_url, params or {}, HTTP_ACCEPT='application/json')
+        response = self.client.get(async_url, params or {})
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        # Pagination links point at the view that served the page
+        sync_path, async_path = (url.split('?')[0].encode('utf-8') for url in (sync_url, async_url))
+        self.assertEqual(response.content, expected.content.replace(sync_path, async_path))
+        return response
+
+    def test_lists_match_sync_views(self):
+        """
+        Test that filters, search, ordering and every pagination mode give the sync views' JSON.
+        """
+        for sync_name, async_name, params in self.PAIRS:
+            with self.subTest(view=async_name, params=params):
+                response = self.assertSameContent(reverse(sync_name), reverse(async_name), params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_details_match_sync_views(self):
+        """
+        Test that book and author details, books included, match the sync views.
+        """
+        self.assertSameContent(
+            reverse('book-detail', kwargs={'pk': self.book1.pk}),
+            reverse('async-book-detail', kwargs={'pk': self.book1.pk}),
+        )
+        response = self.assertSameContent(
+            reverse('author-detail', kwargs={'pk': self.author1.pk}),
+            reverse('async-author-detail', kwargs={'pk': self.author1.pk}),
+        )
+        self.assertEqual(len(response.json()['books']), 2)
+
+    def test_errors_match_sync_views(self):
+        """
+        Test that missing rows, bad pages, filters and cursors give the same errors.
+        """
+        self.assertSameContent(
+            reverse('book-detail', kwargs={'pk': 9999}), reverse('async-book-detail', kwargs={'pk': 9999})
+        )
+        for params in ({'page': 99}, {'publication_year': 'abc'}, {'cursor': 'garbage'}):
+            with self.subTest(params=params):
+                response = self.assertSameContent(reverse('book-list'), reverse('async-book-list'), params)
+                self.assertGreaterEqual(response.status_code, 400)
+
+    def test_writes_are_not_allowed(self):
+        """
+        Test that the async views are read-only.
+        """
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(reverse('async-book-list'), {'title': 'X'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_constant_queries_under_async_client(self):
+        """
+        Test that author pages load their books in one query, counted by the async middleware path.
+        """
+        with override_settings(QUERY_BUDGET={'RAISE': True, 'SERVER_TIMING': True}):
+            response = await self.async_client.get(reverse('async-author-list'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # COUNT(*), the page, the books of the page
+            self.assertRegex(response['Server-Timing'], r'desc="3 queries"$')
+
+            response = await self.async_client.get(reverse('async-book-detail', kwargs={'pk': self.book1.pk}))
+            self.assertRegex(response['Server-Timing'], r'desc="1 queries"$')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    Test cases for primary/replica routing (advanced_api_project.routers).
+    Under the test runner replica1 mirrors the default test database, so
+    routing is observed per connection.
+    """
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.author = Author.objects.create(name='Octavia Butler')
+        self.book = Book.objects.create(title='Kindred', publication_year=1979, author=self.author)
+        cache.clear()
+
+    def get_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        """
+        Test that list and detail reads are served by the replica.
+        """
+        for url in (reverse('book-list'), reverse('author-detail', kwargs={'pk': self.author.pk})):
+            with self.subTest(url=url):
+                response, primary, replica = self.get_queries('get', url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_export_streams_from_replica(self):
+        """
+        Test that the export reads its rows from the replica although they stream after the request.
+        """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.client.get(reverse('book-export'))
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Kindred', body)
+        self.assertEqual(len(primary), 0)
+        self.assertTrue(any('"api_book"."title"' in query['sql'] for query in replica.captured_queries))
+
+    def test_writes_go_to_primary_and_pin_the_client(self):
+        """
+        Test that a write uses only the primary and the client then reads its own writes.
+        """
+        self.client.force_authenticate(user=self.user)
+        data = {'title': 'Dawn', 'publication_year': 1987, 'author': self.author.pk}
+        response, primary, replica = self.get_queries('post', reverse('book-create'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replica, 0)
+        self.assertIn('db_primary', response.cookies)
+        self.assertEqual(response.cookies['db_primary']['max-age'], 5)
+
+        response, primary, replica = self.get_queries('get', reverse('book-list'))
+        self.assertEqual(replica, 0)
+        self.assertIn('Dawn', [book['title'] for book in response.data['results']])
+
+        other = APIClient()
+        with CaptureQueriesContext(connections['replica1']) as replica:
+            other.get(reverse('book-list'))
+        self.assertGreater(len(replica), 0)
+
+    def test_failed_write_does_not_pin(self):
+        """
+        Test that a request that wrote nothing doesn't set the pin cookie.
+        """
+        self.client.force_authenticate(user=self.user)
+        response, primary, replica = self.get_queries('post', reverse('book-create'), {'title': ''})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(replica, 0)
+        self.assertNotIn('db_primary', response.cookies)
+
+    def test_router_outside_requests(self):
+        """
+        Test that commands and transactions read from the primary and replicas are not migrated.
+        """
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Book), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'api'))
+        self.assertIsNone(router.allow_migrate('default', 'api'))
+
+        token = _replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Book), 'replica1')
+            with use_primary():
+                self.assertEqual(router.db_for_read(Book), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Book), 'default')
+            with override_settings(DATABASE_REPLICAS=[]):
+                self.assertEqual(router.db_for_read(Book), 'default')
+        finally:
+            _replica_reads.reset(token)
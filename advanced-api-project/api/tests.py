@@ -1,7 +1,24 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
-from .models import Author, Book
-from .serializers import BookSerializer, AuthorSerializer
+from rest_framework import serializers
+from django_shared.sqlite.base import TUNED_PRAGMAS, parse_pragmas
+from .benchmarking import compare_results, count_rows, seed_catalog
+from .caching import get_generations
+from .management.commands.explain_book_queries import Command as ExplainCommand
+from .changes import changes_after
+from .models import Author, AuthorStats, Book, Change
+from .serializers import BookSerializer, AuthorSerializer, AuthorBookCreateSerializer
+from .stats import batch_author_stats, verify_author_stats
 
 class SerializerTests(TestCase):
     
@@ -43,4 +60,369 @@ class SerializerTests(TestCase):
         serializer = AuthorSerializer(instance=self.author)
         self.assertEqual(serializer.data['name'], 'J.K. Rowling')
         self.assertEqual(len(serializer.data['books']), 2)
-        self.assertEqual(serializer.data['books'][0]['title'], 'Harry Potter')
\ No newline at end of file
+        self.assertEqual(serializer.data['books'][0]['title'], 'Harry Potter')
+
+
+class AuthorBookCreateSerializerTests(TestCase):
+
+    def test_nested_create_uses_constant_queries(self):
+        """Test nested create inserts all books with one bulk query"""
+        data = {
+            'name': 'Prolific Writer',
+            'books': [{'title': f'Book {i}', 'publication_year': 1990 + i} for i in range(30)],
+        }
+        serializer = AuthorBookCreateSerializer(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as context:
+            author = serializer.save()
+        # Savepoints, three INSERTs, the change log and its version row, stats
+        self.assertLessEqual(len(context), 10)
+        self.assertEqual(author.books.count(), 30)
+        self.assertEqual(sorted(serializer.created_book_ids),
+                         sorted(author.books.values_list('id', flat=True)))
+        self.assertEqual(len(serializer.data['created_book_ids']), 30)
+
+    def test_nested_create_validates_books(self):
+        """Test nested books go through BookSerializer validation"""
+        future_year = timezone.now().year + 1
+        data = {'name': 'Time Traveller', 'books': [{'title': 'Soon', 'publication_year': future_year}]}
+        serializer = AuthorBookCreateSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('books', serializer.errors)
+
+    def test_nested_update_diffs_books(self):
+        """Test nested update creates, updates and deletes books in one pass"""
+        author = Author.objects.create(name='Diff Author')
+        kept = Book.objects.create(title='Kept', publication_year=2000, author=author)
+        removed = Book.objects.create(title='Removed', publication_year=2001, author=author)
+        data = {
+            'name': 'Diff Author',
+            'books': [
+                {'id': kept.id, 'title': 'Kept (2nd ed.)', 'publication_year': 2005},
+                {'title': 'Brand New', 'publication_year': 2010},
+            ],
+        }
+        serializer = AuthorBookCreateSerializer(author, data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        kept.refresh_from_db()
+        self.assertEqual(kept.title, 'Kept (2nd ed.)')
+        self.assertFalse(Book.objects.filter(id=removed.id).exists())
+        self.assertEqual(serializer.deleted_book_ids, [removed.id])
+        self.assertEqual(len(serializer.created_book_ids), 1)
+        self.assertEqual(author.books.count(), 2)
+
+    def test_nested_update_rejects_foreign_book(self):
+        """Test nested update refuses books owned by another author"""
+        author = Author.objects.create(name='Owner')
+        other = Author.objects.create(name='Other')
+        foreign = Book.objects.create(title='Not Yours', publication_year=2000, author=other)
+        serializer = AuthorBookCreateSerializer(author, data={
+            'name': 'Owner',
+            'books': [{'id': foreign.id, 'title': 'Stolen', 'publication_year': 2000}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, 'Not Yours')
+
+
+
+class ExplainBookQueriesCommandTests(TestCase):
+
+    def test_command_reports_every_combination(self):
+        """Test explain_book_queries checks each filter/ordering pair"""
+        out = StringIO()
+        call_command('explain_book_queries', seed=200, stdout=out)
+        self.assertIn('96 combinations checked', out.getvalue())
+        # The seeded rows are rolled back
+        self.assertEqual(Book.objects.count(), 0)
+
+    def test_no_unexpected_scans(self):
+        """Test every scan or sort is listed as accepted"""
+        out = StringIO()
+        call_command('explain_book_queries', seed=200, fail_on_scan=True, stdout=out)
+        self.assertIn('0 unexpected scans or sorts', out.getvalue())
+
+    def test_missing_prefix_index_is_unexpected(self):
+        """Test title__startswith fails the check without its case-insensitive index"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX book_title_nocase_idx')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('explain_book_queries', seed=200, fail_on_scan=True, stdout=out)
+        self.assertRegex(out.getvalue(), r'title__startswith +title +.*FULL SCAN')
+
+    def test_index_walk_counts_as_scan(self):
+        """Test SCAN ... USING INDEX is a scan and only SEARCH is index access"""
+        inspect = ExplainCommand.inspect_plan
+        scans, sorts = inspect('sqlite', '3 0 0 SCAN api_book USING INDEX book_title_id_idx')
+        self.assertEqual((len(scans), sorts), (1, []))
+        scans, sorts = inspect('sqlite', '2 0 0 SCAN api_book USING COVERING INDEX book_year_id_idx')
+        self.assertEqual(len(scans), 1)
+        scans, sorts = inspect('sqlite', '5 0 0 SCAN api_book')
+        self.assertEqual(len(scans), 1)
+        scans, sorts = inspect('sqlite', '4 0 0 SEARCH api_book USING INDEX book_year_id_idx (publication_year=?)')
+        self.assertEqual((scans, sorts), ([], []))
+
+
+
+class BenchmarkBookSerializersCommandTests(TestCase):
+
+    def test_command_reports_rates(self):
+        """Test benchmark_book_serializers compares both paths"""
+        out = StringIO()
+        call_command('benchmark_book_serializers', seed=50, rows=20, repeat=2, stdout=out)
+        self.assertIn('identical output', out.getvalue())
+        self.assertIn('Speedup', out.getvalue())
+
+
+
+class AuthorStatsTests(TestCase):
+
+    def setUp(self):
+        """Set up two authors with a few books"""
+        self.author = Author.objects.create(name="Ursula K. Le Guin")
+        self.other = Author.objects.create(name="Iain M. Banks")
+        self.book = Book.objects.create(title="A Wizard of Earthsea", publication_year=1968, author=self.author)
+        Book.objects.create(title="The Dispossessed", publication_year=1974, author=self.author)
+
+    def stats(self, author):
+        row = AuthorStats.objects.get(author=author)
+        return row.book_count, row.min_year, row.max_year
+
+    def test_new_author_has_empty_stats(self):
+        """Test that creating an author creates a zero stats row"""
+        self.assertEqual(self.stats(self.other), (0, None, None))
+
+    def test_save_and_delete_update_stats(self):
+        """Test stats follow create, year change, move and delete of a book"""
+        self.assertEqual(self.stats(self.author), (2, 1968, 1974))
+
+        self.book.publication_year = 1980
+        self.book.save()
+        self.assertEqual(self.stats(self.author), (2, 1974, 1980))
+
+        book = Book.objects.get(pk=self.book.pk)
+        book.author = self.other
+        book.save()
+        self.assertEqual(self.stats(self.author), (1, 1974, 1974))
+        self.assertEqual(self.stats(self.other), (1, 1980, 1980))
+
+        book.delete()
+        self.assertEqual(self.stats(self.other), (0, None, None))
+
+    def test_title_change_skips_recompute(self):
+        """Test saves that can't change the stats don't recompute them"""
+        book = Book.objects.get(pk=self.book.pk)
+        book.title = "Earthsea"
+        with CaptureQueriesContext(connection) as queries:
+            book.save()
+        self.assertFalse([q for q in queries.captured_queries if 'api_authorstats' in q['sql']])
+
+    def test_cascade_delete_removes_stats(self):
+        """Test deleting an author removes its stats row along with its books"""
+        self.author.delete()
+        self.assertFalse(AuthorStats.objects.filter(author_id=self.author.pk).exists())
+        self.assertEqual(verify_author_stats(), [])
+
+    def test_batch_recomputes_once(self):
+        """Test batch_author_stats collapses per-row refreshes into one"""
+        with CaptureQueriesContext(connection) as queries:
+            with batch_author_stats():
+                Book.objects.filter(author=self.author).delete()
+        upserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "api_authorstats"')]
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(self.stats(self.author), (0, None, None))
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test rebuild_author_stats --check detects drift and a rebuild fixes it"""
+        # queryset.update() bypasses the signals
+        Book.objects.filter(author=self.author).update(publication_year=2000)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_author_stats', check=True, stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_author_stats', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+        self.assertEqual(self.stats(self.author), (2, 2000, 2000))
+
+    def test_nested_author_writes_update_stats(self):
+        """Test AuthorBookCreateSerializer create and update refresh the stats"""
+        serializer = AuthorBookCreateSerializer(data={'name': 'Octavia E. Butler', 'books': [
+            {'title': 'Kindred', 'publication_year': 1979},
+            {'title': 'Dawn', 'publication_year': 1987},
+        ]})
+        serializer.is_valid(raise_exception=True)
+        author = serializer.save()
+        self.assertEqual(self.stats(author), (2, 1979, 1987))
+
+        kindred = author.books.get(title='Kindred')
+        serializer = AuthorBookCreateSerializer(author, data={'name': author.name, 'books': [
+            {'id': kindred.id, 'title': 'Kindred', 'publication_year': 1979},
+        ]})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.stats(author), (1, 1979, 1979))
+
+
+
+class BenchmarkApiCommandTests(TestCase):
+
+    def test_benchmark_covers_every_url_and_saves_baseline(self):
+        """Test benchmark_api drives every api URL and round-trips a baseline"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            call_command('benchmark_api', seed=300, requests=2, save=path, stdout=StringIO())
+            with open(path) as fh:
+                report = json.load(fh)
+
+            out = StringIO()
+            call_command('benchmark_api', seed=300, requests=2, compare=path, tolerance=100, stdout=out)
+            self.assertIn('No regressions', out.getvalue())
+
+        url_names = {row['url_name'] for row in report['results'].values()}
+        self.assertIn('book-export', url_names)
+        self.assertIn('author-book-update', url_names)
+        for row in report['results'].values():
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+            self.assertTrue(all(code < '400' for code in row['statuses']), row)
+        # The benchmark rolls back everything it wrote
+        self.assertFalse(Book.objects.exists())
+
+    def test_cached_run_evicts_on_writes(self):
+        """Test --with-cache runs each request's on_commit bumps inside the rolled-back transaction"""
+        cache.clear()
+        before = get_generations(['book-list'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cached.json')
+            call_command('benchmark_api', seed=300, requests=2, with_cache=True, save=path, stdout=StringIO())
+            with open(path) as fh:
+                report = json.load(fh)
+        self.assertTrue(report['meta']['cache'])
+        self.assertNotEqual(get_generations(['book-list']), before)
+
+    def test_count_rows_counts_feed_entries_and_facet_buckets(self):
+        """Test rows/sec counts change feed entries and facet buckets, not one per response"""
+        author = Author.objects.create(name='Octavia Butler')
+        Book.objects.create(title='Kindred', publication_year=1979, author=author)
+        Book.objects.create(title='Dawn', publication_year=1987, author=author)
+        self.assertEqual(count_rows(self.client.get(reverse('change-feed'))), 3)
+        # Two decades and one author
+        self.assertEqual(count_rows(self.client.get(reverse('book-facets'))), 3)
+        self.assertEqual(count_rows(self.client.get(reverse('author-detail', kwargs={'pk': author.pk}))), 1)
+
+    def test_compare_flags_slower_p95_and_extra_queries(self):
+        """Test regressions need both the relative and absolute slowdown"""
+        baseline = {'list': {'p95_ms': 10.0, 'queries_per_request': 3}}
+        self.assertEqual(list(compare_results(baseline, {'list': {'p95_ms': 14.0, 'queries_per_request': 3}}, 0.25)), [])
+        self.assertEqual(
+            list(compare_results(baseline, {'list': {'p95_ms': 20.0, 'queries_per_request': 4}}, 0.25)),
+            [('list', 'p95_ms', 10.0, 20.0), ('list', 'queries_per_request', 3, 4)],
+        )
+
+
+class BenchmarkAsgiCommandTests(TransactionTestCase):
+
+    def test_sync_and_async_views_under_asgi(self):
+        """Test benchmark_asgi sends the same reads to both kinds of view at each concurrency"""
+        seed_catalog(200)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'asgi.json')
+            call_command('benchmark_asgi', seed=0, requests=16, concurrency='1,4', save=path, stdout=StringIO())
+            with open(path) as fh:
+                report = json.load(fh)
+
+        runs = [(row['concurrency'], row['views']) for row in report['results']]
+        self.assertEqual(runs, [(1, 'sync'), (1, 'async'), (4, 'sync'), (4, 'async')])
+        for row in report['results']:
+            self.assertEqual(row['statuses'], {'200': 16}, row)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+    def test_rejects_bad_concurrency(self):
+        """Test --concurrency must list positive integers"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_asgi', seed=0, concurrency='0', stdout=StringIO())
+
+
+class SQLitePragmaTests(TestCase):
+
+    def test_parse_pragmas(self):
+        """Test SQLITE_PRAGMAS values: tuned, off, overrides and dicts"""
+        self.assertEqual(parse_pragmas(None), TUNED_PRAGMAS)
+        self.assertEqual(parse_pragmas('tuned'), TUNED_PRAGMAS)
+        self.assertEqual(parse_pragmas('off'), {})
+        self.assertEqual(parse_pragmas(' busy_timeout = 100 '), {'busy_timeout': '100'})
+        overridden = parse_pragmas('tuned,mmap_size=0,synchronous=FULL')
+        self.assertEqual(overridden['mmap_size'], '0')
+        self.assertEqual(overridden['synchronous'], 'full')
+        self.assertEqual(overridden['journal_mode'], 'wal')
+        self.assertEqual(parse_pragmas({'cache_size': -2000, 'mmap_size': None}), {'cache_size': -2000})
+
+    def test_rejects_invalid_pragmas(self):
+        """Test pragma names and values are validated before they reach SQL"""
+        for value in ('wal', 'journal_mode=wal; DROP TABLE api_book', 'cache size=1', {'mmap_size': '1 OR 1'}):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_pragmas(value)
+
+    def test_connection_runs_pragmas(self):
+        """Test new connections run the tuned pragmas (the in-memory test database has no WAL or mmap)"""
+        with connection.cursor() as cursor:
+            for name in ('busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], TUNED_PRAGMAS[name], name)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class BenchmarkSqliteCommandTests(TestCase):
+
+    def test_compares_baseline_and_tuned(self):
+        """Test benchmark_sqlite reads and writes a scratch database in both modes"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sqlite.json')
+            call_command(
+                'benchmark_sqlite', seed=50, readers=1, writers=1, duration=0.2, save=path, stdout=StringIO()
+            )
+            with open(path) as fh:
+                report = json.load(fh)
+
+        self.assertEqual(list(report['results']), ['baseline', 'tuned'])
+        for row in report['results'].values():
+            self.assertGreater(row['reads']['ops'], 0)
+            self.assertGreater(row['writes']['ops'], 0)
+        # The scratch database is gone and nothing was written here
+        self.assertFalse(Book.objects.exists())
+
+    def test_rejects_no_threads(self):
+        """Test benchmark_sqlite needs a reader or a writer"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_sqlite', readers=0, writers=0, stdout=StringIO())
+
+
+class CompactChangesCommandTests(TestCase):
+
+    def test_compaction_keeps_newest_change_per_row(self):
+        """Test compact_changes deletes superseded entries and the feed reads the same"""
+        author = Author.objects.create(name='Ursula K. Le Guin')
+        book = Book.objects.create(title='A Wizard of Earthsea', publication_year=1968, author=author)
+        for year in (1969, 1970):
+            book.publication_year = year
+            book.save()
+        gone = Book.objects.create(title='Draft', publication_year=1970, author=author)
+        gone.delete()
+        before = list(changes_after(0))
+
+        call_command('compact_changes', older_than=0, stdout=StringIO())
+        self.assertEqual(list(changes_after(0)), before)
+        self.assertEqual(Change.objects.count(), 3)
+
+    def test_recent_entries_are_kept(self):
+        """Test --older-than leaves recent history alone"""
+        author = Author.objects.create(name='Octavia Butler')
+        author.name = 'Octavia E. Butler'
+        author.save()
+        call_command('compact_changes', stdout=StringIO())
+        self.assertEqual(Change.objects.filter(resource='author', object_id=author.pk).count(), 2)
+
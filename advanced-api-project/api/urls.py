@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Book URLs - Updated to match checker requirements
@@ -8,6 +8,9 @@ urlpatterns = [
     path('books/create/', views.BookCreateView.as_view(), name='book-create'),
     path('books/update/<int:pk>/', views.BookUpdateView.as_view(), name='book-update'),  # Fixed pattern
     path('books/delete/<int:pk>/', views.BookDeleteView.as_view(), name='book-delete'),  # Fixed pattern
+    path('books/bulk/', views.BookBulkView.as_view(), name='book-bulk'),
+    path('books/export/', views.BookExportView.as_view(), name='book-export'),
+    path('books/facets/', views.BookFacetView.as_view(), name='book-facets'),
     
     # Author URLs - Also updated for consistency
     path('authors/', views.AuthorListView.as_view(), name='author-list'),
@@ -15,4 +18,15 @@ urlpatterns = [
     path('authors/create/', views.AuthorCreateView.as_view(), name='author-create'),
     path('authors/update/<int:pk>/', views.AuthorUpdateView.as_view(), name='author-update'),
     path('authors/delete/<int:pk>/', views.AuthorDeleteView.as_view(), name='author-delete'),
+    path('authors/create-with-books/', views.AuthorBookCreateView.as_view(), name='author-book-create'),
+    path('authors/update-with-books/<int:pk>/', views.AuthorBookUpdateView.as_view(), name='author-book-update'),
+
+    # Change feed for incremental sync (see api.changes)
+    path('changes/', views.ChangeFeedView.as_view(), name='change-feed'),
+
+    # Native async read views for ASGI (see api.async_views)
+    path('async/books/', async_views.AsyncBookListView.as_view(), name='async-book-list'),
+    path('async/books/<int:pk>/', async_views.AsyncBookDetailView.as_view(), name='async-book-detail'),
+    path('async/authors/', async_views.AsyncAuthorListView.as_view(), name='async-author-list'),
+    path('async/authors/<int:pk>/', async_views.AsyncAuthorDetailView.as_view(), name='async-author-detail'),
 ]
\ No newline at end of file
@@ -1,42 +1,83 @@
-from rest_framework import generics
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django_filters import rest_framework
 from rest_framework import filters  # Import filters module
-from .models import Author, Book
-from .serializers import AuthorSerializer, BookSerializer
-from .filters import BookFilter
+from .models import Author, Book, Change
+from .serializers import AuthorBookCreateSerializer, AuthorSerializer, BookSerializer, BookValuesSerializer
+from .caching import CachedResponseMixin, batch_invalidation, invalidate_books
+from .changes import batch_changes, changes_after, record_changes
+from .facets import facet_counts
+from .conditional import ConditionalGetMixin
+from .fastpath import ValuesListMixin
+from .filters import AuthorFilter, BookFilter, BookSearchFilter, RankedOrderingFilter
+from .pagination import KeysetPagination, PaginationModeMixin
+from .parsers import NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer
+from .sparse import SparseFieldsMixin
+from .stats import batch_author_stats, book_author_ids, refresh_author_stats
 
-class BookListView(generics.ListAPIView):
+class BookListView(ConditionalGetMixin, CachedResponseMixin, SparseFieldsMixin, ValuesListMixin, PaginationModeMixin,
+                   generics.ListAPIView):
     """
     Enhanced ListView for books with advanced filtering, searching, and ordering capabilities.
     
     Features:
     - Filtering: Filter by publication year, title, and author name with various lookups
-    - Searching: Full-text search on title and author name fields
+    - Searching: Indexed full-text search on title and author name fields
+      (prefix matching, "quoted phrases", relevance ranking; see api.search)
     - Ordering: Order by any book field with multiple ordering options
     - Pagination: Results are paginated for better performance
+    - Keyset pagination: ?pagination=keyset switches to cursor-based pages
+      with no COUNT(*) and constant cost per page (see KeysetPagination)
+    - Estimated counts: ?count=estimate replaces the exact COUNT(*) of
+      large result sets with an estimate (see EstimatedCountPagination)
+    - Caching: responses are cached per normalized query and evicted when
+      books or authors change (see api.caching)
+    - Conditional GET: ETag / Last-Modified headers, 304 on If-None-Match
+      (see api.conditional)
+    - Fast path: with API_FAST_LIST_SERIALIZATION on, pages are rendered
+      from values() rows (see api.fastpath), same JSON output
+    - Field selection: ?fields= and ?expand= narrow the payload and the SQL
+      (see api.sparse)
     
     Example Usage:
     - Filter: /api/books/?publication_year=2020&author__name=Tolkien
     - Search: /api/books/?search=Harry Potter
     - Order: /api/books/?ordering=title,-publication_year
     - Combine: /api/books/?publication_year__gt=2000&search=fantasy&ordering=-publication_year
+    - Keyset: /api/books/?pagination=keyset&ordering=-publication_year
+    - Estimated count: /api/books/?publication_year__gte=1900&count=estimate
+    - Fields: /api/books/?fields=id,title&expand=author
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    values_serializer_class = BookValuesSerializer
+    cache_scope = 'book'
+    # Filters, search, ordering and ?expand= use the author's name
+    conditional_related = ('author',)
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     # Filter backends configuration - use filters.OrderingFilter specifically
     filter_backends = [
         rest_framework.DjangoFilterBackend,
-        filters.SearchFilter,        # Use filters.SearchFilter
-        filters.OrderingFilter,      # Use filters.OrderingFilter
+        BookSearchFilter,            # Indexed search, see api.search
+        RankedOrderingFilter,        # OrderingFilter + relevance when searching
     ]
     
     # Django Filter configuration
     filterset_class = BookFilter
     
-    # Search configuration - enables full-text search on specified fields
+    # Search configuration - the fields covered by the search index
     search_fields = [
         'title',           # Search in book titles
         'author__name',    # Search in author names
@@ -53,6 +94,10 @@ class BookListView(generics.ListAPIView):
     # Default ordering when no ordering specified
     ordering = ['title']
 
+    # Opt-in keyset pagination (?pagination=keyset) and estimated counts
+    # (?count=estimate), see PaginationModeMixin
+    keyset_pagination_class = KeysetPagination
+
     def get_queryset(self):
         """
         Customize queryset to handle additional filtering logic.
@@ -68,15 +113,19 @@ class BookListView(generics.ListAPIView):
         return queryset.select_related('author')  # Optimize database queries
 
 
-class BookDetailView(generics.RetrieveAPIView):
+class BookDetailView(ConditionalGetMixin, CachedResponseMixin, SparseFieldsMixin, generics.RetrieveAPIView):
     """
     DetailView for retrieving a single book by ID.
     
     Provides read-only access to a specific Book instance.
     No authentication required for viewing individual books.
+    Responses are cached until this book changes (see api.caching).
+    Supports ?fields= and ?expand=author (see api.sparse).
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    cache_scope = 'book'
+    conditional_related = ('author',)
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
@@ -118,36 +167,380 @@ class BookDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
 
 
+class BookBulkView(generics.GenericAPIView):
+    """
+    Bulk endpoint for creating, updating and deleting many books per request.
+
+    Accepts a JSON array or an NDJSON stream (Content-Type:
+    application/x-ndjson). Every item is validated with BookSerializer
+    (including validate_publication_year); valid items are written with
+    bulk_create / bulk_update in chunked transactions, invalid ones are
+    reported without aborting the rest of the batch. Updates lock and
+    re-read each chunk's rows in its transaction, and reject every item
+    whose id repeats within the request.
+
+    - POST:   create books, items look like the BookCreateView payload
+    - PATCH:  partial update, every item needs an "id"
+    - PUT:    full update, every item needs an "id"
+    - DELETE: items are book ids (or objects with an "id")
+
+    The response lists one result per item, in request order:
+    {"succeeded": 2, "failed": 1, "results": [{"index": 0, "status": "created", "id": 7}, ...]}
+    Status is 201/200 when every item succeeded, 207 on partial success
+    and 400 when nothing could be written.
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    # Rows written per bulk query / transaction
+    chunk_size = 500
+
+    def post(self, request, *args, **kwargs):
+        items = self.get_items(request)
+        results = [None] * len(items)
+        valid = []
+        context = self.get_bulk_context(items)
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = self.error_result(index, serializer.errors)
+
+        for chunk in self.chunked(valid):
+            with transaction.atomic():
+                books = Book.objects.bulk_create(
+                    [Book(**data) for _, data in chunk],
+                    batch_size=self.chunk_size,
+                )
+                # bulk_create does not send post_save
+                refresh_author_stats(book_author_ids(books))
+                record_changes('book', [book.pk for book in books], Change.CREATE)
+            for (index, _), book in zip(chunk, books):
+                results[index] = {'index': index, 'status': 'created', 'id': book.pk}
+            invalidate_books(books)
+        return self.bulk_response(results, status.HTTP_201_CREATED)
+
+    def put(self, request, *args, **kwargs):
+        return self.bulk_update(request, partial=False)
+
+    def patch(self, request, *args, **kwargs):
+        return self.bulk_update(request, partial=True)
+
+    def bulk_update(self, request, partial):
+        items = self.get_items(request)
+        results = [None] * len(items)
+        ids = [self.get_item_id(item) for item in items]
+        counts = Counter(ids)
+        context = self.get_bulk_context(items)
+        pending = []
+        for index, pk in enumerate(ids):
+            if pk is None:
+                results[index] = self.error_result(index, {'id': ['This field is required.']})
+            elif counts[pk] > 1:
+                # Applying both would leave whichever came last, while
+                # reporting each as updated
+                results[index] = self.error_result(index, {'id': [f'Book {pk} appears more than once.']})
+            else:
+                pending.append((index, pk))
+
+        for chunk in self.chunked(pending):
+            updated = []
+            with transaction.atomic():
+                # Validate and write from rows locked for the transaction
+                # (where the backend can; SQLite runs one writer at a
+                # time), so fields an item leaves alone are written back
+                # as they are now, not as an earlier read saw them
+                instances = self.get_queryset().select_for_update().in_bulk([pk for _, pk in chunk])
+                fields = {'updated_at'}
+                for index, pk in chunk:
+                    instance = instances.get(pk)
+                    if instance is None:
+                        results[index] = self.error_result(index, {'id': [f'Book {pk} does not exist.']})
+                        continue
+                    serializer = self.get_serializer(instance, data=items[index], partial=partial, context=context)
+                    if not serializer.is_valid():
+                        results[index] = self.error_result(index, serializer.errors)
+                        continue
+                    for field, value in serializer.validated_data.items():
+                        setattr(instance, field, value)
+                    # bulk_update skips auto_now, so bump the change marker here
+                    instance.updated_at = timezone.now()
+                    fields.update(serializer.validated_data)
+                    updated.append((index, instance))
+
+                books = [instance for _, instance in updated]
+                if books:
+                    Book.objects.bulk_update(books, sorted(fields), batch_size=self.chunk_size)
+                    # bulk_update does not send post_save
+                    if {'author', 'publication_year'} & fields:
+                        refresh_author_stats(book_author_ids(books))
+                    record_changes('book', [book.pk for book in books], Change.UPDATE)
+            for index, instance in updated:
+                results[index] = {'index': index, 'status': 'updated', 'id': instance.pk}
+            if books:
+                invalidate_books(books)
+        return self.bulk_response(results, status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        items = self.get_items(request)
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            pk = item if isinstance(item, int) and not isinstance(item, bool) else self.get_item_id(item)
+            if pk is None:
+                results[index] = self.error_result(index, {'id': ['A valid book id is required.']})
+            else:
+                valid.append((index, pk))
+
+        for chunk in self.chunked(valid):
+            pks = {pk for _, pk in chunk}
+            # One stats recompute, one change log INSERT and one cache
+            # write per chunk instead of one per deleted book
+            with transaction.atomic(), batch_author_stats(), batch_changes(), batch_invalidation():
+                # Lock the rows (where the backend can; SQLite locks the
+                # whole database on the DELETE) so the books reported as
+                # deleted are exactly the ones this request deletes
+                queryset = self.get_queryset().filter(pk__in=pks).select_for_update()
+                existing = set(queryset.values_list('pk', flat=True))
+                Book.objects.filter(pk__in=existing).delete()
+            for index, pk in chunk:
+                if pk in existing:
+                    results[index] = {'index': index, 'status': 'deleted', 'id': pk}
+                else:
+                    results[index] = self.error_result(index, {'id': [f'Book {pk} does not exist.']})
+        return self.bulk_response(results, status.HTTP_200_OK)
+
+    def get_items(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if not items:
+            raise ValidationError({'non_field_errors': ['Expected at least one item.']})
+        return items
+
+    def get_bulk_context(self, items):
+        """
+        Serializer context with every referenced author preloaded in one
+        query (see AuthorPrimaryKeyField).
+        """
+        author_ids = set()
+        for item in items:
+            if isinstance(item, dict):
+                try:
+                    author_ids.add(int(item.get('author')))
+                except (TypeError, ValueError):
+                    pass
+        context = self.get_serializer_context()
+        context['authors'] = Author.objects.in_bulk(author_ids)
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('context', self.get_serializer_context())
+        return self.get_serializer_class()(*args, **kwargs)
+
+    @staticmethod
+    def get_item_id(item):
+        if not isinstance(item, dict):
+            return None
+        try:
+            return int(item.get('id'))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def error_result(index, errors):
+        return {'index': index, 'status': 'error', 'errors': errors}
+
+    def chunked(self, rows):
+        for start in range(0, len(rows), self.chunk_size):
+            yield rows[start:start + self.chunk_size]
+
+    @staticmethod
+    def bulk_response(results, success_status):
+        failed = sum(1 for result in results if result['status'] == 'error')
+        succeeded = len(results) - failed
+        if not failed:
+            response_status = success_status
+        elif succeeded:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'succeeded': succeeded, 'failed': failed, 'results': results},
+            status=response_status,
+        )
+
+
+
+class BookExportView(generics.GenericAPIView):
+    """
+    Streaming export of every book matching the BookListView filters.
+
+    The response is not paginated: rows are read with a server-side
+    cursor (iterator(chunk_size=...)) and written to a
+    StreamingHttpResponse as they arrive, so memory use is flat however
+    large the catalog is. Author names come from the same query (a join),
+    not from a lookup per row.
+
+    Formats (Accept header or ?format=):
+    - ndjson (default): one JSON object per line
+    - csv: header line, then one row per book
+
+    Columns: id, title, publication_year, author, author_name
+
+    Example Usage:
+    - Everything: /api/books/export/
+    - CSV of one decade: /api/books/export/?format=csv&publication_year__gte=1990&publication_year__lt=2000
+    - Search and order: /api/books/export/?search=tolkien&ordering=-publication_year
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    pagination_class = None
+
+    filter_backends = [
+        rest_framework.DjangoFilterBackend,
+        BookSearchFilter,
+        RankedOrderingFilter,
+    ]
+    filterset_class = BookFilter
+    search_fields = BookListView.search_fields
+    ordering_fields = BookListView.ordering_fields
+    # Stable primary key order, so nightly dumps diff cleanly
+    ordering = ['id']
+
+    # Serialized name -> values() lookup
+    columns = {
+        'id': 'id',
+        'title': 'title',
+        'publication_year': 'publication_year',
+        'author': 'author_id',
+        'author_name': 'author__name',
+    }
+
+    # Rows fetched from the database cursor at a time
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        # The rows are read while the response streams, after
+        # ReplicaRoutingMiddleware has returned, so pick the database now
+        queryset = self.filter_queryset(self.get_queryset()).using(router.db_for_read(Book))
+        rows = queryset.values_list(*self.columns.values()).iterator(chunk_size=self.chunk_size)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(list(self.columns), rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{renderer.format}"'
+        return response
+
+
+class BookFacetView(CachedResponseMixin, generics.GenericAPIView):
+    """
+    Facet counts for the books matching the BookListView filters and search:
+    books per publication decade and per author (the ``facet_size``
+    largest, default 10, max 100), plus the total.
+
+    Each facet is one aggregate query, or both come from a single
+    GROUPING SETS query on PostgreSQL (see api.facets). Responses are
+    cached per normalized query string until a book or author changes.
+
+    Example Usage:
+    - /api/books/facets/?search=dragon
+    - /api/books/facets/?publication_year__gte=1950&facet_size=5
+    """
+    queryset = Book.objects.all()
+    cache_scope = 'book'
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = None
+
+    filter_backends = [
+        rest_framework.DjangoFilterBackend,
+        BookSearchFilter,
+    ]
+    filterset_class = BookFilter
+    search_fields = BookListView.search_fields
+
+    facet_size = 10
+    max_facet_size = 100
+    facet_size_query_param = 'facet_size'
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(['book-list'], self.facets, request, *args, **kwargs)
+
+    def facets(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(facet_counts(queryset, size=self.get_facet_size(request)))
+
+    def get_facet_size(self, request):
+        try:
+            size = int(request.query_params[self.facet_size_query_param])
+        except (KeyError, ValueError):
+            return self.facet_size
+        return min(max(size, 1), self.max_facet_size)
+
+
 # Enhanced Author List View with basic filtering and ordering
-class AuthorListView(generics.ListAPIView):
+class AuthorListView(ConditionalGetMixin, CachedResponseMixin, SparseFieldsMixin, PaginationModeMixin,
+                     generics.ListAPIView):
     """
     ListView for retrieving all authors with their books.
     
     Includes basic search and ordering capabilities.
+    Nested books for the whole page are loaded in one batched query
+    (prefetch_related) instead of one query per author.
+    Responses are cached until an author or book changes (see api.caching).
+    book_count / min_year / max_year come from the denormalized AuthorStats
+    table and can be filtered and ordered on without aggregating books:
+    /api/authors/?book_count__gte=3&ordering=-max_year
+    ?fields=id,name skips the books prefetch entirely; ?fields=id,books.title
+    loads only the book columns that are rendered (see api.sparse).
     """
-    queryset = Author.objects.all()
+    queryset = Author.objects.select_related('stats').prefetch_related('books')
     serializer_class = AuthorSerializer
+    cache_scope = 'author'
+    conditional_related = ('books',)
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     # Use filters.OrderingFilter and filters.SearchFilter
     filter_backends = [
+        rest_framework.DjangoFilterBackend,
         filters.SearchFilter,
         filters.OrderingFilter,
     ]
+    filterset_class = AuthorFilter
     search_fields = ['name']
-    ordering_fields = ['name', 'id']
+    ordering_fields = ['name', 'id', 'book_count', 'min_year', 'max_year']
     ordering = ['name']
 
+    def get_queryset(self):
+        """
+        Expose the AuthorStats columns under their API names for ?ordering=.
+        """
+        return super().get_queryset().alias(
+            book_count=F('stats__book_count'),
+            min_year=F('stats__min_year'),
+            max_year=F('stats__max_year'),
+        )
 
-class AuthorDetailView(generics.RetrieveAPIView):
+
+class AuthorDetailView(ConditionalGetMixin, CachedResponseMixin, SparseFieldsMixin, generics.RetrieveAPIView):
     """
     DetailView for retrieving a single author by ID.
     
     Provides read-only access to a specific Author instance.
     Includes nested book data for the author.
+    Responses are cached until the author or one of their books changes.
+    Supports ?fields= and ?expand= like AuthorListView.
     """
-    queryset = Author.objects.all()
+    queryset = Author.objects.select_related('stats').prefetch_related('books')
     serializer_class = AuthorSerializer
+    cache_scope = 'author'
+    conditional_related = ('books',)
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
@@ -182,7 +575,146 @@ class AuthorDeleteView(generics.DestroyAPIView):
     Handles DELETE requests to remove Author instances.
     Requires authentication to delete authors.
     Note: This will cascade delete related books due to CASCADE setting.
+    The author's AuthorStats row goes with it. The author and every
+    cascaded book are recorded in the change feed with one INSERT, and
+    their cached responses are evicted with one cache write.
     """
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+    def perform_destroy(self, instance):
+        with batch_changes(), batch_invalidation():
+            instance.delete()
+
+
+class AuthorBookCreateView(generics.CreateAPIView):
+    """
+    CreateView for adding an author together with their books.
+
+    Handles POST requests with a nested "books" list. The author and all
+    books are written in one transaction with a single bulk INSERT for the
+    books. The response includes the new author id and "created_book_ids".
+    Requires authentication.
+    """
+    queryset = Author.objects.all()
+    serializer_class = AuthorBookCreateSerializer
+    permission_classes = [IsAuthenticated]
+
+
+class AuthorBookUpdateView(generics.UpdateAPIView):
+    """
+    UpdateView for replacing an author's bibliography.
+
+    Handles PUT and PATCH requests with a nested "books" list: books with
+    an id are updated, books without one are created and books missing
+    from the list are deleted, all in one transaction with bulk queries.
+    The response includes "created_book_ids" and "deleted_book_ids".
+    Requires authentication.
+    """
+    queryset = Author.objects.all()
+    serializer_class = AuthorBookCreateSerializer
+    permission_classes = [IsAuthenticated]
+
+
+class ChangeFeedView(generics.GenericAPIView):
+    """
+    Feed of Book and Author changes for incremental sync.
+
+    Returns the changes recorded after ``?since=<token>`` (0 or missing:
+    from the start), oldest first, with only the newest change of each row
+    (see api.changes). Created and updated rows include their current
+    representation in "data", so a sync never re-reads the catalog.
+    Store the returned "token" and pass it as ``since`` next time. While
+    "has_more" is true, keep following "next".
+
+    Response:
+    {"token": "812", "has_more": false, "next": null, "changes": [
+        {"token": "811", "resource": "book", "id": 7, "action": "update",
+         "changed_at": "...", "data": {"id": 7, "title": ...}},
+        {"token": "812", "resource": "author", "id": 3, "action": "delete",
+         "changed_at": "...", "data": null}]}
+
+    Example Usage:
+    - Everything, 500 at a time: /api/changes/?limit=500
+    - Books changed since the last sync: /api/changes/?since=812&resource=book
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = None
+
+    limit = 100
+    max_limit = 1000
+
+    # Resource name -> (queryset for "data", serializer)
+    resources = {
+        'book': (Book.objects.all(), BookSerializer),
+        'author': (Author.objects.select_related('stats').prefetch_related('books'), AuthorSerializer),
+    }
+
+    def get(self, request, *args, **kwargs):
+        since = self.get_since(request)
+        limit = self.get_limit(request)
+        changes = list(changes_after(since, self.get_resources(request))[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        data = self.load_data(changes)
+
+        token = changes[-1].pk if changes else since
+        return Response({
+            'token': str(token),
+            'has_more': has_more,
+            'next': replace_query_param(request.build_absolute_uri(), 'since', token) if has_more else None,
+            'changes': [
+                {
+                    'token': str(change.pk),
+                    'resource': change.resource,
+                    'id': change.object_id,
+                    'action': change.action,
+                    'changed_at': change.changed_at,
+                    'data': data.get((change.resource, change.object_id)),
+                }
+                for change in changes
+            ],
+        })
+
+    def get_since(self, request):
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ValidationError({'since': ['Expected a token returned by this endpoint.']})
+        return since
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            return self.limit
+        return min(max(limit, 1), self.max_limit)
+
+    def get_resources(self, request):
+        resources = request.query_params.getlist('resource')
+        unknown = set(resources) - set(self.resources)
+        if unknown:
+            raise ValidationError({'resource': [f'Unknown resource: {", ".join(sorted(unknown))}.']})
+        return resources
+
+    def load_data(self, changes):
+        """
+        Serialize the rows that were created or updated, one query (plus
+        prefetches) per resource. Returns ``{(resource, id): data}``.
+        """
+        ids = {}
+        for change in changes:
+            if change.action != Change.DELETE:
+                ids.setdefault(change.resource, set()).add(change.object_id)
+        data = {}
+        context = self.get_serializer_context()
+        for resource, object_ids in ids.items():
+            queryset, serializer_class = self.resources[resource]
+            objects = list(queryset.filter(pk__in=object_ids))
+            for obj, row in zip(objects, serializer_class(objects, many=True, context=context).data):
+                data[resource, obj.pk] = row
+        return data
+
@@ -2,12 +2,18 @@
 Django settings for LibraryProject project (advanced_features_and_security copy).
 """
 
+import sys
 from pathlib import Path
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Modules shared by every project in this repository (django_shared/)
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - change DEBUG to False in production
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-replaced-for-dev')
@@ -32,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_shared.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'LibraryProject.security.ContentSecurityPolicyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -66,8 +73,12 @@ WSGI_APPLICATION = 'LibraryProject.wsgi.application'
 # Database
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'django_shared.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connection pragmas, see django_shared/sqlite/base.py: 'tuned' (WAL,
+        # synchronous=NORMAL, mmap, cache, busy timeout), 'off', or
+        # overrides such as 'tuned,mmap_size=0'
+        'OPTIONS': {'pragmas': os.environ.get('SQLITE_PRAGMAS', 'tuned')},
     }
 }
 
@@ -142,3 +153,12 @@ else:
 # can detect the original request scheme. This header tells Django which
 # header to trust to determine if the request was HTTPS.
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+# Per-request SQL query budgets (see django_shared/querybudget.py).
+# Add max queries per URL name under 'BUDGETS'. N+1 patterns are logged,
+# and raise with the test settings (test_settings.py).
+QUERY_BUDGET = {
+    'MAX_DUPLICATES': 3,
+    'RAISE': False,
+    'SERVER_TIMING': DEBUG,
+}
@@ -10,11 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Modules shared by every project in this repository (django_shared/)
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -43,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_shared.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,8 +86,12 @@ WSGI_APPLICATION = 'api_project.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'django_shared.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connection pragmas, see django_shared/sqlite/base.py: 'tuned' (WAL,
+        # synchronous=NORMAL, mmap, cache, busy timeout), 'off', or
+        # overrides such as 'tuned,mmap_size=0'
+        'OPTIONS': {'pragmas': os.environ.get('SQLITE_PRAGMAS', 'tuned')},
     }
 }
 
@@ -134,4 +146,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-}
\ No newline at end of file
+}
+
+# Per-request SQL query budgets (see django_shared/querybudget.py).
+# Budgets are max queries per request for a URL name, including the
+# session/user lookups of an authenticated request. Over-budget requests
+# and N+1 patterns are logged, and raise with the test settings (test_settings.py).
+QUERY_BUDGET = {
+    'BUDGETS': {
+        'book-list': 4,
+        'book_all-list': 4,
+        'book_all-detail': 4,
+    },
+    'MAX_DUPLICATES': 3,
+    'RAISE': False,
+    'SERVER_TIMING': DEBUG,
+}
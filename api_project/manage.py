@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_project.settings')
+    # The test command runs with the test settings (see api_project/test_settings.py)
+    settings = 'test_settings' if sys.argv[1:2] == ['test'] else 'settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', f'api_project.{settings}')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,9 @@
+"""
+Settings for the test suite. manage.py uses them for the test command;
+elsewhere set DJANGO_SETTINGS_MODULE=LibraryProject.test_settings.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import QUERY_BUDGET
+
+# Over-budget requests and N+1 patterns fail the test that makes them
+QUERY_BUDGET = {**QUERY_BUDGET, 'RAISE': True}
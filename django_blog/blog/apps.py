@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BlogConfig(AppConfig):
     name = 'blog'
+
+    def ready(self):
+        # Register signal receivers (fragment cache invalidation)
+        from . import signals  # noqa: F401
@@ -0,0 +1,147 @@
+"""
+Fragment cache for the rendered markup of posts and their comments.
+
+Fragments are keyed on the template and a *version*: a random token
+stored in the cache for a scope:
+
+- ``post:<pk>``: the post's title line, content and tag links
+- ``comments:<pk>``: the post's comment list
+
+Writes never delete fragments; they replace the version of every scope
+they affect, so old fragments become unreachable and age out. Editing a
+post, its tags or a tag name re-renders only the posts concerned, and a
+new comment only that post's comment list.
+
+Versions are bumped by the model signals in blog.signals once the write
+commits. Code paths that bypass signals (bulk_create, queryset.update)
+must call invalidate_posts() / invalidate_comments() themselves.
+
+Works with any Django cache backend; configure BLOG_CACHE_ALIAS and
+BLOG_CACHE_TIMEOUT in settings.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+KEY_PREFIX = 'blog'
+
+SUMMARY_TEMPLATE = 'blog/post_summary.html'
+BODY_TEMPLATE = 'blog/post_body.html'
+COMMENTS_TEMPLATE = 'blog/post_comments.html'
+
+
+def get_cache():
+    return caches[getattr(settings, 'BLOG_CACHE_ALIAS', 'default')]
+
+
+def get_versions(scopes):
+    """
+    Return a dict of the current token of each scope, creating missing ones.
+    """
+    cache = get_cache()
+    keys = {scope: f'{KEY_PREFIX}:version:{scope}' for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            # add() keeps a token another process created in the meantime;
+            # backends that store nothing (DummyCache) get the new token
+            token = uuid.uuid4().hex
+            cache.add(key, token, timeout=None)
+            found[key] = cache.get(key, token)
+        versions[scope] = found[key]
+    return versions
+
+
+def bump_versions(scopes):
+    """
+    Replace the versions of ``scopes`` once the current transaction commits
+    (right away outside a transaction), so a page rendered from the rows
+    before the commit is never cached under the new version.
+    """
+    if scopes:
+        keys = [f'{KEY_PREFIX}:version:{scope}' for scope in scopes]
+        transaction.on_commit(
+            lambda: get_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        )
+
+
+def invalidate_posts(post_ids, comments=False):
+    """
+    Evict the post fragments (and with ``comments``, the comment lists)
+    of ``post_ids``.
+    """
+    scopes = {f'post:{pk}' for pk in post_ids}
+    if comments:
+        scopes |= {f'comments:{pk}' for pk in post_ids}
+    bump_versions(scopes)
+
+
+def invalidate_comments(post_ids):
+    bump_versions({f'comments:{pk}' for pk in post_ids})
+
+
+def render_fragments(template_name, objects, scopes, render, vary=()):
+    """
+    Return the markup of ``template_name`` for each of ``objects``, taken
+    from the cache unless the object's scope (same order) has a new
+    version. ``render`` is called once with the objects that missed and
+    returns their markup. ``vary`` is added to every key.
+    """
+    cache = get_cache()
+    versions = get_versions(scopes)
+    suffix = ''.join(f':{part}' for part in vary)
+    keys = [f'{KEY_PREFIX}:fragment:{template_name}:{scope}:{versions[scope]}{suffix}' for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [(key, obj) for key, obj in zip(keys, objects) if key not in found]
+    if missing:
+        rendered = dict(zip(
+            [key for key, _ in missing],
+            render([obj for _, obj in missing]),
+        ))
+        cache.set_many(rendered, getattr(settings, 'BLOG_CACHE_TIMEOUT', 3600))
+        found.update(rendered)
+    return [mark_safe(found[key]) for key in keys]
+
+
+def attach_summaries(posts):
+    """
+    Set ``summary_html`` on each of ``posts`` for the list templates. Tags
+    are only loaded for posts that are not cached.
+    """
+    def render(missing):
+        prefetch_related_objects(missing, 'tags')
+        return [render_to_string(SUMMARY_TEMPLATE, {'post': post}) for post in missing]
+
+    fragments = render_fragments(SUMMARY_TEMPLATE, posts, [f'post:{post.pk}' for post in posts], render)
+    for post, html in zip(posts, fragments):
+        post.summary_html = html
+
+
+def post_body(post):
+    """
+    Markup of the post on its detail page.
+    """
+    def render(missing):
+        return [render_to_string(BODY_TEMPLATE, {'post': post}) for post in missing]
+
+    return render_fragments(BODY_TEMPLATE, [post], [f'post:{post.pk}'], render)[0]
+
+
+def post_comments(post, user):
+    """
+    Markup of the post's comment list for ``user``, who sees edit links on
+    their own comments (so each signed-in reader gets their own fragment).
+    """
+    def render(missing):
+        comments = post.comments.select_related('author').order_by('created_at')
+        return [render_to_string(COMMENTS_TEMPLATE, {'comments': comments, 'user': user})]
+
+    viewer = user.pk if user.is_authenticated else 'anonymous'
+    return render_fragments(COMMENTS_TEMPLATE, [post], [f'comments:{post.pk}'], render, vary=[viewer])[0]
@@ -37,23 +37,60 @@ class PostForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields["tags"].widget.attrs.setdefault(
             "placeholder", "e.g. django, python")
-        if self.instance.pk:
-            existing = self.instance.tags.values_list("name", flat=True)
-            self.fields["tags"].initial = ", ".join(existing)
+        # Loaded once: shown in the field and diffed against on save
+        self.current_tags = list(self.instance.tags.all()) if self.instance.pk else []
+        self.fields["tags"].initial = ", ".join(tag.name for tag in self.current_tags)
+
+    def clean_tags(self):
+        names = []
+        for name in self.cleaned_data["tags"].split(","):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+        max_length = Tag._meta.get_field("name").max_length
+        if any(len(name) > max_length for name in names):
+            raise forms.ValidationError(
+                f"Tags can be at most {max_length} characters long.")
+        return names
 
     def save(self, commit=True):
         instance = super().save(commit=False)
         if commit:
             instance.save()
-        tag_names = self.cleaned_data.get("tags", "")
-        tags = []
-        for name in [t.strip() for t in tag_names.split(",") if t.strip()]:
-            tag, _ = Tag.objects.get_or_create(name=name)
-            tags.append(tag)
-        if commit:
-            instance.tags.set(tags)
+            self.save_tags()
+        else:
+            self.save_m2m = self.save_tags
         return instance
 
+    def save_tags(self):
+        """
+        Set the post's tags to the names entered, adding and removing only
+        the links that changed.
+        """
+        tags = get_or_create_tags(self.cleaned_data.get("tags", []))
+        current = {tag.pk for tag in self.current_tags}
+        wanted = {tag.pk for tag in tags}
+        if current - wanted:
+            self.instance.tags.remove(*(current - wanted))
+        if wanted - current:
+            self.instance.tags.add(*(wanted - current))
+        self.current_tags = tags
+
+
+def get_or_create_tags(names):
+    """
+    The Tags named ``names``, in order, creating the missing ones with one
+    SELECT, plus one INSERT and one SELECT when some are new.
+    """
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        # A concurrent save may create some of them first; ignoring the
+        # conflict and reading them back returns whichever row won
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        tags.update((tag.name, tag) for tag in Tag.objects.filter(name__in=missing))
+    return [tags[name] for name in names]
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,123 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from blog.models import Post, Tag
+from blog.search import (
+    SQLiteFTSSearchBackend, drop_search_triggers, install_search_index, is_ranked, parse_terms, sqlite_supports_fts5,
+)
+from django_shared.sqlite.base import TUNED_PRAGMAS
+from django_shared.sqlite.benchmark import percentile, scratch_database
+
+
+# Words in about a quarter of all title, content and tag positions; the
+# rest of the text comes from a long-tailed vocabulary of w<n> words
+COMMON_WORDS = ['django', 'python', 'the', 'and', 'of', 'orm', 'query', 'database', 'tips', 'code']
+VOCABULARY = 20000
+TAGS = COMMON_WORDS + ['web', 'api', 'tests', 'deploy', 'async']
+
+QUERIES = {
+    'common word': 'django',
+    'common prefix': 'dj',
+    'two common words': 'django orm',
+    'common phrase': '"django orm"',
+    'common and rare': 'django w25',
+    'uncommon word': 'w120',
+    'rare word': 'w1234',
+    'stop words': 'the and',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Time blog searches on a scratch database of synthetic posts and '
+        'fail when the 95th percentile of a query is over the target. '
+        'Each query fetches its first page and the page after it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500000, help='Posts to seed (default: 500000).')
+        parser.add_argument('--runs', type=int, default=50, help='Timed runs per query and page (default: 50).')
+        parser.add_argument('--per-page', type=int, default=10, help='Hits per page (default: 10).')
+        parser.add_argument(
+            '--target-ms', type=float, default=20.0, help='Highest allowed p95 per query in ms (default: 20).'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or not sqlite_supports_fts5(connection):
+            raise CommandError('benchmark_search needs an SQLite database with FTS5.')
+        if options['posts'] < 1 or options['runs'] < 1 or options['per_page'] < 1:
+            raise CommandError('--posts, --runs and --per-page must be at least 1.')
+
+        with tempfile.TemporaryDirectory() as directory:
+            with scratch_database(Path(directory) / 'search.sqlite3', TUNED_PRAGMAS) as alias:
+                call_command('migrate', database=alias, verbosity=0)
+                started = time.perf_counter()
+                self.setup(alias, options['posts'])
+                self.stdout.write(f'Seeded {options["posts"]:,} posts in {time.perf_counter() - started:.1f}s')
+                results = self.measure(alias, options['runs'], options['per_page'])
+
+        self.stdout.write(f'{"query":<18} {"mode":<7} {"p50":>8} {"p95":>8}')
+        slow = []
+        for label, row in results.items():
+            self.stdout.write(f'{label:<18} {row["mode"]:<7} {row["p50_ms"]:>6.2f}ms {row["p95_ms"]:>6.2f}ms')
+            if row['p95_ms'] > options['target_ms']:
+                slow.append(label)
+        if slow:
+            raise CommandError(f'p95 over {options["target_ms"]:g}ms for: {", ".join(slow)}')
+        self.stdout.write(self.style.SUCCESS(f'Every query is within {options["target_ms"]:g}ms at p95.'))
+
+    def setup(self, alias, posts):
+        """
+        Seed ``posts`` posts with a six-word title, 80 words of content and
+        two tags each. The search triggers are dropped while seeding and the
+        index is built once at the end, as the migrations do.
+        """
+        rng = random.Random(0)
+
+        def words(count):
+            return ' '.join(
+                rng.choice(COMMON_WORDS) if rng.random() < 0.25
+                else f'w{int(rng.paretovariate(1.1)) % VOCABULARY}'
+                for _ in range(count)
+            )
+
+        with connections[alias].schema_editor() as editor:
+            drop_search_triggers(editor)
+        author = User.objects.create(username='benchmark', password='!')
+        tags = Tag.objects.bulk_create([Tag(name=name) for name in TAGS])
+        for start in range(0, posts, 10000):
+            batch = Post.objects.bulk_create(
+                [Post(title=words(6), content=words(80), author=author) for _ in range(min(10000, posts - start))]
+            )
+            Post.tags.through.objects.bulk_create(
+                [Post.tags.through(post=post, tag=tag) for post in batch for tag in rng.sample(tags, 2)]
+            )
+        with connections[alias].schema_editor() as editor:
+            install_search_index(editor)
+
+    def measure(self, alias, runs, per_page):
+        backend = SQLiteFTSSearchBackend(alias)
+        results = {}
+        for label, query in QUERIES.items():
+            terms = parse_terms(query)
+            first = backend.hits(terms, None, False, per_page + 1)
+            position = (first[per_page - 1][1], first[per_page - 1][0]) if len(first) > per_page else None
+            samples = []
+            for _ in range(runs):
+                for page in [None, position] if position else [None]:
+                    began = time.perf_counter()
+                    backend.hits(terms, page, False, per_page + 1)
+                    samples.append(time.perf_counter() - began)
+            results[label] = {
+                'mode': 'newest' if not is_ranked(terms) else 'bm25' if backend.is_selective(terms) else 'tiered',
+                'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                'p95_ms': round(percentile(samples, 95) * 1000, 3),
+            }
+        return results
@@ -0,0 +1,70 @@
+import random
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+
+from blog.models import Comment, Post, Tag
+from django_shared.sqlite.benchmark import BenchmarkSQLiteCommand
+
+
+class Command(BenchmarkSQLiteCommand):
+    help = (
+        'Measure lock contention on SQLite: reader threads open post pages '
+        'while writer threads post comments, once with the stock rollback '
+        'journal and once with the tuned pragmas (WAL, synchronous=NORMAL, '
+        'mmap, cache, busy timeout). Runs on a scratch database in a '
+        'temporary directory.'
+    )
+    seed_noun = 'posts'
+    seed_default = 500
+
+    def setup(self, posts):
+        """
+        Seed one author per 10 posts, 20 tags, two tags and three comments
+        per post.
+        """
+        rng = random.Random(0)
+        users = User.objects.bulk_create(
+            [User(username=f'benchmark{i}', password='!') for i in range(max(1, posts // 10))]
+        )
+        tags = Tag.objects.bulk_create([Tag(name=f'tag{i}') for i in range(20)])
+        post_objs = Post.objects.bulk_create(
+            [
+                Post(title=f'Post {i}', content='Lorem ipsum dolor sit amet. ' * 20, author=rng.choice(users))
+                for i in range(posts)
+            ]
+        )
+        Post.tags.through.objects.bulk_create(
+            [
+                Post.tags.through(post=post, tag=tag)
+                for post in post_objs for tag in rng.sample(tags, 2)
+            ]
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(post=post, author=rng.choice(users), content='Nice post.')
+                for post in post_objs for _ in range(3)
+            ]
+        )
+        self.user_ids = [user.pk for user in users]
+        self.post_ids = [post.pk for post in post_objs]
+
+    def reader(self):
+        client, rng = Client(), random.Random()
+
+        def read():
+            client.get(reverse('post_detail', args=[rng.choice(self.post_ids)]))
+        return read
+
+    def writer(self):
+        client, rng, sequence = Client(), random.Random(), count()
+        client.force_login(User.objects.get(pk=rng.choice(self.user_ids)))
+
+        def write():
+            client.post(
+                reverse('comment_create', args=[rng.choice(self.post_ids)]),
+                {'content': f'Benchmark comment {next(sequence)}'},
+            )
+        return write
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from blog.search import install_search_index, uninstall_search_index
+
+
+def rebuild_search_index(apps, schema_editor):
+    # The prefix index lengths are fixed when the FTS5 table is created
+    uninstall_search_index(schema_editor)
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
@@ -17,6 +17,12 @@ class Post(models.Model):
         User, on_delete=models.CASCADE, related_name='posts')
     tags = models.ManyToManyField(Tag, related_name='posts', blank=True)
 
+    class Meta:
+        indexes = [
+            # Feed order; id breaks ties (see blog.pagination)
+            models.Index(fields=['-published_date', '-id'], name='post_feed_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.title
 
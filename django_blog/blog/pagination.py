@@ -0,0 +1,118 @@
+"""
+Keyset ("older/newer") pagination for the blog's post feeds.
+
+Feeds are ordered newest first by ``(published_date, id)``; ``id`` breaks
+ties between posts published in the same microsecond. Instead of a page
+number, the links carry the position of the first or last post shown:
+
+- ``?before=<token>``: the next page of older posts
+- ``?after=<token>``:  the previous page of newer posts
+
+and the page is fetched with a ``WHERE (published_date, id) < (...)``
+seek served by the ``post_feed_idx`` index. No ``COUNT(*)`` is run and
+every page costs the same however deep the reader goes, so response time
+and memory stay flat as the blog grows.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+from django.http import Http404
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_position(post):
+    """
+    Token for a post's place in the feed: ``<epoch microseconds>-<id>``.
+    """
+    return f'{(post.published_date - EPOCH) // MICROSECOND}-{post.pk}'
+
+
+def decode_position(token):
+    try:
+        micros, pk = (int(part) for part in token.split('-'))
+        return EPOCH + micros * MICROSECOND, pk
+    except (ValueError, OverflowError):
+        raise Http404('Invalid page position')
+
+
+class KeysetPage:
+    """
+    One page of a feed. Quacks enough like django.core.paginator.Page for
+    ListView's ``page_obj`` and ``is_paginated``. ``encode`` turns a post
+    into its position token.
+    """
+
+    def __init__(self, object_list, has_older, has_newer, params, encode=encode_position):
+        self.object_list = object_list
+        self.has_older = has_older and bool(object_list)
+        self.has_newer = has_newer and bool(object_list)
+        self.params = params
+        self.encode = encode
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_older or self.has_newer
+
+    @property
+    def older_query(self):
+        """Query string for the older page, keeping the other parameters (e.g. ``q``)."""
+        return self._query('before', self.object_list[-1])
+
+    @property
+    def newer_query(self):
+        return self._query('after', self.object_list[0])
+
+    def _query(self, direction, post):
+        params = self.params.copy()
+        params.pop('before', None)
+        params.pop('after', None)
+        params[direction] = self.encode(post)
+        return params.urlencode()
+
+
+def keyset_page(queryset, params, per_page):
+    """
+    Return the KeysetPage of ``queryset`` selected by the ``before`` or
+    ``after`` token in ``params`` (the newest posts when neither is set).
+    """
+    after = params.get('after')
+    if after:
+        published_date, pk = decode_position(after)
+        queryset = queryset.filter(
+            Q(published_date__gt=published_date) | Q(published_date=published_date, id__gt=pk),
+            published_date__gte=published_date,
+        ).order_by('published_date', 'id')
+        posts = list(queryset[:per_page + 1])
+        has_newer = len(posts) > per_page
+        posts = posts[:per_page][::-1]
+        return KeysetPage(posts, True, has_newer, params)
+
+    before = params.get('before')
+    queryset = queryset.order_by('-published_date', '-id')
+    if before:
+        published_date, pk = decode_position(before)
+        queryset = queryset.filter(
+            Q(published_date__lt=published_date) | Q(published_date=published_date, id__lt=pk),
+            published_date__lte=published_date,
+        )
+    posts = list(queryset[:per_page + 1])
+    return KeysetPage(posts[:per_page], len(posts) > per_page, bool(before), params)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin serving ``paginate_by`` posts per page with keyset_page().
+    """
+    paginate_by = 10
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_page(queryset, self.request.GET, page_size)
+        return None, page, page.object_list, page.has_other_pages()
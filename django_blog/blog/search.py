@@ -0,0 +1,514 @@
+"""
+Full-text search for blog posts (SearchResultsView).
+
+The old search ORed ``icontains`` over title, content and tag names and
+deduplicated the tag join with DISTINCT, scanning every post body on
+every query. The backends here answer from an index:
+
+- SQLiteFTSSearchBackend: an FTS5 table (blog_post_fts) holding each
+  post's title, content and tag names, kept in sync by triggers on
+  blog_post, blog_post_tags and blog_tag, so saves, deletes, tag
+  add/remove/clear and tag renames are all covered. Every word must
+  match, the last one as a prefix (search as you type), and "quoted
+  text" is matched as a phrase. Results are ranked with bm25 (title,
+  then tags, then content), or in tiers for common words (see below).
+- ORMSearchBackend: the previous icontains behaviour, newest first,
+  used when FTS5 is not available.
+
+A query costs what its rarest parts cost, not what the blog's size does:
+
+- bm25 needs statistics over the whole doclist of every word in the
+  query, so it costs about a millisecond per thousand posts holding the
+  most common one; a word used in every post is the expensive case. The
+  FTS5 backend first counts each word's posts, stopping at
+  BM25_MAX_DOCS, and ranks with bm25 only when every word is under it.
+  Otherwise hits come in two tiers, newest first within each: posts
+  matching every word in the title or tags, then the rest. Both tiers
+  are streamed from the index in rowid order and stop at the page size,
+  so a page costs the same at 500 or 500k posts (see the benchmark_search
+  command, which checks this).
+- The last word is matched as a prefix from FTS5's prefix indexes, so
+  it costs what a complete word does (see PREFIX_LENGTHS).
+- Stop words ("the", "of", ...) are in nearly every post, so they add
+  nothing to bm25 but cost a pass over their whole doclist. Bare stop
+  words are dropped from the query unless nothing else is left. Inside
+  "quoted phrases" they still count.
+- Snippets are cut from the page's posts in Python, with the matched
+  words marked, rather than with one snippet() query per hit.
+
+Results are keyset-paginated on (rank, id): links carry the rank and id
+of the last hit shown, as in blog.pagination.
+"""
+import math
+import re
+import unicodedata
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .pagination import KeysetPage
+
+
+FTS_TABLE = 'blog_post_fts'
+
+# Quoted phrases or bare words, e.g.  "django orm" tip  ->  ['django orm', 'tip']
+TERM_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+# bm25 column weights: title, content, tags
+WEIGHTS = (10.0, 1.0, 5.0)
+
+# Prefix index lengths of blog_post_fts. The last word of a query is cut
+# to MAX_PREFIX letters, so every prefix query is answered from an index:
+# without one FTS5 merges the doclist of every word with that prefix
+# before returning the first hit (30 ms for "django"* in 500k posts).
+PREFIX_LENGTHS = (2, 3, 4, 5, 6, 7, 8)
+MAX_PREFIX = max(PREFIX_LENGTHS)
+
+# Rank with bm25 only while every query word is in at most this many
+# posts (about 4 ms for bm25 on SQLite); tier the results otherwise
+BM25_MAX_DOCS = 2000
+
+# Tiers for queries with a common word, best first. Matches are only
+# ranked 0.0 (every word in the title or tags) or 1.0 (the rest).
+TIERS = ('{{title tags}} : ({match})', '({match}) NOT {{title tags}} : ({match})')
+
+# make_snippet() wraps matches in these; highlight() turns them into <mark>
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_WORDS = 24
+
+# Words as the unicode61 tokenizer splits them (letters and digits)
+WORD_RE = re.compile(r'[^\W_]+')
+
+STOP_WORDS = frozenset("""
+    a about after all also an and any are as at be because been but by can could
+    do does for from had has have he her his how i if in into is it its just me
+    more most my no not of on one only or other our out so some than that the
+    their them then there these they this to up us was we were what when which
+    who will with would you your
+""".split())
+
+
+def parse_terms(query):
+    """
+    Split a search string into ``(term, is_phrase)`` pairs. Double-quoted
+    text is kept together as a phrase. Bare stop words are dropped unless
+    the query has nothing else.
+    """
+    query = query.replace('\x00', '').replace(MARK_START, '').replace(MARK_END, '')
+    terms = []
+    for phrase, word in TERM_RE.findall(query):
+        term = (phrase or word).strip().rstrip('*')
+        if term:
+            terms.append((term, bool(phrase)))
+    significant = [(term, phrase) for term, phrase in terms if phrase or normalize(term) not in STOP_WORDS]
+    return significant or terms
+
+
+def normalize(word):
+    """
+    Fold a word the way the unicode61 tokenizer does: lower case, no
+    diacritics.
+    """
+    decomposed = unicodedata.normalize('NFKD', word.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def is_prefix(terms, index):
+    """
+    Whether ``terms[index]`` is matched as a prefix: only the last word
+    of the query, when it is not quoted and longer than one letter. A
+    prefix query merges the doclists of every word it expands to, so on
+    earlier, already complete words it only costs time.
+    """
+    term, phrase = terms[index]
+    return not phrase and index == len(terms) - 1 and len(term) > 1
+
+
+def term_words(terms, index):
+    """
+    The words of ``terms[index]``, for a prefix with the last one cut to
+    MAX_PREFIX letters (longer prefixes have no index).
+    """
+    words = WORD_RE.findall(terms[index][0])
+    if words and is_prefix(terms, index):
+        words[-1] = words[-1][:MAX_PREFIX]
+    return words
+
+
+def is_ranked(terms):
+    """
+    Whether ranking ``terms`` means anything. Stop words are in nearly
+    every post, so bm25 scores for them alone are noise that costs a pass
+    over their doclists (a quoted phrase of them, the more so). Such
+    queries list the newest matches first.
+    """
+    return any(normalize(word) not in STOP_WORDS for term, _ in terms for word in WORD_RE.findall(term))
+
+
+def make_snippet(text, terms, words=SNIPPET_WORDS):
+    """
+    About ``words`` words of ``text`` around the first match of ``terms``,
+    with the matches wrapped in MARK_START/MARK_END. Words match like in
+    the full-text query (see is_prefix()). Returns None when nothing in
+    ``text`` matches (e.g. the post matched on its title or tags).
+    """
+    exact, prefix = set(), None
+    for index in range(len(terms)):
+        parts = [normalize(word) for word in term_words(terms, index)]
+        if parts and is_prefix(terms, index):
+            prefix = parts.pop()
+        exact.update(parts)
+    text = text.replace(MARK_START, '').replace(MARK_END, '')
+    tokens = list(WORD_RE.finditer(text))
+    hits = []
+    for index, token in enumerate(tokens):
+        word = normalize(token.group())
+        if word in exact or (prefix and word.startswith(prefix)):
+            hits.append(index)
+    if not hits:
+        return None
+
+    first = max(0, min(hits[0] - words // 4, len(tokens) - words))
+    last = min(len(tokens), first + words)
+    marked, position = [], tokens[first].start()
+    for index in hits:
+        if first <= index < last:
+            token = tokens[index]
+            marked += [text[position:token.start()], MARK_START, token.group(), MARK_END]
+            position = token.end()
+    marked.append(text[position:tokens[last - 1].end()])
+    snippet = ''.join(marked)
+    if first > 0:
+        snippet = '…' + snippet
+    if last < len(tokens):
+        snippet += '…'
+    return snippet
+
+
+def highlight(snippet):
+    """
+    HTML for a snippet: the post text escaped, with the matches in <mark>.
+    """
+    html = escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+class BaseSearchBackend:
+    """
+    Interface for post search backends.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    def is_available(self):
+        return True
+
+    def hits(self, terms, position, newer, limit):
+        """
+        Return up to ``limit`` ``(post id, rank)`` pairs matching every
+        term, best first (lowest rank, then newest id). With ``position``
+        (a ``(rank, id)`` pair) return the hits after it, or with
+        ``newer`` the hits before it, closest first.
+        """
+        raise NotImplementedError
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """
+    Case-insensitive substring search on title, content and tag names.
+    Works everywhere, scans everything. Every hit ranks 0, so results are
+    newest first.
+    """
+    search_fields = ['title', 'content', 'tags__name']
+
+    def hits(self, terms, position, newer, limit):
+        from .models import Post
+
+        conditions = [
+            reduce(or_, [Q(**{f'{field}__icontains': term}) for field in self.search_fields])
+            for term, _ in terms
+        ]
+        # Tag matches go through a subquery, so no DISTINCT is needed
+        posts = Post.objects.using(self.using).filter(
+            pk__in=Post.objects.filter(reduce(and_, conditions)).values('pk')
+        )
+        if position is not None:
+            posts = posts.filter(pk__gt=position[1]) if newer else posts.filter(pk__lt=position[1])
+        ids = posts.order_by('pk' if newer else '-pk').values_list('pk', flat=True)[:limit]
+        return [(pk, 0.0) for pk in ids]
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    Full-text search backed by the blog_post_fts FTS5 table.
+    """
+    _available = {}
+
+    def is_available(self):
+        connection = connections[self.using]
+        key = (self.using, str(connection.settings_dict['NAME']))
+        if key not in self._available:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+                )
+                self._available[key] = cursor.fetchone() is not None
+        return self._available[key]
+
+    @staticmethod
+    def build_match(terms):
+        parts = []
+        for index, (term, _) in enumerate(terms):
+            words = term_words(terms, index)
+            if words and is_prefix(terms, index):
+                parts.append('"%s"*' % ' '.join(words))
+            else:
+                parts.append('"%s"' % term.replace('"', '""'))
+        return ' '.join(parts)
+
+    def doc_counts(self, terms, cap):
+        """
+        Return the number of posts holding each word of ``terms``, counted
+        up to ``cap`` + 1 (a bounded walk of each word's doclist), in one
+        query.
+        """
+        words = []
+        for index in range(len(terms)):
+            quoted = [f'"{word}"' for word in term_words(terms, index)]
+            if quoted and is_prefix(terms, index):
+                quoted[-1] += '*'
+            words += quoted
+        if not words:
+            return []
+        count = f'(SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s))'
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT ' + ', '.join([count] * len(words)), [p for word in words for p in (word, cap + 1)])
+            return list(cursor.fetchone())
+
+    def is_selective(self, terms):
+        """
+        Whether every word of ``terms`` is rare enough to rank with bm25.
+        """
+        return all(count <= BM25_MAX_DOCS for count in self.doc_counts(terms, BM25_MAX_DOCS))
+
+    def newest(self, match, rank, pk, newer, limit):
+        """
+        Up to ``limit`` ``(rowid, rank)`` hits for ``match``, newest first
+        (oldest first with ``newer``), past ``pk`` when given. FTS5 streams
+        these from the index and stops at the LIMIT.
+        """
+        sql = f'SELECT rowid, %s FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [rank, match]
+        if pk is not None:
+            sql += ' AND rowid > %s' if newer else ' AND rowid < %s'
+            params.append(pk)
+        sql += ' ORDER BY rowid LIMIT %s' if newer else ' ORDER BY rowid DESC LIMIT %s'
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+    def ranked(self, match, position, newer, limit):
+        # "rank" is bm25 with the weights stored by install_search_index()
+        sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [match]
+        if position is not None:
+            rank, pk = position
+            if newer:
+                sql += ' AND (rank < %s OR (rank = %s AND rowid > %s))'
+            else:
+                sql += ' AND (rank > %s OR (rank = %s AND rowid < %s))'
+            params += [rank, rank, pk]
+        sql += ' ORDER BY rank DESC, rowid LIMIT %s' if newer else ' ORDER BY rank, rowid DESC LIMIT %s'
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+    def tiered(self, match, position, newer, limit):
+        """
+        Hits in TIERS order: each tier newest first, continuing into the
+        next tier (or, with ``newer``, the previous one) when a tier runs
+        out before ``limit``.
+        """
+        if position is None:
+            tier, pk = (len(TIERS) - 1 if newer else 0), None
+        else:
+            tier, pk = min(max(round(position[0]), 0), len(TIERS) - 1), position[1]
+        hits = []
+        for tier in range(tier, -1, -1) if newer else range(tier, len(TIERS)):
+            hits += self.newest(TIERS[tier].format(match=match), float(tier), pk, newer, limit - len(hits))
+            if len(hits) >= limit:
+                break
+            pk = None
+        return hits
+
+    def hits(self, terms, position, newer, limit):
+        match = self.build_match(terms)
+        if not is_ranked(terms):
+            # Every hit ranks 0, newest first
+            return self.newest(match, 0.0, position and position[1], newer, limit)
+        if self.is_selective(terms):
+            return self.ranked(match, position, newer, limit)
+        return self.tiered(match, position, newer, limit)
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """
+    Return the backend for this database, falling back to
+    ORMSearchBackend when the full-text index is not installed.
+    """
+    backend = VENDOR_BACKENDS.get(connections[using].vendor, ORMSearchBackend)(using)
+    if not backend.is_available():
+        return ORMSearchBackend(using)
+    return backend
+
+
+def encode_position(post):
+    """
+    Token for a hit's place in the results: ``<rank>_<id>``.
+    """
+    return f'{post.search_rank!r}_{post.pk}'
+
+
+def decode_position(token):
+    try:
+        rank, pk = token.split('_')
+        rank, pk = float(rank), int(pk)
+    except ValueError:
+        raise Http404('Invalid page position')
+    if not math.isfinite(rank):
+        raise Http404('Invalid page position')
+    return rank, pk
+
+
+def search_page(queryset, params, per_page):
+    """
+    Return the KeysetPage of posts from ``queryset`` matching ``?q=``,
+    best match first. Each post gets ``search_rank`` and
+    ``search_snippet`` (see make_snippet()).
+    """
+    terms = parse_terms(params.get('q', ''))
+    if not terms:
+        return KeysetPage([], False, False, params)
+    backend = get_search_backend(queryset.db)
+
+    after, before = params.get('after'), params.get('before')
+    newer = bool(after)
+    token = after or before
+    position = decode_position(token) if token else None
+    hits = backend.hits(terms, position, newer, per_page + 1)
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+    if newer:
+        hits.reverse()
+
+    posts = queryset.in_bulk([pk for pk, _ in hits])
+    results = []
+    for pk, rank in hits:
+        post = posts.get(pk)
+        if post is not None:
+            post.search_rank = rank
+            post.search_snippet = make_snippet(post.content, terms)
+            results.append(post)
+    if newer:
+        return KeysetPage(results, True, has_more, params, encode=encode_position)
+    return KeysetPage(results, has_more, bool(before), params, encode=encode_position)
+
+
+# Schema used by the migrations. Kept here so later migrations that make
+# Django rebuild blog_post or blog_tag on SQLite can drop the triggers
+# first and reinstall them afterwards (see drop_search_triggers).
+
+POST_TAGS_SQL = """COALESCE((
+    SELECT group_concat(blog_tag.name, ' ') FROM blog_tag
+    INNER JOIN blog_post_tags ON blog_post_tags.tag_id = blog_tag.id
+    WHERE blog_post_tags.post_id = {post_id}
+), '')"""
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, tags, tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '{" ".join(map(str, PREFIX_LENGTHS))}'
+    )""",
+    f"""INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({", ".join(map(str, WEIGHTS))})')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_post_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content, tags) VALUES (new.id, new.title, new.content, '');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_post_update AFTER UPDATE OF title, content ON blog_post
+    WHEN old.title IS NOT new.title OR old.content IS NOT new.content BEGIN
+        UPDATE {FTS_TABLE} SET title = new.title, content = new.content WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_post_delete AFTER DELETE ON blog_post BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_post_tag_insert AFTER INSERT ON blog_post_tags BEGIN
+        UPDATE {FTS_TABLE} SET tags = {POST_TAGS_SQL.format(post_id='new.post_id')} WHERE rowid = new.post_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_post_tag_delete AFTER DELETE ON blog_post_tags BEGIN
+        UPDATE {FTS_TABLE} SET tags = {POST_TAGS_SQL.format(post_id='old.post_id')} WHERE rowid = old.post_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_tag_update AFTER UPDATE OF name ON blog_tag
+    WHEN old.name IS NOT new.name BEGIN
+        UPDATE {FTS_TABLE} SET tags = {POST_TAGS_SQL.format(post_id=f'{FTS_TABLE}.rowid')}
+        WHERE rowid IN (SELECT post_id FROM blog_post_tags WHERE tag_id = new.id);
+    END""",
+]
+
+SQLITE_FTS_REBUILD_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""INSERT INTO {FTS_TABLE}(rowid, title, content, tags)
+        SELECT blog_post.id, blog_post.title, blog_post.content, {POST_TAGS_SQL.format(post_id='blog_post.id')}
+        FROM blog_post""",
+]
+
+SQLITE_FTS_TRIGGERS = ['post_insert', 'post_update', 'post_delete', 'post_tag_insert', 'post_tag_delete', 'tag_update']
+
+SQLITE_FTS_DROP_SQL = [
+    *(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}" for name in SQLITE_FTS_TRIGGERS),
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def sqlite_supports_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_search_index(schema_editor):
+    """
+    Create (or re-create) the search index and backfill it from existing
+    posts. Safe to run more than once.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_supports_fts5(connection):
+        for statement in SQLITE_FTS_SQL + SQLITE_FTS_REBUILD_SQL:
+            schema_editor.execute(statement, params=None)
+
+
+def drop_search_triggers(schema_editor):
+    """
+    Drop the sync triggers but keep the index. Migrations that make Django
+    rebuild blog_post, blog_post_tags or blog_tag must call this first and
+    install_search_index() afterwards.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_FTS_DROP_SQL:
+            if statement.startswith('DROP TRIGGER'):
+                schema_editor.execute(statement, params=None)
+
+
+def uninstall_search_index(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_FTS_DROP_SQL:
+            schema_editor.execute(statement, params=None)
@@ -0,0 +1,71 @@
+"""
+Model signal receivers that keep the fragment cache (blog.caching) in
+sync with post, tag, comment and username changes.
+
+Connected in BlogConfig.ready(). Signals fire for save(), delete(),
+queryset.delete() and the tag set()/add()/remove()/clear() calls made by
+PostForm and the admin, but not for bulk_create() or queryset.update().
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .caching import invalidate_comments, invalidate_posts
+from .models import Comment, Post, Tag
+
+
+@receiver(post_save, sender=Post, dispatch_uid='blog_post_saved')
+def post_saved(sender, instance, created, **kwargs):
+    # A new post may reuse the id of a deleted one, comments included
+    invalidate_posts([instance.pk], comments=created)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='blog_post_deleted')
+def post_deleted(sender, instance, **kwargs):
+    invalidate_posts([instance.pk], comments=True)
+
+
+@receiver(m2m_changed, sender=Post.tags.through, dispatch_uid='blog_post_tags_changed')
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_posts([instance.pk])
+    elif action == 'pre_clear':
+        # tag.posts.clear() does not say which posts it removes
+        instance._cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_posts(instance.__dict__.pop('_cleared_post_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_posts(pk_set)
+
+
+@receiver(post_save, sender=Tag, dispatch_uid='blog_tag_saved')
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_posts(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag, dispatch_uid='blog_tag_deleting')
+def tag_deleting(sender, instance, **kwargs):
+    # The tag's links to posts are gone by post_delete
+    instance._tagged_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag, dispatch_uid='blog_tag_deleted')
+def tag_deleted(sender, instance, **kwargs):
+    invalidate_posts(instance.__dict__.pop('_tagged_post_ids', []))
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='blog_comment_saved')
+@receiver(post_delete, sender=Comment, dispatch_uid='blog_comment_deleted')
+def comment_changed(sender, instance, **kwargs):
+    invalidate_comments([instance.post_id])
+
+
+@receiver(post_save, sender=User, dispatch_uid='blog_user_saved')
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Posts and comments show the author's username; logins only save last_login
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    invalidate_posts(Post.objects.filter(author=instance).values_list('pk', flat=True))
+    invalidate_comments(Comment.objects.filter(author=instance).values_list('post_id', flat=True).distinct())
@@ -0,0 +1,12 @@
+from django import template
+
+from blog.search import highlight as highlight_snippet
+
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Render a search snippet with the matched words in <mark>."""
+    return highlight_snippet(snippet)
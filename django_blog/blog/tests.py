@@ -1,3 +1,468 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import PostForm
+from .models import Post, Tag
+from .search import MARK_END, MARK_START, SQLiteFTSSearchBackend, make_snippet, parse_terms
+from .views import home
+
+
+class PostListQueryTests(TestCase):
+
+    def setUp(self):
+        """Set up two authors and a few tags"""
+        # Fragments are evicted on commit, which never happens in a TestCase
+        cache.clear()
+        self.authors = [
+            User.objects.create_user(username=f'author{i}', password='testpass123') for i in range(2)
+        ]
+        self.tags = [Tag.objects.create(name=f'tag{i}') for i in range(4)]
+
+    def add_posts(self, count, tags_per_post):
+        """Add ``count`` posts, each tagged with 'tag0' and more tags"""
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            post = Post.objects.create(
+                title=f'Searchable post {i}', content='Lorem ipsum.', author=self.authors[i % 2]
+            )
+            post.tags.set(self.tags[:tags_per_post])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), response
+
+    def assert_constant_queries(self, url, expected=2):
+        self.add_posts(2, tags_per_post=1)
+        few, response = self.count_queries(url)
+        self.assertEqual(len(response.context['posts']), 2)
+
+        self.add_posts(20, tags_per_post=4)
+        many, response = self.count_queries(url)
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertContains(response, 'tag3')
+        self.assertEqual(few, many)
+        # One query for the posts and their authors, one for all their tags
+        self.assertEqual(many, expected)
+
+    def test_post_list_queries_are_constant(self):
+        """Test the post list loads authors and tags in bulk"""
+        self.assert_constant_queries(reverse('posts'))
+
+    def test_tag_list_queries_are_constant(self):
+        """Test the tag list loads authors and tags in bulk"""
+        self.assert_constant_queries(reverse('tag_posts', args=['tag0']))
+
+    def test_search_queries_are_constant(self):
+        """Test search results load authors and tags in bulk"""
+        # Plus one to count how common the words are and one for the hits
+        self.assert_constant_queries(reverse('search') + '?q=searchable', expected=4)
+
+
+class PostFeedPaginationTests(TestCase):
+
+    def setUp(self):
+        """Set up 25 posts, five of them published at the same instant"""
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        tag = Tag.objects.create(name='news')
+        now = timezone.now()
+        for i in range(25):
+            post = Post.objects.create(title=f'Post {i}', content='Lorem ipsum.', author=self.author)
+            post.tags.add(tag)
+            # Posts 10-14 share a timestamp, so only the id orders them
+            published = now - timedelta(minutes=10) if 10 <= i < 15 else now - timedelta(minutes=25 - i)
+            Post.objects.filter(pk=post.pk).update(published_date=published)
+        self.feed = list(Post.objects.order_by('-published_date', '-id').values_list('pk', flat=True))
+
+    def walk(self, url, params=None):
+        """Follow the older links from the first page, then the newer links back"""
+        response = self.client.get(url, params)
+        pages = [[post.pk for post in response.context['posts']]]
+        self.assertFalse(response.context['page_obj'].has_newer)
+        while response.context['page_obj'].has_older:
+            response = self.client.get(f'{url}?{response.context["page_obj"].older_query}')
+            pages.append([post.pk for post in response.context['posts']])
+        back = [pages[-1]]
+        while response.context['page_obj'].has_newer:
+            response = self.client.get(f'{url}?{response.context["page_obj"].newer_query}')
+            back.append([post.pk for post in response.context['posts']])
+        self.assertEqual(back[::-1], pages)
+        return pages
+
+    def test_older_and_newer_links_visit_every_post_once(self):
+        """Test the post feed pages through every post in order and back"""
+        pages = self.walk(reverse('posts'))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.feed)
+
+    def test_tag_and_search_feeds_are_paginated(self):
+        """Test the tag and search feeds page the same way and keep ?q="""
+        self.assertEqual(sum(self.walk(reverse('tag_posts', args=['news'])), []), self.feed)
+        response = self.client.get(reverse('search'), {'q': 'post'})
+        self.assertIn('q=post', response.context['page_obj'].older_query)
+        self.assertContains(response, 'More results')
+        # Every post ranks the same, so the newest come first
+        self.assertEqual(sum(self.walk(reverse('search'), {'q': 'post'}), []), self.feed)
+
+    def test_page_queries_do_not_depend_on_depth(self):
+        """Test a deep page costs the same as the first, with no COUNT"""
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(reverse('posts'))
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(f'{reverse("posts")}?{response.context["page_obj"].older_query}')
+        self.assertEqual(len(first), len(deep))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in deep))
+
+    def test_invalid_position_is_404(self):
+        """Test a malformed before/after token returns 404"""
+        self.assertEqual(self.client.get(reverse('posts'), {'before': 'abc'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('posts'), {'after': '1-2-3'}).status_code, 404)
+
+    def test_home_is_bounded(self):
+        """Test the home view shows one page of the newest posts"""
+        request = RequestFactory().get('/')
+        request.user = self.author
+        response = home(request)
+        self.assertContains(response, 'Post 24')
+        self.assertNotContains(response, 'Post 14<')
+        self.assertContains(response, 'Older posts')
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        """Set up a few posts about Django and Python"""
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.django_tag = Tag.objects.create(name='django')
+        self.orm = self.add_post('Django ORM tips', 'Use select_related for foreign keys.')
+        self.mention = self.add_post('Weekly links', 'A <b>quick</b> note: Django 4.2 is out.')
+        self.fox = self.add_post('Foxes', 'The quick brown fox jumps over the lazy dog.')
+        self.orm.tags.add(self.django_tag)
+
+    def add_post(self, title, content):
+        return Post.objects.create(title=title, content=content, author=self.author)
+
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [post.pk for post in response.context['posts']]
+
+    def test_ranks_title_matches_first(self):
+        """Test a title match outranks a mention in the content"""
+        self.assertEqual(self.search('django'), [self.orm.pk, self.mention.pk])
+
+    def test_prefix_and_phrase_queries(self):
+        """Test words match as prefixes and quoted text as a phrase"""
+        self.assertEqual(self.search('djan'), [self.orm.pk, self.mention.pk])
+        self.assertEqual(self.search('"quick brown"'), [self.fox.pk])
+        self.assertEqual(self.search('"django 4.2"'), [self.mention.pk])
+        self.assertEqual(self.search('quick django'), [self.mention.pk])
+        self.assertEqual(self.search('"'), [])
+        # Prefixes longer than the prefix indexes match on their first letters
+        pythonistas = self.add_post('Pythonistas', 'Notes from the meetup.')
+        self.assertEqual(self.search('pythonistic'), [pythonistas.pk])
+
+    def test_index_follows_posts_and_tags(self):
+        """Test the index is updated on save, delete, tag changes and tag renames"""
+        self.assertEqual(self.search('lazy'), [self.fox.pk])
+        self.fox.content = 'The quick brown fox is asleep.'
+        self.fox.save()
+        self.assertEqual(self.search('lazy'), [])
+        self.assertEqual(self.search('asleep'), [self.fox.pk])
+
+        animals = Tag.objects.create(name='animals')
+        self.fox.tags.add(animals)
+        self.assertEqual(self.search('animals'), [self.fox.pk])
+        animals.name = 'wildlife'
+        animals.save()
+        self.assertEqual(self.search('animals'), [])
+        self.assertEqual(self.search('wildlife'), [self.fox.pk])
+        self.fox.tags.clear()
+        self.assertEqual(self.search('wildlife'), [])
+
+        self.orm.delete()
+        self.assertEqual(self.search('django'), [self.mention.pk])
+
+    def test_ranks_every_hit(self):
+        """Test older hits are ranked too and paging walks every hit once"""
+        newer = [self.add_post(f'Links {i}', 'More Django news.') for i in range(3)]
+        self.assertEqual(self.search('django')[0], self.orm.pk)
+
+        backend = SQLiteFTSSearchBackend()
+        terms = parse_terms('django')
+        seen, position = [], None
+        while True:
+            hits = backend.hits(terms, position, False, 2)
+            if not hits:
+                break
+            seen += [pk for pk, _ in hits]
+            pk, rank = hits[-1]
+            position = (rank, pk)
+        self.assertEqual(sorted(seen), sorted([self.orm.pk, self.mention.pk] + [post.pk for post in newer]))
+        self.assertEqual(seen[0], self.orm.pk)
+
+    def test_common_words_are_tiered(self):
+        """Test words in many posts list title and tag matches first, then the rest, newest first"""
+        newer = [self.add_post(f'Links {i}', 'More Django news.') for i in range(3)]
+        titled = self.add_post('Django admin', 'Customising the admin.')
+        expected = [titled.pk, self.orm.pk] + [post.pk for post in reversed(newer)] + [self.mention.pk]
+        backend = SQLiteFTSSearchBackend()
+        terms = parse_terms('djan')
+        self.assertTrue(backend.is_selective(terms))
+        with mock.patch('blog.search.BM25_MAX_DOCS', 3):
+            self.assertFalse(backend.is_selective(terms))
+            self.assertEqual(self.search('djan'), expected)
+
+            # Paging walks both tiers, and back again with newer=True
+            pages, position = [], None
+            while True:
+                hits = backend.hits(terms, position, False, 2)
+                if not hits:
+                    break
+                pages.append(hits)
+                position = (hits[-1][1], hits[-1][0])
+            self.assertEqual([pk for page in pages for pk, _ in page], expected)
+            self.assertEqual([rank for page in pages for _, rank in page], [0.0, 0.0, 1.0, 1.0, 1.0, 1.0])
+            pk, rank = pages[-1][0]
+            back = backend.hits(terms, (rank, pk), True, 3)
+            self.assertEqual([pk for pk, _ in back], list(reversed(expected[1:4])))
+
+    def test_stop_words_are_dropped_outside_phrases(self):
+        """Test bare stop words do not have to match, but do inside quotes"""
+        self.assertEqual(self.search('the fox'), [self.fox.pk])
+        self.assertEqual(self.search('"over the lazy"'), [self.fox.pk])
+        self.assertEqual(self.search('"the lazy fox"'), [])
+        self.assertEqual(self.search('the'), [self.fox.pk])
+        stop = self.add_post('Stop', 'It is what it is.')
+        # Only stop words: newest first, not ranked
+        response = self.client.get(reverse('search'), {'q': '"it is"'})
+        self.assertEqual([(post.pk, post.search_rank) for post in response.context['posts']], [(stop.pk, 0.0)])
+
+    def test_snippets_are_highlighted_and_escaped(self):
+        """Test snippets mark the matches and escape the post text"""
+        response = self.client.get(reverse('search'), {'q': 'quick django'})
+        self.assertContains(response, '<mark>quick</mark>')
+        self.assertContains(response, '<mark>Django</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+        self.assertNotContains(response, '<b>quick</b>')
+
+    def test_snippet_window(self):
+        """Test snippets cut a window around the first match and mark every match in it"""
+        text = ' '.join(f'w{i}' for i in range(100)) + ' Café cafés'
+        snippet = make_snippet(text, [('cafe', False)], words=6)
+        self.assertTrue(snippet.startswith('…') and not snippet.endswith('…'))
+        self.assertIn(f'{MARK_START}Café{MARK_END} {MARK_START}cafés{MARK_END}', snippet)
+        snippet = make_snippet(text, [('w50', False), ('w52', False)], words=6)
+        self.assertEqual(snippet, f'…w49 {MARK_START}w50{MARK_END} w51 {MARK_START}w52{MARK_END} w53 w54…')
+        self.assertIsNone(make_snippet(text, [('absent', False)]))
+
+    def test_orm_fallback_without_index(self):
+        """Test search still works with substring matching when FTS5 is missing"""
+        with mock.patch.object(SQLiteFTSSearchBackend, 'is_available', return_value=False):
+            self.assertEqual(self.search('django'), [self.mention.pk, self.orm.pk])
+            self.assertEqual(self.search('jumps'), [self.fox.pk])
+
+    def test_invalid_position_is_404(self):
+        """Test a malformed result position returns 404"""
+        response = self.client.get(reverse('search'), {'q': 'django', 'before': 'nan_1'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_benchmark_checks_the_target(self):
+        """Test benchmark_search times every query and fails over the target"""
+        out = StringIO()
+        call_command('benchmark_search', posts=300, runs=2, stdout=out)
+        for label in ['common word', 'common prefix', 'rare word', 'stop words']:
+            self.assertIn(label, out.getvalue())
+        self.assertIn('within 20ms', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'p95 over 0ms for: common word'):
+            call_command('benchmark_search', posts=300, runs=1, target_ms=0, stdout=StringIO())
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        """Set up a tagged post with a comment"""
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.tag = Tag.objects.create(name='django')
+        self.post = Post.objects.create(title='Cached post', content='First version.', author=self.author)
+        self.post.tags.add(self.tag)
+        self.post.comments.create(author=self.reader, content='Nice post.')
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cached_pages_skip_tags_and_comments(self):
+        """Test unchanged posts are served from the cache without loading tags or comments"""
+        self.get(reverse('posts'), 2)
+        self.get(reverse('posts'), 1)
+        # The tag feed shares the post fragments
+        response = self.get(reverse('tag_posts', args=['django']), 1)
+        self.assertContains(response, '<a href="/tags/django/">django</a>', html=True)
+        detail = reverse('post_detail', args=[self.post.pk])
+        self.get(detail, 3)
+        response = self.get(detail, 1)
+        self.assertContains(response, 'First version.')
+        self.assertContains(response, 'Nice post.')
+
+    def test_post_and_tag_changes_evict_the_post(self):
+        """Test editing a post, its tags or a tag name re-renders the post"""
+        self.client.get(reverse('posts'))
+        self.client.login(username='author', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('post_update', args=[self.post.pk]), {
+                'title': 'Cached post', 'content': 'Second version.', 'tags': 'django, python',
+            })
+        response = self.client.get(reverse('posts'))
+        self.assertContains(response, 'Second version.')
+        self.assertContains(response, 'python')
+
+        self.tag.name = 'web'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.save()
+        self.assertContains(self.client.get(reverse('posts')), '/tags/web/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.get(name='python').delete()
+        self.assertNotContains(self.client.get(reverse('posts')), 'python')
+        self.assertNotContains(self.client.get(reverse('post_detail', args=[self.post.pk])), 'python')
+
+    def test_comment_changes_evict_the_comment_list(self):
+        """Test adding, editing and deleting a comment re-renders the comment list"""
+        detail = reverse('post_detail', args=[self.post.pk])
+        self.client.get(detail)
+        self.client.login(username='reader', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('comment_create', args=[self.post.pk]), {'content': 'Second comment.'})
+        comment = self.post.comments.get(content='Second comment.')
+        response = self.client.get(detail)
+        self.assertContains(response, 'Second comment.')
+        self.assertContains(response, reverse('comment_update', args=[comment.pk]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('comment_update', args=[comment.pk]), {'content': 'Edited comment.'})
+        self.assertContains(self.client.get(detail), 'Edited comment.')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('comment_delete', args=[comment.pk]))
+        self.assertNotContains(self.client.get(detail), 'Edited comment.')
+
+    def test_edit_links_are_per_reader(self):
+        """Test one reader's cached comment list does not leak into another's"""
+        detail = reverse('post_detail', args=[self.post.pk])
+        self.client.login(username='reader', password='testpass123')
+        self.assertContains(self.client.get(detail), '>Edit</a>')
+        self.client.logout()
+        self.assertNotContains(self.client.get(detail), '>Edit</a>')
+
+    def test_username_change_evicts_posts_and_comments(self):
+        """Test renaming a user re-renders their posts and comments"""
+        detail = reverse('post_detail', args=[self.post.pk])
+        self.client.get(detail)
+        self.client.get(reverse('posts'))
+        self.author.username = 'writer'
+        self.reader.username = 'commenter'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+            self.reader.save()
+        self.assertContains(self.client.get(reverse('posts')), 'by writer')
+        response = self.client.get(detail)
+        self.assertContains(response, 'by writer')
+        self.assertContains(response, 'by commenter')
+
+    def test_eviction_waits_for_commit(self):
+        """Test a page read while a write is uncommitted is not cached as the new version"""
+        self.client.get(reverse('posts'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.post.content = 'Second version.'
+                self.post.save()
+                # The old version is still current until the commit
+                self.assertContains(self.client.get(reverse('posts')), 'First version.')
+            self.assertContains(self.client.get(reverse('posts')), 'First version.')
+        self.assertContains(self.client.get(reverse('posts')), 'Second version.')
+
+
+class PostFormTagTests(TestCase):
+
+    def setUp(self):
+        """Set up an author and a post tagged with two existing tags"""
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.post = Post.objects.create(title='Tagged', content='Lorem ipsum.', author=self.author)
+        self.post.tags.add(Tag.objects.create(name='tag0'), Tag.objects.create(name='tag1'))
+
+    def save(self, tags, instance=None):
+        form = PostForm({'title': 'Tagged', 'content': 'Lorem ipsum.', 'tags': tags}, instance=instance)
+        self.assertTrue(form.is_valid(), form.errors)
+        if instance is None:
+            form.instance.author = self.author
+        with CaptureQueriesContext(connection) as context:
+            post = form.save()
+        return post, len(context)
+
+    def names(self, post):
+        return sorted(post.tags.values_list('name', flat=True))
+
+    def test_tag_queries_are_constant(self):
+        """Test saving 3 or 30 tags, new or existing, costs the same queries"""
+        def tags(count, prefix='tag'):
+            return ', '.join(f'{prefix}{i}' for i in range(count))
+
+        created = [self.save(tags(3))[1], self.save(tags(30))[1]]
+        self.assertEqual(created[0], created[1])
+        # Every tag exists now, so nothing is inserted
+        self.assertLess(self.save(tags(30))[1], created[1])
+
+        updated = []
+        for count in (3, 30):
+            post = Post.objects.create(title='Tagged', content='Lorem ipsum.', author=self.author)
+            post.tags.add(*Tag.objects.filter(name__in=['tag0', 'tag1']))
+            post, queries = self.save(tags(count, prefix='new'), instance=post)
+            self.assertEqual(len(self.names(post)), count)
+            updated.append(queries)
+        self.assertEqual(updated[0], updated[1])
+
+    def test_tags_are_diffed(self):
+        """Test only changed tag links are written, and duplicates are dropped"""
+        form = PostForm(instance=self.post)
+        self.assertEqual(form.fields['tags'].initial, 'tag0, tag1')
+        post, _ = self.save('tag1, tag2, tag2, ', instance=self.post)
+        self.assertEqual(self.names(post), ['tag1', 'tag2'])
+        _, queries = self.save('tag2,tag1', instance=Post.objects.get(pk=self.post.pk))
+        # UPDATE of the post and the SELECT of the tags; no link is touched
+        self.assertEqual(queries, 2)
+        post, _ = self.save('', instance=Post.objects.get(pk=self.post.pk))
+        self.assertEqual(self.names(post), [])
+
+    def test_concurrently_created_tag_is_reused(self):
+        """Test a tag created between the lookup and the insert does not fail the save"""
+        bulk_create = Tag.objects.bulk_create
+
+        def racing_bulk_create(tags, **kwargs):
+            Tag.objects.create(name='racy')
+            return bulk_create(tags, **kwargs)
+
+        with mock.patch.object(Tag.objects, 'bulk_create', side_effect=racing_bulk_create):
+            post, _ = self.save('racy, fresh')
+        self.assertEqual(self.names(post), ['fresh', 'racy'])
+        self.assertEqual(Tag.objects.filter(name='racy').count(), 1)
+
+    def test_long_tag_is_rejected(self):
+        """Test tag names longer than the column are a form error"""
+        form = PostForm({'title': 'Tagged', 'content': 'Lorem ipsum.', 'tags': 'x' * 51})
+        self.assertFalse(form.is_valid())
+        self.assertIn('tags', form.errors)
@@ -2,11 +2,13 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from .models import Post, Comment, Tag
 from .forms import RegistrationForm, ProfileForm, PostForm, CommentForm
+from .caching import attach_summaries, post_body, post_comments
+from .pagination import KeysetPaginationMixin, keyset_page
+from .search import search_page
 
 
 class LoginView(auth_views.LoginView):
@@ -17,19 +19,42 @@ class LogoutView(auth_views.LogoutView):
     template_name = 'registration/logout.html'
 
 
+def post_summaries():
+    """
+    Posts with the author and tags that the search results show, loaded
+    for the whole page at once (one join plus one prefetch query).
+    """
+    return Post.objects.select_related('author').prefetch_related('tags')
+
+
+class CachedSummariesMixin(KeysetPaginationMixin):
+    """
+    Post feed rendering each post from the fragment cache (blog.caching),
+    so the tags of cached posts are never loaded.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        attach_summaries(context['posts'])
+        return context
+
+
 def home(request):
-    posts = Post.objects.order_by('-published_date')
-    return render(request, 'blog/home.html', {'posts': posts})
+    page = keyset_page(Post.objects.select_related('author'), request.GET, KeysetPaginationMixin.paginate_by)
+    return render(request, 'blog/home.html', {'posts': page.object_list, 'page_obj': page})
 
 
-class PostListView(ListView):
+class PostListView(CachedSummariesMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     ordering = ['-published_date']
 
+    def get_queryset(self):
+        return Post.objects.select_related('author').order_by(*self.ordering)
+
 
-class PostByTagListView(ListView):
+class PostByTagListView(CachedSummariesMixin, ListView):
     model = Post
     template_name = 'blog/tag_post_list.html'
     context_object_name = 'posts'
@@ -37,7 +62,7 @@ class PostByTagListView(ListView):
 
     def get_queryset(self):
         tag_slug = self.kwargs.get('tag_slug')
-        return Post.objects.filter(tags__name=tag_slug).order_by('-published_date').distinct()
+        return Post.objects.select_related('author').filter(tags__name=tag_slug).order_by('-published_date').distinct()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -46,19 +71,22 @@ class PostByTagListView(ListView):
 
 
 class SearchResultsView(ListView):
+    """
+    Full-text search over post titles, content and tags (see blog.search):
+    words are prefix-matched, "quoted text" is a phrase, and results are
+    ranked by relevance with a highlighted snippet.
+    """
     model = Post
     template_name = 'blog/search_results.html'
     context_object_name = 'posts'
+    paginate_by = KeysetPaginationMixin.paginate_by
 
     def get_queryset(self):
-        query = self.request.GET.get('q', '')
-        if not query:
-            return Post.objects.none()
-        return Post.objects.filter(
-            Q(title__icontains=query)
-            | Q(content__icontains=query)
-            | Q(tags__name__icontains=query)
-        ).distinct().order_by('-published_date')
+        return post_summaries()
+
+    def paginate_queryset(self, queryset, page_size):
+        page = search_page(queryset, self.request.GET, page_size)
+        return None, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -71,9 +99,13 @@ class PostDetailView(DetailView):
     template_name = 'blog/post_detail.html'
     context_object_name = 'post'
 
+    def get_queryset(self):
+        return Post.objects.select_related('author')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.order_by('created_at')
+        context['post_html'] = post_body(self.object)
+        context['comments_html'] = post_comments(self.object, self.request.user)
         context['comment_form'] = CommentForm()
         return context
 
@@ -0,0 +1,7 @@
+"""
+Modules shared by the Django projects in this repository.
+
+Each project's settings put the repository root on sys.path and refer to
+these modules by dotted path (middleware, database ENGINE), so there is
+one copy to fix instead of one per project.
+"""
@@ -0,0 +1,199 @@
+"""
+Per-request SQL query budgets.
+
+QueryBudgetMiddleware counts the queries and database time of every
+request, across all database aliases, and:
+
+- adds them to the response as a ``Server-Timing`` header
+  (``db;dur=12.3;desc="7 queries"``), readable in browser dev tools
+- compares them with the budget configured for the matched URL name
+- groups the executed SQL by *shape* (literals, placeholders and IN lists
+  collapsed), so a statement run once per row is reported by name as an
+  N+1 pattern instead of hiding in the total
+
+Violations are logged on the ``querybudget`` logger, or raised as
+QueryBudgetExceeded when RAISE is set (the test settings do that, so an
+N+1 fails the test that triggers it).
+
+Configure with the QUERY_BUDGET setting; every key is optional::
+
+    QUERY_BUDGET = {
+        'DEFAULT': None,           # budget for URL names not listed below
+        'BUDGETS': {               # per URL name: max queries, or a dict
+            'book-list': 6,
+            'author-detail': {'queries': 5, 'time_ms': 50},
+        },
+        'MAX_DUPLICATES': 3,       # same SQL shape more often = N+1
+        'RAISE': False,
+        'SERVER_TIMING': True,
+    }
+
+Streaming responses are measured up to the point the view returns; the
+queries that produce the body run after the middleware has finished.
+
+The middleware is sync and async capable. Under ASGI, async views run
+their queries in the request's thread-sensitive worker thread, so the
+recorder is installed on that thread's connections.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('querybudget')
+
+DEFAULTS = {
+    'DEFAULT': None,
+    'BUDGETS': {},
+    'MAX_DUPLICATES': 3,
+    'RAISE': False,
+    'SERVER_TIMING': True,
+}
+
+# Statements that repeat legitimately (one per transaction or savepoint)
+IGNORED_SHAPES = re.compile(r'^(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT|ROLLBACK)\b', re.I)
+
+LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),            # string literals
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),         # numbers
+    (re.compile(r'%s|\?'), '?'),                     # placeholders
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),  # IN lists of any length
+    (re.compile(r'\s+'), ' '),
+]
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def sql_shape(sql):
+    """
+    Normalize ``sql`` so statements that differ only in their values
+    compare equal.
+    """
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_BUDGET', {})}
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper() hook that records each statement's shape
+    and duration.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def duplicates(self, limit):
+        """
+        Shapes executed more than ``limit`` times, most frequent first.
+        """
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count > limit and not IGNORED_SHAPES.match(shape)
+        ]
+
+
+class QueryBudgetMiddleware:
+    """
+    Count queries and DB time per request and enforce QUERY_BUDGET.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        with self.record(recorder):
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        stack = await sync_to_async(self.record)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.process_response(request, response, recorder)
+
+    @staticmethod
+    def record(recorder):
+        """
+        Install ``recorder`` on every connection of the current thread.
+        Returns the ExitStack that removes it again.
+        """
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def process_response(self, request, response, recorder):
+        config = get_config()
+        if config['SERVER_TIMING']:
+            timing = f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        problems = self.check(request, recorder, config)
+        if problems:
+            message = f'Query budget exceeded for {self.get_name(request) or request.path}: ' + '; '.join(problems)
+            if config['RAISE']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    @staticmethod
+    def get_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.view_name if match.url_name else None
+
+    def get_budget(self, request, config):
+        name = self.get_name(request)
+        budget = config['BUDGETS'].get(name, config['DEFAULT']) if name else config['DEFAULT']
+        if isinstance(budget, int):
+            budget = {'queries': budget}
+        return budget or {}
+
+    def check(self, request, recorder, config):
+        problems = []
+        budget = self.get_budget(request, config)
+        if budget.get('queries') is not None and recorder.count > budget['queries']:
+            problems.append(f'{recorder.count} queries (budget {budget["queries"]})')
+        duration_ms = recorder.duration * 1000
+        if budget.get('time_ms') is not None and duration_ms > budget['time_ms']:
+            problems.append(f'{duration_ms:.1f} ms in the database (budget {budget["time_ms"]} ms)')
+        if config['MAX_DUPLICATES'] is not None:
+            for shape, count in recorder.duplicates(config['MAX_DUPLICATES']):
+                problems.append(f'N+1: {count}x {shape[:300]}')
+        return problems
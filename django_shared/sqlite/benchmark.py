@@ -0,0 +1,256 @@
+"""
+Concurrent read/write benchmark for the SQLite connection pragmas.
+
+compare_pragmas() migrates a scratch database in a temporary directory,
+fills it once, and then runs the same reader and writer threads against
+one copy opened with Django's stock settings (rollback journal) and
+another opened with TUNED_PRAGMAS. For each copy it reports throughput,
+latency percentiles, and how often a thread got "database is locked".
+
+Each project's benchmark_sqlite management command subclasses
+BenchmarkSQLiteCommand and only defines its workload: setup(), reader()
+and writer().
+"""
+import json
+import platform
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from .base import TUNED_PRAGMAS
+
+
+# What django.db.backends.sqlite3 runs with. The journal mode is stored in
+# the database file, so it has to be set explicitly to undo WAL.
+BASELINE_PRAGMAS = {'journal_mode': 'delete'}
+
+MODES = {'baseline': BASELINE_PRAGMAS, 'tuned': TUNED_PRAGMAS}
+
+
+class ScratchRouter:
+    """
+    Route every model to the scratch database.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def db_for_read(self, model, **hints):
+        return self.alias
+
+    def db_for_write(self, model, **hints):
+        return self.alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == self.alias
+
+
+@contextmanager
+def scratch_database(path, pragmas, alias='sqlite_benchmark'):
+    """
+    Register the SQLite file ``path`` as database ``alias``, opened with
+    ``pragmas``, and route all ORM queries to it inside the block. Query
+    budgets are off, since the benchmark measures the database and not
+    the views.
+    """
+    connections.settings[alias] = {
+        **connections['default'].settings_dict,
+        'NAME': str(path),
+        'OPTIONS': {'pragmas': pragmas},
+    }
+    try:
+        with override_settings(
+            DATABASE_ROUTERS=[ScratchRouter(alias)],
+            QUERY_BUDGET={'BUDGETS': {}, 'DEFAULT': None, 'MAX_DUPLICATES': None},
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+def percentile(samples, percent):
+    """
+    Nearest-rank percentile of ``samples``.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, duration):
+    return {
+        'ops': len(latencies),
+        'per_sec': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_contention(read_factory, write_factory, readers, writers, duration):
+    """
+    Run ``readers`` + ``writers`` threads for ``duration`` seconds.
+
+    Each thread calls its factory once (so clients and other per-thread
+    state are built in the thread) and then calls the returned function
+    in a loop. Operations that fail with "database is locked" are counted
+    instead of timed.
+    """
+    latencies = {'read': [], 'write': []}
+    lock_errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def worker(kind, factory):
+        try:
+            operation = factory()
+            start.wait()
+            deadline = time.perf_counter() + duration
+            samples, errors = [], 0
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                try:
+                    operation()
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    errors += 1
+                else:
+                    samples.append(time.perf_counter() - began)
+            with lock:
+                latencies[kind].extend(samples)
+                lock_errors[kind] += errors
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=('read', read_factory)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', write_factory)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'readers': readers,
+        'writers': writers,
+        'duration': duration,
+        'reads': summarize(latencies['read'], duration),
+        'writes': summarize(latencies['write'], duration),
+        'lock_errors': lock_errors,
+    }
+
+
+def compare_pragmas(setup, read_factory, write_factory, readers=4, writers=2, duration=5.0, modes=MODES):
+    """
+    Benchmark each of ``modes`` (``{label: pragmas}``) on its own copy of
+    a scratch database prepared by ``setup()``, and return
+    ``{label: run_contention() result}``.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        base = Path(directory) / 'base.sqlite3'
+        with scratch_database(base, BASELINE_PRAGMAS) as alias:
+            call_command('migrate', database=alias, verbosity=0)
+            setup()
+        for label, pragmas in modes.items():
+            path = Path(directory) / f'{label}.sqlite3'
+            shutil.copyfile(base, path)
+            with scratch_database(path, pragmas):
+                results[label] = run_contention(read_factory, write_factory, readers, writers, duration)
+    return results
+
+
+class BenchmarkSQLiteCommand(BaseCommand):
+    """
+    Base of the benchmark_sqlite commands: options, compare_pragmas() run,
+    report and --save.
+
+    Subclasses set ``help``, ``seed_noun`` / ``seed_default`` (what --seed
+    counts) and implement ``setup(seed)``, which fills the scratch
+    database, and the ``reader()`` / ``writer()`` factories described in
+    run_contention(). ``benchmark_settings`` is overridden for the runs.
+    """
+    seed_noun = 'rows'
+    seed_default = 1000
+    benchmark_settings = {}
+    sqlite_required_message = 'benchmark_sqlite needs an SQLite database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader threads (default: 4).')
+        parser.add_argument('--writers', type=int, default=2, help='Writer threads (default: 2).')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run (default: 5).')
+        parser.add_argument(
+            '--seed', type=int, default=self.seed_default, metavar=self.seed_noun.upper(),
+            help=f'{self.seed_noun.capitalize()} to seed (default: {self.seed_default}).',
+        )
+        parser.add_argument('--save', metavar='PATH', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(self.sqlite_required_message)
+        if options['readers'] < 0 or options['writers'] < 0 or options['readers'] + options['writers'] < 1:
+            raise CommandError('Use at least one reader or writer thread.')
+        if options['duration'] <= 0:
+            raise CommandError('--duration must be positive.')
+        if options['seed'] < 1:
+            raise CommandError('--seed must be at least 1.')
+
+        with override_settings(**self.benchmark_settings):
+            results = compare_pragmas(
+                lambda: self.setup(options['seed']), self.reader, self.writer,
+                options['readers'], options['writers'], options['duration'],
+            )
+        meta = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            self.seed_noun: options['seed'],
+            'sqlite': sqlite3.sqlite_version,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+        self.report(results)
+        if options['save']:
+            with open(options['save'], 'w') as fh:
+                json.dump({'meta': meta, 'results': results}, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved results to {options["save"]}')
+
+    def setup(self, seed):
+        raise NotImplementedError
+
+    def reader(self):
+        raise NotImplementedError
+
+    def writer(self):
+        raise NotImplementedError
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"mode":<9} {"reads/s":>9} {"read p95":>9} {"writes/s":>9} {"write p95":>10} {"locked":>7}'
+        )
+        for mode, row in results.items():
+            self.stdout.write(
+                f'{mode:<9} {row["reads"]["per_sec"]:>9,.1f} {row["reads"]["p95_ms"]:>7.2f}ms '
+                f'{row["writes"]["per_sec"]:>9,.1f} {row["writes"]["p95_ms"]:>8.2f}ms '
+                f'{sum(row["lock_errors"].values()):>7}'
+            )